@@ -1,16 +1,22 @@
 """Run the complete word extraction pipeline."""
 
 import argparse
+import json
+import multiprocessing
 import os
 import subprocess
 import sys
+import time
+import traceback
 from pathlib import Path
 
+SCRIPTS_DIR = Path(__file__).parent / "scripts"
+CONFIGS_DIR = Path(__file__).parent / "configs"
+
 
 def run_step(script_name: str, version: str) -> bool:
     """Run a pipeline step and return success status."""
-    scripts_dir = Path(__file__).parent / "scripts"
-    script_path = scripts_dir / script_name
+    script_path = SCRIPTS_DIR / script_name
     print(f"\n{'='*60}")
     print(f"Running {script_name}...")
     print("=" * 60)
@@ -21,13 +27,347 @@ def run_step(script_name: str, version: str) -> bool:
 
     result = subprocess.run(
         [sys.executable, str(script_path)],
-        cwd=scripts_dir,
+        cwd=SCRIPTS_DIR,
         env=env,
     )
 
     return result.returncode == 0
 
 
+def pipeline_steps(config, with_sentences: bool = False) -> list[dict]:
+    """Describe each step: its script, tracked inputs and outputs.
+
+    Inputs include the step's own code so that editing a script reruns it.
+    Side steps (step 1b) only write files for later steps; they do not take
+    part in the step-to-step data flow or the upstream key chain.
+    """
+    version_config = config.config_path
+
+    def code(*names: str) -> list[Path]:
+        return [SCRIPTS_DIR / name for name in (*names, "config.py", "utils.py")]
+
+    corpus_code = ("bible_corpus.py", "tokenizer.py", "scanner.py")
+
+    from dispersion import NUMPY_AVAILABLE
+
+    # Per-book counts are only written (and read by step 4) with NumPy
+    book_counts = [config.book_counts_path] if NUMPY_AVAILABLE else []
+    adjusted_ranking = book_counts if config.frequency_ranking == "adjusted" else []
+    phrases = [config.phrases_path] if config.extract_phrases else []
+    # Related words are counted on the corpus with step 1's surface forms
+    related = (
+        [config.bible_json_path, config.surface_lemmas_path]
+        if config.related_words > 0 else []
+    )
+
+    steps = [
+        {
+            "script": "extract_words.py",
+            "inputs": [config.bible_json_path, version_config,
+                       *code("extract_words.py", "lemmas.py", "word_forms.py", "dispersion.py",
+                             *corpus_code)],
+            "outputs": [config.raw_words_path, config.surface_lemmas_path, *book_counts],
+        },
+        {
+            "script": "filter_stopwords.py",
+            "inputs": [config.stopwords_path, version_config,
+                       *code("filter_stopwords.py")],
+            "outputs": [config.filtered_stopwords_path],
+        },
+        {
+            "script": "filter_proper_nouns.py",
+            "inputs": [config.proper_nouns_path, config.protected_words_path,
+                       version_config, *code("filter_proper_nouns.py")],
+            "outputs": [config.filtered_proper_nouns_path],
+        },
+        {
+            "script": "finalize.py",
+            "inputs": [version_config, *adjusted_ranking, *phrases, *related,
+                       *code("finalize.py", "dispersion.py", "cooccurrence.py", "difficulty.py",
+                             *corpus_code)],
+            "outputs": [config.step4_vocabulary_path],
+        },
+    ]
+
+    if config.extract_phrases:
+        steps.insert(1, {
+            "script": "extract_phrases.py",
+            "inputs": [config.bible_json_path, config.surface_lemmas_path, config.stopwords_path,
+                       version_config, *code("extract_phrases.py", "filter_stopwords.py", *corpus_code)],
+            "outputs": [config.phrases_path],
+            "side": True,
+        })
+
+    if with_sentences:
+        steps.append({
+            "script": "extract_sentences.py",
+            "inputs": [config.bible_json_path, config.surface_lemmas_path, version_config,
+                       *code("extract_sentences.py", "difficulty.py", "posting_index.py", "lemmas.py",
+                             *corpus_code)],
+            "outputs": [config.step5_vocabulary_path, config.step5_sentences_path],
+        })
+
+    return steps
+
+
+class InProcessRunner:
+    """Run steps in this interpreter, handing data from step to step.
+
+    The Bible corpus is loaded at most once and shared by the steps that
+    need it. Steps get ``config`` explicitly, so runners for different
+    versions can share one interpreter.
+    The stepN_*.json intermediates are only written with
+    ``keep_intermediates``; step 4 and step 5 outputs are always written.
+    """
+
+    def __init__(self, config, keep_intermediates: bool = False):
+        import extract_phrases
+        import extract_words
+        import filter_stopwords
+        import filter_proper_nouns
+        import finalize
+        import extract_sentences
+
+        self.modules = {
+            "extract_words.py": extract_words,
+            "extract_phrases.py": extract_phrases,
+            "filter_stopwords.py": filter_stopwords,
+            "filter_proper_nouns.py": filter_proper_nouns,
+            "finalize.py": finalize,
+            "extract_sentences.py": extract_sentences,
+        }
+        self.config = config
+        self.keep_intermediates = keep_intermediates
+        self.data = None
+        self._corpus = None
+
+    def corpus(self):
+        if self._corpus is None:
+            self._corpus = self.modules["extract_words.py"].load_bible(self.config)
+        return self._corpus
+
+    def writes_output(self, script_name: str) -> bool:
+        return self.keep_intermediates or script_name in (
+            "extract_phrases.py", "finalize.py", "extract_sentences.py",
+        )
+
+    def skip(self) -> None:
+        """A skipped step leaves its output on disk for the next step to load."""
+        self.data = None
+
+    def run(self, script_name: str) -> bool:
+        print(f"\n{'='*60}")
+        print(f"Running {script_name} (in-process)...")
+        print("=" * 60)
+
+        module = self.modules[script_name]
+        keep = self.keep_intermediates
+        config = self.config
+
+        if script_name == "extract_words.py":
+            self.data = module.run(corpus=self.corpus(), write_output=keep, config=config)
+        elif script_name == "extract_phrases.py":
+            # Side step: step 2 still gets step 1's output
+            module.run(corpus=self.corpus(), config=config)
+        elif script_name == "filter_stopwords.py":
+            self.data = module.run(data=self.data, write_output=keep, config=config)
+        elif script_name == "filter_proper_nouns.py":
+            self.data = module.run(data=self.data, write_output=keep, config=config)
+        elif script_name == "finalize.py":
+            corpus = self.corpus() if config.related_words > 0 else None
+            self.data = module.run(data=self.data, config=config, corpus=corpus)
+        elif script_name == "extract_sentences.py":
+            self.data = module.run(vocabulary=self.data, corpus=self.corpus(), config=config)
+        return True
+
+
+def run_pipeline(
+    version: str,
+    with_sentences: bool = False,
+    in_process: bool = False,
+    keep_intermediates: bool = False,
+    force: bool = False,
+    timings: dict | None = None,
+) -> bool:
+    """Run every step for one version, skipping steps whose inputs are unchanged.
+
+    When ``timings`` is given, it is filled with seconds per step script
+    (None for skipped steps).
+    """
+    if timings is None:
+        timings = {}
+
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+
+    from build_cache import BuildManifest, step_key
+    from config import PIPELINE_ROOT, get_config
+
+    config = get_config(version)
+    manifest = BuildManifest(config.version_output_dir, PIPELINE_ROOT)
+    runner = InProcessRunner(config, keep_intermediates) if in_process else None
+
+    upstream = None
+    for step in pipeline_steps(config, with_sentences):
+        script_name = step["script"]
+        input_hashes = manifest.hash_inputs(step["inputs"], upstream)
+
+        side = step.get("side", False)
+
+        if not force and manifest.is_fresh(script_name, input_hashes, step["outputs"]):
+            print(f"\nSkipping {script_name} (inputs unchanged, reusing cached output)")
+            if side:
+                timings[script_name] = None
+                continue
+            if runner:
+                runner.skip()
+            upstream = manifest.output_key(script_name)
+            timings[script_name] = None
+            continue
+
+        start = time.perf_counter()
+        ok = runner.run(script_name) if runner else run_step(script_name, version)
+        timings[script_name] = time.perf_counter() - start
+        if not ok:
+            print(f"\nError: {script_name} failed!")
+            return False
+
+        # Only steps that wrote their outputs can be reused later. Chaining
+        # on the output hash lets downstream steps survive edits (comments,
+        # reordering) that do not change what this step produced.
+        if runner is None or runner.writes_output(script_name):
+            manifest.record(script_name, input_hashes, step["outputs"])
+            manifest.save()
+            if not side:
+                upstream = manifest.output_key(script_name)
+        elif not side:
+            upstream = step_key(input_hashes)
+
+    return True
+
+
+def available_versions() -> list[str]:
+    """English versions with a config in configs/ (Hebrew has its own pipeline)."""
+    versions = []
+    for config_path in sorted(CONFIGS_DIR.glob("*.json")):
+        with open(config_path, "r", encoding="utf-8") as f:
+            version_config = json.load(f)
+        if version_config.get("language", "en") == "en":
+            versions.append(config_path.stem)
+    return versions
+
+
+def warm_up() -> None:
+    """Load the lemmatizer once so forked workers inherit it.
+
+    WordNet is only loaded when the persistent lemma table is cold; with a
+    warm table the workers never need it.
+    """
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+
+    import lemmas
+    from config import LEMMA_TABLE_PATH
+
+    if len(lemmas.LemmaTable(LEMMA_TABLE_PATH)) == 0:
+        # The WordNet corpus is loaded lazily on first use
+        lemmas.get_lemmatizer().lemmatize("warming", pos="v")
+
+
+class _PrefixedStream:
+    """Prefix every output line with the version so parallel logs stay readable."""
+
+    def __init__(self, stream, prefix: str):
+        self.stream = stream
+        self.prefix = prefix
+        self._at_line_start = True
+
+    def write(self, text: str) -> int:
+        for line in text.splitlines(keepends=True):
+            if self._at_line_start:
+                self.stream.write(self.prefix)
+            self.stream.write(line)
+            self._at_line_start = line.endswith("\n")
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def _run_version(task: tuple) -> tuple[str, bool, dict, float]:
+    """Pool worker: run the in-process pipeline for one version."""
+    version, options = task
+    sys.stdout = _PrefixedStream(sys.__stdout__, f"[{version}] ")
+
+    timings = {}
+    start = time.perf_counter()
+    try:
+        ok = run_pipeline(version, in_process=True, timings=timings, **options)
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        ok = False
+    finally:
+        sys.stdout.flush()
+    return version, ok, timings, time.perf_counter() - start
+
+
+def run_all_versions(versions: list[str], workers: int, options: dict) -> bool:
+    """Run several versions on a process pool, one version per worker."""
+    warm_up()
+
+    # fork lets workers inherit the warmed-up WordNet instead of reloading it
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    results = {}
+    start = time.perf_counter()
+    with context.Pool(processes=workers) as pool:
+        tasks = [(version, options) for version in versions]
+        for version, ok, timings, elapsed in pool.imap_unordered(_run_version, tasks):
+            results[version] = (ok, timings, elapsed)
+            print(f"\n[{version}] {'done' if ok else 'FAILED'} in {elapsed:.1f}s")
+    wall_time = time.perf_counter() - start
+
+    print_timing_summary(versions, results, wall_time)
+    return all(ok for ok, _, _ in results.values())
+
+
+def print_timing_summary(versions: list[str], results: dict, wall_time: float) -> None:
+    """Print per-version step timings and the overall speedup."""
+    step_names = []
+    for _, timings, _ in results.values():
+        for name in timings:
+            if name not in step_names:
+                step_names.append(name)
+
+    def cell(seconds) -> str:
+        if seconds is None:
+            return f"{'skip':>9}"
+        if seconds == "-":
+            return f"{'-':>9}"
+        return f"{seconds:>9.1f}"
+
+    print("\n" + "=" * 60)
+    print("Timing Summary (seconds)")
+    print("=" * 60)
+    header = f"{'step':<24}" + "".join(f"{v:>9}" for v in versions)
+    print(header)
+    print("-" * len(header))
+    for name in step_names:
+        row = "".join(
+            cell(results[v][1].get(name, "-") if v in results else "-")
+            for v in versions
+        )
+        print(f"{name:<24}{row}")
+    print("-" * len(header))
+
+    totals = [results[v][2] if v in results else 0.0 for v in versions]
+    serial = sum(totals)
+    print(f"{'total':<24}" + "".join(cell(t) for t in totals))
+    speedup = serial / wall_time if wall_time else 0.0
+    print(f"\nWall time: {wall_time:.1f}s (sum of versions: {serial:.1f}s, {speedup:.1f}x)")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Bible Vocabulary Extraction Pipeline"
@@ -35,36 +375,93 @@ def main():
     parser.add_argument(
         "--version", "-v",
         default="niv",
-        help="Bible version to process (default: niv)"
+        help="Bible version to process, or 'all' for every English config (default: niv)"
     )
     parser.add_argument(
         "--with-sentences",
         action="store_true",
         help="Also extract example sentences (Step 5)"
     )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run all steps in one interpreter and pass data in memory"
+    )
+    parser.add_argument(
+        "--keep-intermediates",
+        action="store_true",
+        help="With --in-process, also write step1-3 intermediate JSON files "
+             "(needed for those steps to be skipped on the next run)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rerun every step even if its inputs are unchanged"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        help="Processes used to scan the Bible within a step, one book per "
+             "shard (0 = one per core, default: 1; ignored with --version all)"
+    )
+    parser.add_argument(
+        "--intermediate-format",
+        help="File format of the step1-3 intermediates: json (default, compact), "
+             "ndjson, or either with .gz/.zst compression (e.g. ndjson.zst)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="With --version all, number of versions run concurrently "
+             "(default: one per core)"
+    )
     args = parser.parse_args()
 
     version = args.version.lower()
 
+    # Passed through the environment so step subprocesses see them too
+    if args.jobs is not None:
+        os.environ["PIPELINE_JOBS"] = str(args.jobs)  # scanner.py
+    if args.intermediate_format:
+        os.environ["PIPELINE_INTERMEDIATE_FORMAT"] = args.intermediate_format  # config.get_config
+
+    if version == "all":
+        versions = available_versions()
+        workers = args.workers or min(len(versions), os.cpu_count() or 1)
+
+        print("=" * 60)
+        print("Bible Vocabulary Extraction Pipeline")
+        print(f"Versions: {', '.join(v.upper() for v in versions)}")
+        print(f"Mode: in-process, {workers} workers")
+        print("=" * 60)
+
+        options = {
+            "with_sentences": args.with_sentences,
+            "keep_intermediates": args.keep_intermediates,
+            "force": args.force,
+        }
+        if not run_all_versions(versions, workers, options):
+            sys.exit(1)
+
+        print("\nPipeline completed successfully!")
+        return
+
     print("=" * 60)
     print(f"Bible Vocabulary Extraction Pipeline")
     print(f"Version: {version.upper()}")
+    if args.in_process:
+        print("Mode: in-process")
     print("=" * 60)
 
-    steps = [
-        "extract_words.py",
-        "filter_stopwords.py",
-        "filter_proper_nouns.py",
-        "finalize.py",
-    ]
-
-    if args.with_sentences:
-        steps.append("extract_sentences.py")
-
-    for step in steps:
-        if not run_step(step, version):
-            print(f"\nError: {step} failed!")
-            sys.exit(1)
+    ok = run_pipeline(
+        version,
+        with_sentences=args.with_sentences,
+        in_process=args.in_process,
+        keep_intermediates=args.keep_intermediates,
+        force=args.force,
+    )
+    if not ok:
+        sys.exit(1)
 
     print("\n" + "=" * 60)
     print("Pipeline completed successfully!")
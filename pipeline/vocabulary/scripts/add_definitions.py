@@ -1,29 +1,35 @@
 """Step 6: Add pronunciation and Korean definitions to vocabulary.
 
 Uses LLM (droid CLI, claude CLI, or Z.AI API) to generate definitions.
+
+Every answered batch is appended to a journal (NDJSON: a header line, then
+one line per batch) as soon as it arrives, so a crash or Ctrl-C loses at
+most the batches in flight. ``--resume`` keeps the journal and only asks
+for words it does not have yet; the output is built from the journal in
+one pass at the end.
 """
 
 from __future__ import annotations
 
 import argparse
-import concurrent.futures
+import os
 import time
 from datetime import datetime
 from pathlib import Path
 
 import llm_client
 from config import VERSION_OUTPUT_DIR, VERSION_NAME, FINAL_VOCABULARY_PATH
-from utils import log, load_json, save_json
+from utils import dumps, loads, log, load_json, save_json
 
-# Processing configuration
+# Processing configuration (requests in flight are set by llm_client)
 BATCH_SIZE = 50
-MAX_WORKERS_CLI = 40
-MAX_WORKERS_API = 5
 
 # File paths
 INPUT_PATH = VERSION_OUTPUT_DIR / "step5_vocabulary_with_sentences.json"
 OUTPUT_PATH = FINAL_VOCABULARY_PATH
 FAILED_WORDS_PATH = VERSION_OUTPUT_DIR / "failed_words.json"
+JOURNAL_PATH = VERSION_OUTPUT_DIR / "definitions_journal.ndjson"
+TEST_JOURNAL_PATH = VERSION_OUTPUT_DIR / "definitions_journal_test.ndjson"
 
 
 def load_vocabulary() -> dict:
@@ -47,25 +53,80 @@ def get_missing_definitions(vocabulary: dict) -> list[str]:
     ]
 
 
-def save_failed_words(words: list[str]) -> None:
-    """Save failed words to file for later retry."""
-    save_json(FAILED_WORDS_PATH, {"failed_words": words, "count": len(words)})
+def save_failed_words(dead_letters: list[llm_client.DeadLetter]) -> None:
+    """Save failed words, with the response each got, for later retry."""
+    words = [letter.item for letter in dead_letters]
+    save_json(FAILED_WORDS_PATH, {
+        "failed_words": words,
+        "count": len(words),
+        "responses": {letter.item: letter.response for letter in dead_letters},
+        "errors": {letter.item: letter.error for letter in dead_letters if letter.error},
+    }, pretty=True)
     log(f"Saved {len(words)} failed words to {FAILED_WORDS_PATH}")
 
 
-def process_batch(batch_info: tuple[int, list[str]]) -> tuple[int, list, list]:
-    """Process a batch of words.
+class Journal:
+    """Append-only record of answered batches."""
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and path.exists():
+            # Drop a line cut off by a crash, which the next batch would
+            # otherwise be appended to (and lost with)
+            end = path.read_bytes().rfind(b"\n") + 1
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        if not (resume and path.stat().st_size):
+            with open(path, "wb") as f:
+                f.write(dumps({"version": VERSION_NAME, "started": datetime.now().isoformat()}) + b"\n")
+        self._file = open(path, "ab")
+
+    def append(self, index: int, definitions: list) -> None:
+        """Record one batch's definitions durably before moving on."""
+        self._file.write(dumps({"batch": index, "definitions": definitions}) + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_journal(path: Path) -> dict:
+    """Definitions by word from a journal (later entries win). A line cut
+    off by a crash, or any record or definition of the wrong shape, is
+    skipped."""
+    definitions = {}
+    if not path.exists():
+        return definitions
+    with open(path, "rb") as f:
+        next(f, None)
+        for line in f:
+            try:
+                record = loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get("definitions"), list):
+                continue
+            for d in record["definitions"]:
+                if isinstance(d, dict) and isinstance(d.get("word"), str):
+                    definitions[d["word"]] = d
+    return definitions
 
-    Returns: (batch_index, results, failed_words)
-    """
-    batch_index, words = batch_info
-    definitions = llm_client.generate_definitions(words)
 
+def match_definitions(words: list[str], definitions: list) -> tuple[list, list]:
+    """Match a batch's definitions to its words.
+
+    Returns: (results, failed_words)
+    """
     if not definitions:
-        return (batch_index, [], words)
+        return ([], words)
 
-    # Match results to original words
-    def_dict = {d["word"]: d for d in definitions}
+    # Match results to original words (malformed items count as missing)
+    def_dict = {
+        d["word"]: d for d in definitions
+        if isinstance(d, dict) and isinstance(d.get("word"), str)
+    }
     results = []
     failed = []
 
@@ -75,25 +136,55 @@ def process_batch(batch_info: tuple[int, list[str]]) -> tuple[int, list, list]:
         else:
             failed.append(word)
 
-    return (batch_index, results, failed)
+    return (results, failed)
+
+
+def process_batches(batches: list[list[str]], journal: Journal) -> list[llm_client.DeadLetter]:
+    """Request definitions for all batches at once, journaling each answer;
+    llm_client keeps as many in flight as the backend sustains and splits
+    failing batches down to the words that break them.
+
+    Returns: dead letters
+    """
+    total = sum(len(batch) for batch in batches)
+    done = 0
+    start_time = time.time()
+
+    def on_result(index: int, results: list) -> None:
+        nonlocal done
+        journal.append(index, results)
+
+        done += len(results)
+        elapsed = time.time() - start_time
+        remaining = (total - done) * (elapsed / done)
+        log(
+            f"Batch {index + 1}/{len(batches)}: {len(results)} ok | "
+            f"Progress: {done}/{total} words ({done*100//total}%) | "
+            f"ETA: {remaining:.0f}s"
+        )
+
+    return llm_client.generate_bisecting_sync(
+        batches, llm_client.definitions_prompt, match_definitions,
+        llm_client.extract_json_from_response, on_result,
+    )
 
 
 def add_definitions(
     vocabulary: dict,
     limit: int | None = None,
     retry_missing: bool = False,
-    use_api: bool = False
+    resume: bool = False,
+    journal_path: Path = JOURNAL_PATH,
 ) -> dict:
     """Add definitions to all vocabulary words."""
     words_data = vocabulary["words"]
 
     # Retry mode: only process words missing definitions
-    if retry_missing:
-        existing = load_existing_vocabulary()
-        if existing:
-            missing_words = set(get_missing_definitions(existing))
-            log(f"Retry mode: {len(missing_words)} words missing definitions")
-            words_data = [w for w in words_data if w["word"] in missing_words]
+    existing = load_existing_vocabulary() if retry_missing else None
+    if existing:
+        missing_words = set(get_missing_definitions(existing))
+        log(f"Retry mode: {len(missing_words)} words missing definitions")
+        words_data = [w for w in words_data if w["word"] in missing_words]
 
     # Apply limit
     if limit:
@@ -105,93 +196,58 @@ def add_definitions(
         log("No words to process!")
         return vocabulary
 
-    max_workers = MAX_WORKERS_API if use_api else MAX_WORKERS_CLI
-    log(f"Total words: {total_words}, Batch size: {BATCH_SIZE}, Workers: {max_workers}")
-
-    # Create batches
+    # Resume: skip words an earlier run already journaled
     word_list = [w["word"] for w in words_data]
-    batches = [
-        (i, word_list[j:j + BATCH_SIZE])
-        for i, j in enumerate(range(0, len(word_list), BATCH_SIZE))
-    ]
+    if resume and journal_path.exists():
+        journaled = read_journal(journal_path)
+        word_list = [word for word in word_list if word not in journaled]
+        log(f"Resume: {total_words - len(word_list)} words already in {journal_path}")
+    elif journal_path.exists():
+        log("Starting a new journal (--resume continues the previous one)")
 
-    # Process batches in parallel
-    all_definitions = {}
-    all_failed = []
-    completed = 0
-    start_time = time.time()
+    log(f"Total words: {total_words}, To process: {len(word_list)}, Batch size: {BATCH_SIZE}")
 
-    log("Starting parallel processing...")
-    print("-" * 60)
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_batch, batch): batch[0] for batch in batches}
+    # Create batches
+    batches = [word_list[j:j + BATCH_SIZE] for j in range(0, len(word_list), BATCH_SIZE)]
 
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                idx, results, failed = future.result()
-
-                for r in results:
-                    all_definitions[r["word"]] = r
-                all_failed.extend(failed)
-
-                completed += 1
-                elapsed = time.time() - start_time
-                remaining = (len(batches) - completed) * (elapsed / completed)
-
-                log(
-                    f"Batch {idx + 1}/{len(batches)}: "
-                    f"{len(results)} ok, {len(failed)} fail | "
-                    f"Progress: {completed}/{len(batches)} ({completed*100//len(batches)}%) | "
-                    f"ETA: {remaining:.0f}s"
-                )
-            except Exception as e:
-                log(f"Batch error: {e}", "ERROR")
-
-    print("-" * 60)
-
-    # Retry failed words
-    if all_failed:
-        log(f"Retrying {len(all_failed)} failed words...")
-        retry_batches = [
-            (i, all_failed[j:j + BATCH_SIZE])
-            for i, j in enumerate(range(0, len(all_failed), BATCH_SIZE))
-        ]
-
-        retry_failed = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for _, results, failed in executor.map(process_batch, retry_batches):
-                for r in results:
-                    all_definitions[r["word"]] = r
-                retry_failed.extend(failed)
-
-        if retry_failed:
-            log(f"Still failed: {len(retry_failed)} words", "WARN")
-            save_failed_words(retry_failed)
-
-    # Merge definitions
-    log("Merging definitions into vocabulary...")
-
-    if retry_missing:
-        existing = load_existing_vocabulary()
-        if existing:
-            existing_defs = {w["word"]: w for w in existing["words"]}
-            for word, defn in all_definitions.items():
-                if word in existing_defs:
-                    existing_defs[word].update({
-                        "ipa_pronunciation": defn.get("ipa_pronunciation", ""),
-                        "korean_pronunciation": defn.get("korean_pronunciation", ""),
-                        "definition_korean": defn.get("definition_korean", "")
-                    })
-            success_count = sum(1 for w in existing_defs.values() if w.get("definition_korean"))
-            return {
-                "metadata": {
-                    **existing["metadata"],
-                    "definitions_count": success_count,
-                    "processing_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                },
-                "words": list(existing_defs.values())
-            }
+    # Process batches concurrently
+    start_time = time.time()
+    journal = Journal(journal_path, resume)
+    try:
+        if batches:
+            log("Starting parallel processing...")
+            print("-" * 60)
+            dead_letters = process_batches(batches, journal)
+            print("-" * 60)
+
+            if dead_letters:
+                log(f"Failed: {len(dead_letters)} words", "WARN")
+                save_failed_words(dead_letters)
+    finally:
+        journal.close()
+
+    # Merge definitions from the journal
+    log(f"Merging definitions from {journal_path}...")
+    all_definitions = read_journal(journal_path)
+
+    if existing:
+        existing_defs = {w["word"]: w for w in existing["words"]}
+        for word, defn in all_definitions.items():
+            if word in existing_defs:
+                existing_defs[word].update({
+                    "ipa_pronunciation": defn.get("ipa_pronunciation", ""),
+                    "korean_pronunciation": defn.get("korean_pronunciation", ""),
+                    "definition_korean": defn.get("definition_korean", "")
+                })
+        success_count = sum(1 for w in existing_defs.values() if w.get("definition_korean"))
+        return {
+            "metadata": {
+                **existing["metadata"],
+                "definitions_count": success_count,
+                "processing_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            },
+            "words": list(existing_defs.values())
+        }
 
     # Normal mode
     updated_words = []
@@ -240,7 +296,7 @@ def save_output(vocabulary: dict, output_path: Path | None = None) -> None:
         word_data["id"] = idx
 
     vocabulary["metadata"]["has_id"] = True
-    save_json(path, vocabulary)
+    save_json(path, vocabulary, pretty=True)
     log(f"Saved to {path} ({len(vocabulary.get('words', []))} words)")
 
 
@@ -250,12 +306,16 @@ def main():
                         help="Test mode: process only first N words")
     parser.add_argument("--retry", action="store_true",
                         help="Retry only words missing definitions")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run: skip words already in the journal")
     parser.add_argument("--api", action="store_true",
                         help="Use Z.AI API instead of CLI")
     parser.add_argument("--cli", type=str, choices=["claude", "droid"],
                         help="CLI tool to use (default: droid)")
     parser.add_argument("--model", type=str, default="glm-4.6",
                         help="Model to use")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call the LLM (ignore and do not write the response cache)")
     args = parser.parse_args()
 
     # Configure LLM client
@@ -265,7 +325,7 @@ def main():
     if args.cli == "claude" and model == "glm-4.6":
         model = "haiku"
 
-    llm_client.configure(use_api=use_api, cli_tool=cli_tool, model=model)
+    llm_client.configure(use_api=use_api, cli_tool=cli_tool, model=model, use_cache=not args.no_cache)
 
     print("=" * 60)
     print(f"Step 6: Add Definitions ({VERSION_NAME})")
@@ -273,15 +333,22 @@ def main():
     print(f"Model: {model}")
     if args.retry:
         print("RETRY MODE: Processing only missing definitions")
+    if args.resume:
+        print("RESUME: Skipping words already journaled")
     if args.test:
         print(f"TEST MODE: {args.test} words only")
     print("=" * 60)
 
     vocabulary = load_vocabulary()
-    updated = add_definitions(vocabulary, limit=args.test, retry_missing=args.retry, use_api=use_api)
+    journal_path = TEST_JOURNAL_PATH if args.test else JOURNAL_PATH
+    updated = add_definitions(vocabulary, limit=args.test, retry_missing=args.retry,
+                              resume=args.resume, journal_path=journal_path)
 
     output_path = VERSION_OUTPUT_DIR / "bible_vocabulary_final_test.json" if args.test else OUTPUT_PATH
     save_output(updated, output_path)
+    for summary in (llm_client.cache_summary(), llm_client.pool_summary()):
+        if summary:
+            log(summary)
 
     # Show sample results
     print("\n=== Sample Results ===")
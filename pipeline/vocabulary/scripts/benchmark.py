@@ -0,0 +1,413 @@
+"""Equivalence checks and micro-benchmarks for pipeline hot paths.
+
+    python benchmark.py tokenizer            # current version's Bible source
+    python benchmark.py tokenizer --repeat 5
+    python benchmark.py sentences --version niv
+    python benchmark.py difficulty --version niv
+
+Each subcommand first checks that the optimized implementation gives the
+same results as the reference one on the whole Bible (plus a set of edge
+cases), then times both. Exits with status 1 on any mismatch.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+import tokenizer
+from utils import load_json
+
+# Hand-picked cases for the apostrophe/punctuation rules in clean_text
+TOKENIZER_CASES = [
+    "In the beginning God created the heaven and the earth.",
+    "The king's sons and the peoples' rulers",
+    "Don't be afraid; I'll be with thee, saith the LORD's servant.",
+    "“Who is he?” ‘Moses’s brother’—the priest–the prophet",
+    "'s 's's ''s s' s's s'sx a's'b '' ' x'",
+    "the 1st, 2nd and 14th day; 12½ cubits; chapter iv and xii",
+    "Jesus' disciples—Peter, James & John—went up (to Jerusalem)...",
+    "  leading   and trailing \t whitespace \n ",
+    "under_score, digits123, ÉLOHIM and naïve café",
+    "",
+]
+
+# Words that exercise every branch of the numeric classifier
+NUMERIC_CASES = [
+    "12", "1st", "22nd", "3rd", "14th", "12½", "a2¾", "½", "²",
+    "i", "iii", "iv", "viii", "ix", "xl", "lxxx", "mmm", "mmmm", "dccc",
+    "iiii", "vx", "mix", "civil", "did", "lid", "mid", "dim", "cd", "x",
+    "first", "th", "1th2", "one", "",
+]
+
+
+# known_shares edge cases: token ranks by string id, verses as string ids,
+# and (verse, target rank) pairs, including an empty verse and targets
+# ranked after every token (phrases)
+DIFFICULTY_CASES = (
+    [0, -1, 3, 1],
+    [[0, 1], [1, 2, 2], [], [2], [3, 0, 1, 2]],
+    [(0, 0), (0, 5), (1, 2), (1, 3), (1, 100), (2, 0), (2, 7), (3, 2),
+     (3, 3), (4, 0), (4, 1), (4, 3), (4, 4), (4, 50)],
+)
+
+
+class StubCorpus:
+    """The parts of bible_corpus.Corpus that difficulty.py reads."""
+
+    def __init__(self, n_strings: int, verses: list[list[int]]):
+        self.strings = [f"s{sid}" for sid in range(n_strings)]
+        self._verses = verses
+        self.all_tokens = [sid for verse in verses for sid in verse]
+
+    def __len__(self) -> int:
+        return len(self._verses)
+
+    def tokens(self, index: int) -> list[int]:
+        return self._verses[index]
+
+    def token_ends(self) -> list[int]:
+        ends, total = [], 0
+        for verse in self._verses:
+            total += len(verse)
+            ends.append(total)
+        return ends
+
+
+def reference_is_numeric_word(word: str) -> bool:
+    """The original uncompiled is_numeric_word (reference implementation)."""
+    if word.isdigit():
+        return True
+    if re.match(r'^\d+(st|nd|rd|th)$', word):
+        return True
+    if re.search(r'\d+[½¼¾⅓⅔⅛⅜⅝⅞]', word):
+        return True
+    if re.match(r'^[ivxlcdm]+$', word) and len(word) <= 4:
+        if re.match(r'^(i{1,3}|iv|v|vi{0,3}|ix|x{1,3}|xl|l|lx{0,3}|xc|c{1,3}|cd|d|dc{0,3}|cm|m{1,3})$', word):
+            return True
+    return False
+
+
+def reference_tokenize_words(text: str) -> tuple[list[str], int]:
+    """clean_text + split + is_numeric_word, as step 1 originally did it."""
+    words = []
+    skipped = 0
+    for word in tokenizer.clean_text(text).split():
+        if reference_is_numeric_word(word):
+            skipped += 1
+        else:
+            words.append(word)
+    return words, skipped
+
+
+def reference_select_sentences(
+    candidates, used_sentences: set, lengths, books, limit: int
+) -> list:
+    """The original sort-based step 5 sentence selection (reference)."""
+    if not candidates:
+        return []
+
+    candidates = sorted(candidates, key=lambda v: (v in used_sentences, lengths[v]))
+    selected = []
+    selected_books = set()
+
+    for verse in candidates:
+        if len(selected) >= limit:
+            break
+        if books[verse] not in selected_books:
+            selected.append(verse)
+            selected_books.add(books[verse])
+
+    for verse in candidates:
+        if len(selected) >= limit:
+            break
+        if verse not in selected:
+            selected.append(verse)
+
+    return selected
+
+
+def reference_candidate_dicts(index, corpus) -> dict:
+    """The former posting layout: one {"id", "length", "book"} dict per posting."""
+    import extract_sentences
+
+    postings = {}
+    for word, verse_ids in index.postings.items():
+        entries = postings[word] = []
+        for verse_id in verse_ids:
+            _, book, chapter, verse, _ = corpus.verse(verse_id)
+            entries.append({
+                "id": extract_sentences.generate_sentence_id(book, chapter, verse),
+                "length": index.lengths[verse_id],
+                "book": book,
+            })
+    return postings
+
+
+def peak_memory(func: Callable) -> tuple[object, int]:
+    """Result of ``func()`` and the peak bytes allocated while it ran."""
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def load_verses(source: Path) -> list[str]:
+    """All verse texts of a *_Bible.json source in canonical order."""
+    bible = load_json(source)
+    return [
+        text
+        for chapters in bible.values()
+        for verses in chapters.values()
+        for text in verses.values()
+    ]
+
+
+def best_time(func: Callable, items: list, repeat: int) -> float:
+    """Best wall time of ``repeat`` passes of ``func`` over ``items``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_tokenizer(texts: list[str]) -> int:
+    """Compare fast and reference tokenization; returns the mismatch count."""
+    mismatches = 0
+    for text in texts:
+        expected = tokenizer.clean_text(text).split()
+        if tokenizer.tokenize(text) != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  tokenize mismatch: {text!r}")
+                print(f"    expected {expected}")
+                print(f"    got      {tokenizer.tokenize(text)}")
+        if tokenizer.tokenize_cased(text)[0] != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  tokenize_cased mismatch: {text!r}")
+        if tokenizer.tokenize_words(text) != reference_tokenize_words(text):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  tokenize_words mismatch: {text!r}")
+    return mismatches
+
+
+def check_numeric(words) -> int:
+    """Compare the compiled and reference numeric classifiers."""
+    mismatches = 0
+    for word in words:
+        if tokenizer.is_numeric_word(word) != reference_is_numeric_word(word):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  is_numeric_word mismatch: {word!r}")
+    return mismatches
+
+
+def bench_tokenizer(args) -> int:
+    if args.source:
+        source = Path(args.source)
+    else:
+        from config import get_config
+        source = get_config().bible_json_path
+
+    texts = list(TOKENIZER_CASES)
+    if source.exists():
+        texts += load_verses(source)
+        print(f"Source: {source.name} ({len(texts) - len(TOKENIZER_CASES)} verses)")
+    else:
+        print(f"Source {source} not found; checking edge cases only")
+
+    vocabulary = {w for text in texts for w in tokenizer.clean_text(text).split()}
+    mismatches = check_tokenizer(texts) + check_numeric(sorted(vocabulary) + NUMERIC_CASES)
+    if mismatches:
+        print(f"FAILED: {mismatches} mismatches")
+        return 1
+    print(f"Equivalence: OK ({len(texts)} texts, {len(vocabulary)} distinct words)")
+
+    rows = [
+        ("clean_text().split()", lambda t: tokenizer.clean_text(t).split(), texts),
+        ("tokenize()", tokenizer.tokenize, texts),
+        ("tokenize_cased()", tokenizer.tokenize_cased, texts),
+        ("clean_text + is_numeric (ref)", reference_tokenize_words, texts),
+        ("tokenize_words()", tokenizer.tokenize_words, texts),
+        ("is_numeric_word (ref)", reference_is_numeric_word, sorted(vocabulary)),
+        ("is_numeric_word()", tokenizer.is_numeric_word, sorted(vocabulary)),
+    ]
+    print(f"\n{'Function':<32} {'Best of ' + str(args.repeat):>12}")
+    for name, func, items in rows:
+        print(f"{name:<32} {best_time(func, items, args.repeat) * 1000:>10.1f}ms")
+    return 0
+
+
+def run_selection(words: list, postings: dict, select: Callable) -> list:
+    """Select sentences for every word in order, as step 5 does."""
+    used_sentences = set()
+    selections = []
+    for word in words:
+        selected = select(postings.get(word, ()), used_sentences)
+        used_sentences.update(selected)
+        selections.append(selected)
+    return selections
+
+
+def bench_sentences(args) -> int:
+    import extract_sentences
+    from config import get_config
+    from posting_index import load_index
+
+    config = get_config(args.version)
+    if not config.step4_vocabulary_path.exists():
+        print(f"{config.step4_vocabulary_path} not found; run steps 1-4 first")
+        return 1
+
+    words = [item["word"] for item in load_json(config.step4_vocabulary_path)["words"]]
+    corpus = extract_sentences.load_bible(config)
+    corpus.strings  # decoded once, outside the measurements
+    posting_index = load_index(config, corpus)
+    index, index_peak = peak_memory(
+        lambda: extract_sentences.build_inverted_index(corpus, set(words), posting_index)
+    )
+    _, dicts_peak = peak_memory(lambda: reference_candidate_dicts(index, corpus))
+    postings = index.postings
+
+    limit = extract_sentences.MAX_SENTENCES_PER_WORD
+    sizes = sorted((len(c) for c in postings.values()), reverse=True)
+    print(f"Candidates: {sum(sizes)} total, largest lists {sizes[:5]}")
+    print(f"Index build peak memory: {index_peak / 2**20:.1f} MB "
+          f"(one dict per posting: {dicts_peak / 2**20:.1f} MB)")
+
+    def reference(candidates, used):
+        return reference_select_sentences(candidates, used, index.lengths, index.books, limit)
+
+    def select(candidates, used):
+        return extract_sentences.select_sentences_for_word(candidates, used, index.books)
+
+    expected = run_selection(words, postings, reference)
+    got = run_selection(words, postings, select)
+    mismatches = [word for word, a, b in zip(words, expected, got) if a != b]
+    if mismatches:
+        print(f"FAILED: {len(mismatches)} words differ, e.g. {mismatches[:5]}")
+        return 1
+    print(f"Equivalence: OK ({len(words)} words)")
+
+    # The words with the most candidates dominated step 5 with the full sort
+    frequent = sorted(words, key=lambda w: len(postings.get(w, ())), reverse=True)[:20]
+    rows = [
+        ("sort + two scans (ref)", reference),
+        ("select_sentences_for_word()", select),
+    ]
+    print(f"\n{'Function':<32} {'All words':>12} {'Top 20':>12}   (best of {args.repeat})")
+    for name, func in rows:
+        times = [
+            best_time(lambda _: run_selection(subset, postings, func), [None], args.repeat)
+            for subset in (words, frequent)
+        ]
+        print(f"{name:<32} {times[0] * 1000:>10.1f}ms {times[1] * 1000:>10.2f}ms")
+    posting_index.close()
+    corpus.close()
+    return 0
+
+
+def check_known_shares(corpus, token_ranks: list[int], pairs: list[tuple[int, int]]) -> int:
+    """Compare the sparse and pure Python known-token shares; returns the
+    mismatch count."""
+    import difficulty
+
+    verse_ids = [verse for verse, _ in pairs]
+    ranks = [rank for _, rank in pairs]
+    got = difficulty.known_shares(corpus, token_ranks, verse_ids, ranks)
+    expected = difficulty._known_shares_python(corpus, token_ranks, verse_ids, ranks)
+    mismatches = 0
+    for pair, a, b in zip(pairs, got, expected):
+        if a != b:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  known_shares mismatch at (verse, rank) {pair}: {a} != {b}")
+    return mismatches
+
+
+def bench_difficulty(args) -> int:
+    import difficulty
+    import extract_sentences
+    from config import get_config
+
+    if not difficulty.SCIPY_AVAILABLE:
+        print("NumPy/SciPy not installed; only the pure Python path is available")
+        return 0
+
+    token_ranks, verses, pairs = DIFFICULTY_CASES
+    mismatches = check_known_shares(StubCorpus(len(token_ranks), verses), token_ranks, pairs)
+
+    config = get_config(args.version)
+    if config.step4_vocabulary_path.exists():
+        words = load_json(config.step4_vocabulary_path)["words"]
+        word_ranks = {w["word"]: rank for rank, w in enumerate(words)}
+        corpus = extract_sentences.load_bible(config)
+        surface_lemmas = extract_sentences.load_surface_lemmas(config)
+        token_ranks = difficulty.string_ranks(corpus, word_ranks, surface_lemmas)
+        # Every verse against the first, a middle, the last and an
+        # out-of-range (phrase-like) rank
+        targets = (0, len(words) // 2, len(words) - 1, len(words) + 10)
+        pairs = [(verse, rank) for verse in range(len(corpus)) for rank in targets]
+        mismatches += check_known_shares(corpus, token_ranks, pairs)
+        print(f"Source: {config.version_name} ({len(pairs)} verse/rank pairs)")
+    else:
+        corpus = None
+        print(f"{config.step4_vocabulary_path} not found; checking edge cases only")
+
+    if mismatches:
+        print(f"FAILED: {mismatches} mismatches")
+        return 1
+    print("Equivalence: OK")
+
+    if corpus is not None:
+        verse_ids = [verse for verse, _ in pairs]
+        ranks = [rank for _, rank in pairs]
+        rows = [
+            ("_known_shares_python() (ref)", difficulty._known_shares_python),
+            ("known_shares() (sparse)", difficulty.known_shares),
+        ]
+        print(f"\n{'Function':<32} {'Best of ' + str(args.repeat):>12}")
+        for name, func in rows:
+            elapsed = best_time(lambda _: func(corpus, token_ranks, verse_ids, ranks), [None], args.repeat)
+            print(f"{name:<32} {elapsed * 1000:>10.1f}ms")
+        corpus.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline equivalence checks and micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tok = subparsers.add_parser("tokenizer", help="Single-pass tokenizer vs clean_text")
+    tok.add_argument("--source", help="Bible JSON to use (default: current version's source)")
+    tok.add_argument("--repeat", type=int, default=3, help="Timing passes per function")
+    tok.set_defaults(func=bench_tokenizer)
+
+    sent = subparsers.add_parser("sentences", help="Step 5 top-k sentence selection vs full sort")
+    sent.add_argument("--version", "-v", help="Bible version (default: $BIBLE_VERSION or niv)")
+    sent.add_argument("--repeat", type=int, default=3, help="Timing passes per function")
+    sent.set_defaults(func=bench_sentences)
+
+    diff = subparsers.add_parser("difficulty", help="Sparse known-token shares vs token-by-token")
+    diff.add_argument("--version", "-v", help="Bible version (default: $BIBLE_VERSION or niv)")
+    diff.add_argument("--repeat", type=int, default=3, help="Timing passes per function")
+    diff.set_defaults(func=bench_difficulty)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
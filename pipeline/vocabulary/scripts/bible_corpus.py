@@ -0,0 +1,359 @@
+"""Pre-tokenized, memory-mapped Bible corpus.
+
+A *_Bible.json source ({book: {chapter: {verse: text}}}) is compiled once
+into a compact binary file that the steps map into memory and iterate
+without any JSON parsing or re-tokenization.
+
+File layout (little-endian, sections 8-byte aligned):
+
+    header        magic, format version, tokenizer id, source size/mtime,
+                  counts and section offsets
+    string pool   uint32 offsets[n_strings + 1] + UTF-8 blob; interned
+                  book names, chapter/verse labels and words
+    verse table   uint32[n_verses * 7]: book, chapter, verse (string ids),
+                  text start/end (byte offsets), token start/end
+    tokens        uint32[n_tokens]: string id of each token, verse by verse
+    case counts   uint32[n_strings] x 2: per string, mid-sentence occurrences
+                  that are capitalized, then those that are lowercase
+    text          UTF-8 blob of the original verse texts
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import tokenizer
+from utils import load_json
+
+MAGIC = b"BVCORPUS"
+FORMAT_VERSION = 2
+
+# magic, format version, tokenizer id, source size, source mtime,
+# n_strings, n_verses, n_tokens, then section offsets
+_HEADER = struct.Struct("<8sI32sQqIIIQQQQQQ")
+_VERSE_FIELDS = 7
+
+assert _HEADER.size % 8 == 0
+
+
+class Verse(NamedTuple):
+    index: int
+    book: str
+    chapter: str
+    verse: str
+    text: str
+
+
+def tokenizer_id() -> bytes:
+    """Fingerprint of the tokenizer code; a change invalidates compiled corpora."""
+    source = Path(tokenizer.__file__).read_bytes()
+    return hashlib.sha256(source).hexdigest()[:32].encode("ascii")
+
+
+def _u32(values) -> array:
+    arr = array("I", values)
+    assert arr.itemsize == 4, "corpus format needs a 4-byte unsigned int"
+    return arr
+
+
+def _to_le(arr: array) -> bytes:
+    if sys.byteorder == "big":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _pad(buf: bytearray) -> None:
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def compile_corpus(bible: dict, path: Path, source: Path | None = None) -> None:
+    """Compile a loaded Bible into the binary corpus format at ``path``."""
+    string_ids: dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        sid = string_ids.get(value)
+        if sid is None:
+            sid = string_ids[value] = len(string_ids)
+        return sid
+
+    verses = _u32([])
+    tokens = _u32([])
+    text_blob = bytearray()
+    capitalized: dict[int, int] = {}
+    lowercase: dict[int, int] = {}
+
+    for book, chapters in bible.items():
+        book_id = intern(book)
+        for chapter_num, chapter_verses in chapters.items():
+            chapter_id = intern(chapter_num)
+            for verse_num, text in chapter_verses.items():
+                text_start = len(text_blob)
+                text_blob += text.encode("utf-8")
+                token_start = len(tokens)
+                words, flags = tokenizer.tokenize_cased(text)
+                for word, flag in zip(words, flags):
+                    sid = intern(word)
+                    tokens.append(sid)
+                    if flag == tokenizer.CAPITALIZED:
+                        capitalized[sid] = capitalized.get(sid, 0) + 1
+                    elif flag == 0:
+                        lowercase[sid] = lowercase.get(sid, 0) + 1
+                verses.extend((
+                    book_id, chapter_id, intern(verse_num),
+                    text_start, len(text_blob), token_start, len(tokens),
+                ))
+
+    pool_offsets = _u32([0])
+    pool_blob = bytearray()
+    for value in string_ids:
+        pool_blob += value.encode("utf-8")
+        pool_offsets.append(len(pool_blob))
+
+    n_strings = len(string_ids)
+    case_counts = _u32(capitalized.get(sid, 0) for sid in range(n_strings))
+    case_counts.extend(lowercase.get(sid, 0) for sid in range(n_strings))
+
+    body = bytearray()
+    offsets = []
+    sections = (
+        _to_le(pool_offsets), pool_blob, _to_le(verses), _to_le(tokens),
+        _to_le(case_counts), text_blob,
+    )
+    for section in sections:
+        offsets.append(_HEADER.size + len(body))
+        body += section
+        _pad(body)
+
+    source_size, source_mtime = 0, 0
+    if source is not None:
+        stat = source.stat()
+        source_size, source_mtime = stat.st_size, stat.st_mtime_ns
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, tokenizer_id(), source_size, source_mtime,
+        n_strings, len(verses) // _VERSE_FIELDS, len(tokens), *offsets,
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    # Atomic so concurrent pipeline runs never see a half-written corpus
+    os.replace(tmp_path, path)
+
+
+class Corpus:
+    """Read-only view of a compiled corpus file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic, self.format_version, self.tokenizer_id, self.source_size,
+            self.source_mtime, n_strings, n_verses, n_tokens,
+            pool_index_off, pool_blob_off, verses_off, tokens_off, case_off, text_off,
+        ) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or self.format_version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Not a corpus file (version {FORMAT_VERSION}): {path}")
+
+        self._view = memoryview(self._mm)
+        self._pool_index = self._u32_view(pool_index_off, n_strings + 1)
+        self._pool_blob = self._view[pool_blob_off:verses_off]
+        self._verses = self._u32_view(verses_off, n_verses * _VERSE_FIELDS)
+        self._tokens = self._u32_view(tokens_off, n_tokens)
+        self._capitalized = self._u32_view(case_off, n_strings)
+        self._lowercase = self._u32_view(case_off + 4 * n_strings, n_strings)
+        self._text = self._view[text_off:]
+        self._n_verses = n_verses
+        self._strings: list[str] | None = None
+
+    def _u32_view(self, offset: int, count: int):
+        raw = self._view[offset:offset + 4 * count]
+        if sys.byteorder == "little":
+            return raw.cast("I")
+        arr = _u32([])
+        arr.frombytes(raw)
+        arr.byteswap()
+        return arr
+
+    def __len__(self) -> int:
+        return self._n_verses
+
+    def __enter__(self) -> Corpus:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map."""
+        for name in (
+            "_pool_index", "_pool_blob", "_verses", "_tokens",
+            "_capitalized", "_lowercase", "_text", "_view",
+        ):
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # A caller still holds a token slice; the map is freed with it
+            pass
+        self._file.close()
+
+    @property
+    def strings(self) -> list[str]:
+        """All interned strings, indexed by string id (decoded once)."""
+        if self._strings is None:
+            blob = bytes(self._pool_blob)
+            index = self._pool_index
+            self._strings = [
+                blob[index[i]:index[i + 1]].decode("utf-8")
+                for i in range(len(index) - 1)
+            ]
+        return self._strings
+
+    @property
+    def all_tokens(self):
+        """Token ids of the whole corpus in verse order."""
+        return self._tokens
+
+    def case_counts(self, sid: int) -> tuple[int, int]:
+        """Mid-sentence (capitalized, lowercase) occurrences of a string id."""
+        return self._capitalized[sid], self._lowercase[sid]
+
+    def string(self, sid: int) -> str:
+        return self.strings[sid]
+
+    def text(self, index: int) -> str:
+        base = index * _VERSE_FIELDS
+        return str(self._text[self._verses[base + 3]:self._verses[base + 4]], "utf-8")
+
+    def tokens(self, index: int):
+        """Token (string) ids of one verse."""
+        base = index * _VERSE_FIELDS
+        return self._tokens[self._verses[base + 5]:self._verses[base + 6]]
+
+    def tokens_between(self, start: int, stop: int):
+        """Token ids of verses [start, stop) as one contiguous slice."""
+        if start >= stop:
+            return self._tokens[0:0]
+        return self._tokens[
+            self._verses[start * _VERSE_FIELDS + 5]:self._verses[(stop - 1) * _VERSE_FIELDS + 6]
+        ]
+
+    def token_ends(self):
+        """Token end offset of every verse (verse i's tokens start at verse
+        i - 1's end)."""
+        return self._verses[6::_VERSE_FIELDS]
+
+    def book_id(self, index: int) -> int:
+        """String id of a verse's book (cheaper than verse().book)."""
+        return self._verses[index * _VERSE_FIELDS]
+
+    def verse(self, index: int) -> Verse:
+        base = index * _VERSE_FIELDS
+        strings = self.strings
+        return Verse(
+            index,
+            strings[self._verses[base]],
+            strings[self._verses[base + 1]],
+            strings[self._verses[base + 2]],
+            self.text(index),
+        )
+
+    def iter_verses(self, start: int = 0, stop: int | None = None) -> Iterator[Verse]:
+        """Iterate verses in canonical (source) order."""
+        stop = self._n_verses if stop is None else stop
+        for index in range(start, stop):
+            yield self.verse(index)
+
+    def books(self) -> list[tuple[str, int, int]]:
+        """(book, first verse index, end verse index) in canonical order."""
+        result = []
+        verses = self._verses
+        for index in range(self._n_verses):
+            book_id = verses[index * _VERSE_FIELDS]
+            if not result or result[-1][0] != book_id:
+                result.append([book_id, index, index + 1])
+            else:
+                result[-1][2] = index + 1
+        return [(self.strings[b], start, end) for b, start, end in result]
+
+    def chapters(self) -> list[tuple[str, str, int, int]]:
+        """(book, chapter, first verse index, end verse index) in canonical order."""
+        result = []
+        verses = self._verses
+        for index in range(self._n_verses):
+            key = (verses[index * _VERSE_FIELDS], verses[index * _VERSE_FIELDS + 1])
+            if not result or result[-1][0] != key:
+                result.append([key, index, index + 1])
+            else:
+                result[-1][2] = index + 1
+        strings = self.strings
+        return [(strings[b], strings[c], start, end) for (b, c), start, end in result]
+
+
+def is_current(path: Path, source: Path) -> bool:
+    """Check whether a compiled corpus matches its source and tokenizer."""
+    if not path.exists() or not source.exists():
+        return False
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+        magic, version, tok_id, size, mtime, *_ = _HEADER.unpack(header)
+    except (OSError, struct.error):
+        return False
+    stat = source.stat()
+    return (
+        magic == MAGIC
+        and version == FORMAT_VERSION
+        and tok_id == tokenizer_id()
+        and size == stat.st_size
+        and mtime == stat.st_mtime_ns
+    )
+
+
+def load_corpus(source: Path, path: Path) -> Corpus:
+    """Open the compiled corpus for ``source``, compiling it first if stale."""
+    if not is_current(path, source):
+        print(f"Compiling corpus {source.name} -> {path}")
+        bible = load_json(source)
+        compile_corpus(bible, path, source)
+    return Corpus(path)
+
+
+def main():
+    import argparse
+
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description="Compile the Bible source into a binary corpus")
+    parser.add_argument("--version", "-v", help="Bible version (default: $BIBLE_VERSION or niv)")
+    parser.add_argument("--force", action="store_true", help="Recompile even if up to date")
+    args = parser.parse_args()
+
+    config = get_config(args.version)
+    corpus_path = config.corpus_path
+    if args.force and corpus_path.exists():
+        corpus_path.unlink()
+    with load_corpus(config.bible_json_path, corpus_path) as corpus:
+        print(f"Verses: {len(corpus)}")
+        print(f"Tokens: {len(corpus.all_tokens)}")
+        print(f"Strings: {len(corpus.strings)}")
+        print(f"Size: {corpus_path.stat().st_size / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Content-hash build cache for pipeline steps.
+
+Each step records the hashes of its inputs (source Bible, word lists,
+version config, the step's own code and the upstream step's key) together
+with the hashes of the files it produced. On a rerun, a step whose input and
+output hashes all still match is skipped and its output on disk is reused.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+from utils import load_json, save_json
+
+MANIFEST_NAME = "build_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 of a file's content ("missing" if absent)."""
+    if not path.exists():
+        return "missing"
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def step_key(input_hashes: dict[str, str]) -> str:
+    """Combine a step's input hashes into a single key."""
+    payload = json.dumps(input_hashes, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class BuildManifest:
+    """Per-version record of step input/output hashes."""
+
+    def __init__(self, output_dir: Path, root: Path):
+        self.path = output_dir / MANIFEST_NAME
+        self.root = root
+        self.steps: dict[str, dict] = {}
+
+        if self.path.exists():
+            try:
+                data = load_json(self.path)
+                if data.get("manifest_version") == MANIFEST_VERSION:
+                    self.steps = data.get("steps", {})
+            except (ValueError, OSError):
+                self.steps = {}
+
+    def _name(self, path: Path) -> str:
+        """Stable, machine-independent name for a tracked file."""
+        try:
+            return path.resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def hash_inputs(self, files: list[Path], upstream: str | None = None) -> dict[str, str]:
+        """Hash a step's input files and chain in the upstream step key."""
+        hashes = {self._name(path): file_digest(path) for path in files}
+        if upstream is not None:
+            hashes["upstream"] = upstream
+        return hashes
+
+    def is_fresh(self, step: str, input_hashes: dict[str, str], outputs: list[Path]) -> bool:
+        """Check whether a step's recorded inputs and outputs are unchanged."""
+        entry = self.steps.get(step)
+        if not entry or entry.get("key") != step_key(input_hashes):
+            return False
+
+        recorded = entry.get("outputs", {})
+        for path in outputs:
+            digest = recorded.get(self._name(path))
+            if digest is None or not path.exists() or digest != file_digest(path):
+                return False
+        return True
+
+    def record(self, step: str, input_hashes: dict[str, str], outputs: list[Path]) -> None:
+        """Record a successful step run."""
+        self.steps[step] = {
+            "key": step_key(input_hashes),
+            "inputs": input_hashes,
+            "outputs": {self._name(path): file_digest(path) for path in outputs},
+        }
+
+    def output_key(self, step: str) -> str:
+        """Key of a recorded step's outputs, used to chain downstream steps."""
+        return step_key(self.steps[step]["outputs"])
+
+    def save(self) -> None:
+        """Write the manifest to disk."""
+        save_json(self.path, {"manifest_version": MANIFEST_VERSION, "steps": self.steps}, pretty=True)
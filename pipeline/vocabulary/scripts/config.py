@@ -1,8 +1,28 @@
-"""Pipeline configuration with version support."""
+"""Pipeline configuration with version support.
+
+Configuration is a ``PipelineConfig`` per Bible version, created by
+``get_config(version)`` and cached, so one process can work on several
+versions. Nothing is read until a value is used: the version JSON is
+loaded on first access and paths are resolved on demand. Importing this
+module does no I/O, and no directories are created (``save_json`` creates
+the parent directory of what it writes).
+
+    config = get_config("esv")
+    config.raw_words_path       # output/esv/step1_raw_words.json
+
+The module-level constants of earlier versions (``RAW_WORDS_PATH``,
+``VERSION_NAME``, ...) are still available and resolve against
+``get_config()``, i.e. the BIBLE_VERSION environment variable (default:
+niv) at the time of first use.
+"""
+
+from __future__ import annotations
 
-import json
 import os
 from pathlib import Path
+from typing import Any
+
+from utils import load_json
 
 # Base paths
 SCRIPTS_DIR = Path(__file__).parent
@@ -12,9 +32,15 @@ CONFIGS_DIR = PIPELINE_DIR / "configs"
 SOURCE_DATA_DIR = PIPELINE_ROOT / "source-data"  # Shared across vocabulary/sentence
 DATA_DIR = PIPELINE_DIR / "data"
 OUTPUT_DIR = PIPELINE_DIR / "output"
+CACHE_DIR = PIPELINE_DIR / "cache"  # Derived build artifacts (not committed)
+
+# Surface form -> lemma memo table (shared by all versions)
+LEMMA_TABLE_PATH = CACHE_DIR / "lemmas.json"
 
-# Get version from environment variable (default: niv)
-VERSION = os.environ.get("BIBLE_VERSION", "niv")
+# LLM responses by (backend, model, temperature, prompt) (llm_cache.py)
+LLM_CACHE_PATH = CACHE_DIR / "llm_responses.sqlite"
+
+DEFAULT_VERSION = "niv"
 
 
 def load_version_config(version: str) -> dict:
@@ -23,58 +49,247 @@ def load_version_config(version: str) -> dict:
     if not config_path.exists():
         raise FileNotFoundError(f"Config file not found: {config_path}")
 
-    with open(config_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(config_path)
+
+
+class PipelineConfig:
+    """Settings and file paths of one Bible version.
+
+    Use ``get_config`` rather than creating instances directly.
+    """
+
+    def __init__(self, version: str, intermediate_format: str | None = None):
+        self.version = version
+        # Step 1-3 intermediates are machine-read only; their format is a file
+        # suffix understood by utils.save_json (json, ndjson, json.gz, ndjson.zst, ...)
+        self.intermediate_format = intermediate_format or os.environ.get(
+            "PIPELINE_INTERMEDIATE_FORMAT", "json"
+        )
+        self._data: dict | None = None
+
+    def __repr__(self) -> str:
+        return f"PipelineConfig({self.version!r})"
+
+    @property
+    def data(self) -> dict:
+        """The parsed configs/<version>.json (loaded on first access)."""
+        if self._data is None:
+            self._data = load_version_config(self.version)
+        return self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    # Version info
+    @property
+    def config_path(self) -> Path:
+        return CONFIGS_DIR / f"{self.version}.json"
+
+    @property
+    def version_name(self) -> str:
+        return self.get("name", self.version)
+
+    @property
+    def language(self) -> str:
+        return self.get("language", "en")
+
+    # Version-specific directories
+    @property
+    def version_data_dir(self) -> Path:
+        return DATA_DIR / self.get("data_dir", self.version)
+
+    @property
+    def version_output_dir(self) -> Path:
+        return OUTPUT_DIR / self.version
+
+    # Input file
+    @property
+    def bible_json_path(self) -> Path:
+        return SOURCE_DATA_DIR / self.get("source_file", f"{self.version}_Bible.json")
+
+    @property
+    def corpus_path(self) -> Path:
+        """Compiled, memory-mappable corpus built from bible_json_path."""
+        return CACHE_DIR / f"{self.version}.corpus"
+
+    @property
+    def posting_index_path(self) -> Path:
+        """Lemma -> verses posting index built from corpus_path."""
+        return CACHE_DIR / f"{self.version}.postings"
+
+    # Version-specific data files
+    @property
+    def stopwords_path(self) -> Path:
+        return self.version_data_dir / self.get("stopwords_file", "stopwords.txt")
+
+    @property
+    def protected_words_path(self) -> Path:
+        return self.version_data_dir / self.get("protected_words_file", "protected_words.txt")
+
+    @property
+    def proper_nouns_path(self) -> Path:
+        return self.version_data_dir / self.get("proper_nouns_file", "proper_nouns.txt")
+
+    # Step 1-4: Word extraction and filtering
+    @property
+    def raw_words_path(self) -> Path:
+        return self.version_output_dir / f"step1_raw_words.{self.intermediate_format}"
+
+    @property
+    def surface_lemmas_path(self) -> Path:
+        """Step 1 surface form -> lemma table, used by step 5 to match verses."""
+        return self.version_output_dir / f"step1_surface_lemmas.{self.intermediate_format}"
+
+    @property
+    def book_counts_path(self) -> Path:
+        """Step 1 books x lemmas count matrix (see dispersion.py)."""
+        return self.version_output_dir / "step1_book_counts.npz"
+
+    @property
+    def phrases_path(self) -> Path:
+        """Step 1b multi-word expressions (only with extract_phrases)."""
+        return self.version_output_dir / f"step1b_phrases.{self.intermediate_format}"
+
+    @property
+    def filtered_stopwords_path(self) -> Path:
+        return self.version_output_dir / f"step2_filtered_stopwords.{self.intermediate_format}"
+
+    @property
+    def filtered_proper_nouns_path(self) -> Path:
+        return self.version_output_dir / f"step3_filtered_proper_nouns.{self.intermediate_format}"
+
+    @property
+    def step4_vocabulary_path(self) -> Path:
+        return self.version_output_dir / "step4_vocabulary.json"
+
+    # Step 5: Sentences extraction
+    @property
+    def step5_vocabulary_path(self) -> Path:
+        return self.version_output_dir / "step5_vocabulary_with_sentences.json"
+
+    @property
+    def step5_sentences_path(self) -> Path:
+        return self.version_output_dir / "step5_sentences.json"
+
+    # Final outputs (with version tag for external use)
+    @property
+    def final_vocabulary_path(self) -> Path:
+        return self.version_output_dir / f"final_vocabulary_{self.version}.json"
+
+    @property
+    def final_sentences_path(self) -> Path:
+        return self.version_output_dir / f"final_sentences_{self.version}.json"
+
+    # Legacy alias (for backward compatibility)
+    @property
+    def final_output_path(self) -> Path:
+        return self.step4_vocabulary_path
+
+    # Processing options
+    @property
+    def min_word_length(self) -> int:
+        return self.get("min_word_length", 2)
+
+    @property
+    def min_frequency(self) -> int:
+        return self.get("min_frequency", 1)
+
+    @property
+    def proper_noun_capitalized_ratio(self) -> float:
+        """Share of mid-sentence uses that must be capitalized for a proper noun.
+
+        Counts are per lemma, so a common word with a few capitalized forms
+        (titles, "Anointed One") is not filtered.
+        """
+        return self.get("proper_noun_capitalized_ratio", 0.5)
+
+    @property
+    def extract_phrases(self) -> bool:
+        """Run step 1b and add its phrases to the word list in step 4."""
+        return self.get("extract_phrases", False)
 
+    @property
+    def frequency_ranking(self) -> str:
+        """Step 4 ranking: "count", or "adjusted" (count x Juilland's D)."""
+        return self.get("frequency_ranking", "count")
 
-# Load version config
-_config = load_version_config(VERSION)
+    @property
+    def related_words(self) -> int:
+        """Related words kept per step 4 entry (0 disables the ``related`` field)."""
+        return self.get("related_words", 10)
 
-# Version info
-VERSION_NAME = _config.get("name", VERSION)
-LANGUAGE = _config.get("language", "en")
+    @property
+    def sentence_assignment(self) -> str:
+        """Step 5 sentence assignment mode: "greedy" or "cover"."""
+        return self.get("sentence_assignment", "greedy")
 
-# Version-specific data directory
-VERSION_DATA_DIR = DATA_DIR / _config.get("data_dir", VERSION)
-VERSION_OUTPUT_DIR = OUTPUT_DIR / VERSION
+    @property
+    def sentence_ranking(self) -> str:
+        """Step 5 candidate ranking: "difficulty" or "length"."""
+        return self.get("sentence_ranking", "difficulty")
 
-# Ensure output directory exists
-VERSION_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Input file
-BIBLE_JSON_PATH = SOURCE_DATA_DIR / _config.get("source_file", f"{VERSION}_Bible.json")
+_configs: dict[str, PipelineConfig] = {}
 
-# Version-specific data files
-STOPWORDS_PATH = VERSION_DATA_DIR / _config.get("stopwords_file", "stopwords.txt")
-PROTECTED_WORDS_PATH = VERSION_DATA_DIR / _config.get("protected_words_file", "protected_words.txt")
-PROPER_NOUNS_PATH = VERSION_DATA_DIR / _config.get("proper_nouns_file", "proper_nouns.txt")
 
-# Output files (version-specific)
-# Step 1-4: Word extraction and filtering
-RAW_WORDS_PATH = VERSION_OUTPUT_DIR / "step1_raw_words.json"
-FILTERED_STOPWORDS_PATH = VERSION_OUTPUT_DIR / "step2_filtered_stopwords.json"
-FILTERED_PROPER_NOUNS_PATH = VERSION_OUTPUT_DIR / "step3_filtered_proper_nouns.json"
-STEP4_VOCABULARY_PATH = VERSION_OUTPUT_DIR / "step4_vocabulary.json"
+def get_config(version: str | None = None) -> PipelineConfig:
+    """Cached configuration of ``version`` (default: $BIBLE_VERSION or niv)."""
+    if version is None:
+        version = os.environ.get("BIBLE_VERSION", DEFAULT_VERSION)
+    config = _configs.get(version)
+    if config is None:
+        config = _configs[version] = PipelineConfig(version)
+    return config
 
-# Step 5: Sentences extraction
-STEP5_VOCABULARY_PATH = VERSION_OUTPUT_DIR / "step5_vocabulary_with_sentences.json"
-STEP5_SENTENCES_PATH = VERSION_OUTPUT_DIR / "step5_sentences.json"
 
-# Final outputs (with version tag for external use)
-FINAL_VOCABULARY_PATH = VERSION_OUTPUT_DIR / f"final_vocabulary_{VERSION}.json"
-FINAL_SENTENCES_PATH = VERSION_OUTPUT_DIR / f"final_sentences_{VERSION}.json"
+# Old module-level constants -> PipelineConfig attributes
+_LEGACY_NAMES = {
+    "VERSION": "version",
+    "INTERMEDIATE_FORMAT": "intermediate_format",
+    "VERSION_NAME": "version_name",
+    "LANGUAGE": "language",
+    "VERSION_DATA_DIR": "version_data_dir",
+    "VERSION_OUTPUT_DIR": "version_output_dir",
+    "BIBLE_JSON_PATH": "bible_json_path",
+    "CORPUS_PATH": "corpus_path",
+    "STOPWORDS_PATH": "stopwords_path",
+    "PROTECTED_WORDS_PATH": "protected_words_path",
+    "PROPER_NOUNS_PATH": "proper_nouns_path",
+    "RAW_WORDS_PATH": "raw_words_path",
+    "SURFACE_LEMMAS_PATH": "surface_lemmas_path",
+    "BOOK_COUNTS_PATH": "book_counts_path",
+    "PHRASES_PATH": "phrases_path",
+    "FILTERED_STOPWORDS_PATH": "filtered_stopwords_path",
+    "FILTERED_PROPER_NOUNS_PATH": "filtered_proper_nouns_path",
+    "STEP4_VOCABULARY_PATH": "step4_vocabulary_path",
+    "STEP5_VOCABULARY_PATH": "step5_vocabulary_path",
+    "STEP5_SENTENCES_PATH": "step5_sentences_path",
+    "FINAL_VOCABULARY_PATH": "final_vocabulary_path",
+    "FINAL_SENTENCES_PATH": "final_sentences_path",
+    "FINAL_OUTPUT_PATH": "final_output_path",
+    "MIN_WORD_LENGTH": "min_word_length",
+    "MIN_FREQUENCY": "min_frequency",
+    "PROPER_NOUN_CAPITALIZED_RATIO": "proper_noun_capitalized_ratio",
+    "EXTRACT_PHRASES": "extract_phrases",
+    "FREQUENCY_RANKING": "frequency_ranking",
+    "RELATED_WORDS": "related_words",
+    "SENTENCE_ASSIGNMENT": "sentence_assignment",
+    "SENTENCE_RANKING": "sentence_ranking",
+}
 
-# Legacy alias (for backward compatibility)
-FINAL_OUTPUT_PATH = STEP4_VOCABULARY_PATH
 
-# Processing options
-MIN_WORD_LENGTH = _config.get("min_word_length", 2)
-MIN_FREQUENCY = _config.get("min_frequency", 1)
+def __getattr__(name: str) -> Any:
+    # Compatibility shim: ``from config import RAW_WORDS_PATH`` still works
+    attribute = _LEGACY_NAMES.get(name)
+    if attribute is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(get_config(), attribute)
 
 
-def print_config():
+def print_config(config: PipelineConfig | None = None):
     """Print current configuration."""
-    print(f"Version: {VERSION} ({VERSION_NAME})")
-    print(f"Language: {LANGUAGE}")
-    print(f"Source: {BIBLE_JSON_PATH}")
-    print(f"Output: {VERSION_OUTPUT_DIR}")
+    config = config or get_config()
+    print(f"Version: {config.version} ({config.version_name})")
+    print(f"Language: {config.language}")
+    print(f"Source: {config.bible_json_path}")
+    print(f"Output: {config.version_output_dir}")
@@ -0,0 +1,132 @@
+"""Related words of each vocabulary word from verse-level co-occurrence.
+
+Two words co-occur when they appear in the same verse. The binary
+verse x word incidence matrix X (built from the corpus with step 1's
+surface form table, like difficulty.py) gives every co-occurrence count
+at once as X^T X; the product is computed BLOCK_SIZE words at a time, so
+memory stays bounded by one block's rows rather than the full
+words x words matrix.
+
+Pairs seen in at least MIN_COOCCURRENCE verses are scored with logDice,
+14 + log2(2 f_xy / (f_x + f_y)) where f counts verses; it does not
+depend on corpus size and, unlike PMI, does not favour rare words. Each
+word keeps its best-scoring partners as its ``related`` list.
+
+    python cooccurrence.py -v niv shepherd lamb
+"""
+
+from __future__ import annotations
+
+from bible_corpus import Corpus
+from difficulty import SCIPY_AVAILABLE, incidence_matrix, string_ranks
+
+if SCIPY_AVAILABLE:
+    import numpy as np
+
+RELATED_WORDS = 10
+MIN_COOCCURRENCE = 3
+BLOCK_SIZE = 512
+
+
+def verse_incidence(corpus: Corpus, words: list[str], surface_lemmas: dict):
+    """Binary verse x word matrix (CSR) over ``words``, in list order."""
+    columns = {word: column for column, word in enumerate(words)}
+    matrix = incidence_matrix(corpus, string_ranks(corpus, columns, surface_lemmas))
+    # Column 0 counts non-vocabulary tokens; columns past it follow ``words``
+    matrix = matrix[:, 1:]
+    matrix.resize(matrix.shape[0], len(words))
+    matrix.data[:] = 1
+    return matrix.astype(np.int32)
+
+
+def related_words(
+    corpus: Corpus,
+    words: list[str],
+    surface_lemmas: dict,
+    limit: int = RELATED_WORDS,
+    min_count: int = MIN_COOCCURRENCE,
+) -> list[list[tuple[str, float, int]]]:
+    """(word, logDice, shared verses) of each word's best partners, best
+    first, in the order of ``words``."""
+    incidence = verse_incidence(corpus, words, surface_lemmas)
+    by_word = incidence.T.tocsr()
+    verse_counts = np.asarray(incidence.sum(axis=0)).ravel().astype(np.float64)
+
+    related: list[list[tuple[str, float, int]]] = []
+    for start in range(0, len(words), BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, len(words))
+        # Co-occurrence counts of this block's words with every word
+        block = (by_word[start:stop] @ incidence).tocoo()
+        rows = block.row.astype(np.int64)
+        columns = block.col.astype(np.int64)
+        counts = block.data
+
+        keep = (counts >= min_count) & (columns != rows + start)
+        rows, columns, counts = rows[keep], columns[keep], counts[keep]
+        scores = 14 + np.log2(2 * counts / (verse_counts[rows + start] + verse_counts[columns]))
+
+        # Best partners first; ties go to the more frequent (lower index) word
+        order = np.lexsort((columns, -scores, rows))
+        rows, columns, counts, scores = rows[order], columns[order], counts[order], scores[order]
+        row_starts = np.searchsorted(rows, np.arange(stop - start + 1))
+        for row in range(stop - start):
+            top = slice(row_starts[row], min(row_starts[row + 1], row_starts[row] + limit))
+            related.append([
+                (words[column], round(float(score), 2), int(count))
+                for column, score, count in zip(columns[top], scores[top], counts[top])
+            ])
+    return related
+
+
+def add_related(words: list, corpus: Corpus, surface_lemmas: dict, limit: int = RELATED_WORDS) -> list:
+    """Add each entry's ``related`` words (phrases have none)."""
+    if not SCIPY_AVAILABLE:
+        print("NumPy/SciPy not installed: skipping related words")
+        return words
+    vocabulary = [item["word"] for item in words]
+    with_related = 0
+    for item, partners in zip(words, related_words(corpus, vocabulary, surface_lemmas, limit)):
+        if not item.get("phrase"):
+            item["related"] = [word for word, _, _ in partners]
+            with_related += bool(partners)
+    print(f"Added related words to {with_related} of {len(words)} words")
+    return words
+
+
+def main():
+    import argparse
+    import time
+
+    from config import get_config
+    from extract_sentences import load_bible, load_surface_lemmas
+    from utils import load_json
+
+    parser = argparse.ArgumentParser(description="Words that share verses with step 4 vocabulary words")
+    parser.add_argument("--version", "-v", help="Bible version (default: $BIBLE_VERSION or niv)")
+    parser.add_argument("--limit", type=int, default=RELATED_WORDS, help="Related words per word")
+    parser.add_argument("words", nargs="*", help="Words to show (default: the 10 most frequent)")
+    args = parser.parse_args()
+
+    if not SCIPY_AVAILABLE:
+        raise SystemExit("Related words need NumPy and SciPy (pip install numpy scipy)")
+
+    config = get_config(args.version)
+    vocabulary = [item["word"] for item in load_json(config.step4_vocabulary_path)["words"]]
+    with load_bible(config) as corpus:
+        start = time.perf_counter()
+        related = related_words(corpus, vocabulary, load_surface_lemmas(config), args.limit)
+        elapsed = time.perf_counter() - start
+    print(f"{len(vocabulary)} words x {len(corpus)} verses in {elapsed:.2f}s")
+
+    positions = {word: i for i, word in enumerate(vocabulary)}
+    for word in args.words or vocabulary[:10]:
+        if word not in positions:
+            print(f"\n{word}: not in the vocabulary")
+            continue
+        print(f"\n{word}:")
+        for partner, score, count in related[positions[word]]:
+            print(f"  {partner:<16} logDice={score:5.2f}  verses={count}")
+
+
+if __name__ == "__main__":
+    main()
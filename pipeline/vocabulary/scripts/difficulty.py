@@ -0,0 +1,133 @@
+"""Learner difficulty of candidate example sentences.
+
+A verse is easy for a target word when most of its tokens are words a
+learner meets before the target: vocabulary words ranked at or above it
+(more frequent), or tokens that are not vocabulary at all (stopwords,
+names, numbers). The score of a (verse, word) pair is that share of the
+verse's tokens, from 0 to 1 (0 for a verse without tokens).
+
+All pairs are scored at once from one sparse verse x rank incidence
+matrix: column 0 counts a verse's non-vocabulary tokens and column r + 1
+its tokens of the rank-r word, so the known tokens for a target of rank r
+are the row's prefix sum up to column r + 1. Without NumPy/SciPy the
+same scores are computed token by token.
+"""
+
+from __future__ import annotations
+
+from array import array
+
+from bible_corpus import Corpus
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+
+def string_ranks(corpus: Corpus, word_ranks: dict, surface_lemmas: dict) -> list[int]:
+    """Vocabulary rank of each corpus string id (-1 for non-vocabulary strings)."""
+    ranks = []
+    for string in corpus.strings:
+        rank = word_ranks.get(surface_lemmas.get(string))
+        ranks.append(-1 if rank is None else rank)
+    return ranks
+
+
+def incidence_matrix(corpus: Corpus, token_ranks: list[int]):
+    """Sparse verse x (rank + 1) token counts (CSR, column indices sorted)."""
+    tokens = np.asarray(corpus.all_tokens, dtype=np.int64)
+    ends = np.asarray(corpus.token_ends(), dtype=np.int64)
+    token_counts = np.diff(ends, prepend=0)
+    rows = np.repeat(np.arange(len(corpus), dtype=np.int64), token_counts)
+    columns = np.asarray(token_ranks, dtype=np.int64)[tokens] + 1
+    n_columns = max(token_ranks, default=-1) + 2
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(tokens), dtype=np.int64), (rows, columns)),
+        shape=(len(corpus), n_columns),
+    )
+    matrix.sum_duplicates()
+    matrix.sort_indices()
+    return matrix
+
+
+def known_shares(
+    corpus: Corpus, token_ranks: list[int], verse_ids, ranks
+) -> list[float]:
+    """Known-token share of each (verse_ids[i], ranks[i]) pair."""
+    if not SCIPY_AVAILABLE:
+        return _known_shares_python(corpus, token_ranks, verse_ids, ranks)
+
+    matrix = incidence_matrix(corpus, token_ranks)
+    indptr, indices = matrix.indptr, matrix.indices
+    n_columns = matrix.shape[1]
+
+    # Running token count over all entries; row v's entries are
+    # indptr[v]:indptr[v + 1], so running[indptr[v]] is the count before row v
+    running = np.concatenate(([0], np.cumsum(matrix.data)))
+    entry_rows = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(indptr))
+    keys = entry_rows * n_columns + indices
+
+    verse_ids = np.asarray(verse_ids, dtype=np.int64)
+    # End of the row's entries up to the target's column
+    # Targets ranked after every corpus token (e.g. phrases) know the whole
+    # row; the column is clamped so the key stays inside the verse's row
+    columns = np.minimum(np.asarray(ranks, dtype=np.int64) + 1, n_columns - 1)
+    known_end = np.searchsorted(keys, verse_ids * n_columns + columns, side="right")
+    known = running[known_end] - running[indptr[verse_ids]]
+    total = running[indptr[verse_ids + 1]] - running[indptr[verse_ids]]
+    # A verse without tokens scores 0.0 (as in the pure Python path)
+    shares = np.divide(known, total, out=np.zeros(len(verse_ids)), where=total > 0)
+    return shares.tolist()
+
+
+def _known_shares_python(corpus, token_ranks, verse_ids, ranks) -> list[float]:
+    shares = []
+    for verse, rank in zip(verse_ids, ranks):
+        tokens = corpus.tokens(verse)
+        known = sum(1 for sid in tokens if token_ranks[sid] <= rank)
+        shares.append(known / len(tokens) if tokens else 0.0)
+    return shares
+
+
+def order_by_difficulty(
+    postings: dict, corpus: Corpus, word_ranks: dict, surface_lemmas: dict
+) -> dict:
+    """Reorder each word's candidate verses easiest first.
+
+    ``postings`` maps words to verse id arrays (SentenceIndex.postings);
+    candidates with equal scores keep their order. Returns a new dict of
+    verse id arrays.
+    """
+    token_ranks = string_ranks(corpus, word_ranks, surface_lemmas)
+    words = list(postings)
+    counts = [len(postings[word]) for word in words]
+    verse_ids = array("i")
+    ranks = array("i")
+    for word, count in zip(words, counts):
+        verse_ids.extend(postings[word])
+        ranks.extend([word_ranks[word]] * count)
+    shares = known_shares(corpus, token_ranks, verse_ids, ranks)
+
+    # Stable sorts: ties stay in the incoming (length, verse) order
+    if SCIPY_AVAILABLE:
+        groups = np.repeat(np.arange(len(words)), counts)
+        order = np.lexsort((-np.asarray(shares), groups))
+        ranked = array("i", np.asarray(verse_ids)[order].tobytes())
+    else:
+        ranked = array("i")
+        start = 0
+        for count in counts:
+            positions = sorted(range(start, start + count), key=lambda i: -shares[i])
+            ranked.extend(verse_ids[i] for i in positions)
+            start += count
+
+    ordered = {}
+    start = 0
+    for word, count in zip(words, counts):
+        ordered[word] = ranked[start:start + count]
+        start += count
+    return ordered
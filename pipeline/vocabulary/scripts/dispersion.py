@@ -0,0 +1,217 @@
+"""Per-book lemma counts and dispersion statistics.
+
+Step 1 counts tokens one book (scanner shard) at a time, so it keeps the
+per-book lemma counts as a books x lemmas matrix and writes it next to
+step1_raw_words.json:
+
+    output/{version}/step1_book_counts.npz
+
+The file is a CSR matrix in the layout of scipy.sparse.save_npz (int32
+counts; ``scipy.sparse.load_npz`` reads it), plus ``books`` and ``lemmas``
+arrays naming the rows and columns. Columns follow step 1's word order.
+
+Dispersion statistics are computed over all lemmas at once from the CSR
+arrays (books are the corpus parts):
+
+- range: number of books a lemma occurs in
+- Juilland's D: 1 - V / sqrt(n - 1), V the coefficient of variation of
+  the lemma's relative frequency across the n books (1 = perfectly even,
+  0 = a single book)
+- adjusted frequency: count x D (Juilland's U)
+
+    python dispersion.py -v niv                 # most/least evenly spread words
+    python dispersion.py -v niv shepherd lamb   # per-book frequencies
+"""
+
+from __future__ import annotations
+
+import os
+import zipfile
+from pathlib import Path
+from typing import NamedTuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Fixed zip entry timestamps, so unchanged counts give identical files
+_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+class Dispersion(NamedTuple):
+    """Per-lemma statistics, arrays in column (lemma) order."""
+
+    frequency: np.ndarray
+    range: np.ndarray
+    juilland_d: np.ndarray
+    adjusted_frequency: np.ndarray
+
+
+class BookCounts:
+    """Books x lemmas token count matrix (CSR arrays)."""
+
+    def __init__(self, books: list[str], lemmas: list[str], indptr, indices, data):
+        self.books = list(books)
+        self.lemmas = list(lemmas)
+        self.indptr = np.asarray(indptr, dtype=np.int32)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.int32)
+        self.lemma_ids = {lemma: i for i, lemma in enumerate(self.lemmas)}
+        # Book (row) of every stored entry
+        self._rows = np.repeat(np.arange(len(self.books)), np.diff(self.indptr))
+
+    @classmethod
+    def from_counters(cls, books: list[str], counters: list, lemmas: list[str]) -> BookCounts:
+        """Build from one lemma -> count mapping per book."""
+        lemma_ids = {lemma: i for i, lemma in enumerate(lemmas)}
+        indptr = [0]
+        indices = []
+        data = []
+        for counts in counters:
+            row = sorted((lemma_ids[lemma], count) for lemma, count in counts.items() if count)
+            indices.extend(column for column, _ in row)
+            data.extend(count for _, count in row)
+            indptr.append(len(indices))
+        return cls(books, lemmas, indptr, indices, data)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.books), len(self.lemmas)
+
+    def book_sizes(self) -> np.ndarray:
+        """Tokens counted per book."""
+        return np.bincount(self._rows, weights=self.data, minlength=len(self.books))
+
+    def dispersion(self) -> Dispersion:
+        """Range, Juilland's D and adjusted frequency of every lemma."""
+        n_books, n_lemmas = self.shape
+        sizes = self.book_sizes()
+        relative = self.data / sizes[self._rows]
+
+        frequency = np.bincount(self.indices, weights=self.data, minlength=n_lemmas)
+        book_range = np.bincount(self.indices, minlength=n_lemmas)
+        # Mean and standard deviation over all books, zeros included
+        mean = np.bincount(self.indices, weights=relative, minlength=n_lemmas) / n_books
+        mean_square = np.bincount(self.indices, weights=relative**2, minlength=n_lemmas) / n_books
+        std = np.sqrt(np.maximum(mean_square - mean**2, 0.0))
+
+        if n_books > 1:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                variation = np.where(mean > 0, std / mean, np.sqrt(n_books - 1))
+            juilland_d = np.clip(1 - variation / np.sqrt(n_books - 1), 0.0, 1.0)
+        else:
+            juilland_d = np.ones(n_lemmas)
+
+        return Dispersion(frequency.astype(np.int64), book_range, juilland_d, frequency * juilland_d)
+
+    def book_frequencies(self, lemma: str) -> dict[str, tuple[int, float]]:
+        """Book -> (count, occurrences per million tokens) of one lemma,
+        for the books it occurs in."""
+        column = self.lemma_ids.get(lemma)
+        if column is None:
+            return {}
+        entries = np.flatnonzero(self.indices == column)
+        rows = self._rows[entries]
+        counts = self.data[entries]
+        per_million = counts / self.book_sizes()[rows] * 1e6
+        return {
+            self.books[row]: (int(count), float(rate))
+            for row, count, rate in zip(rows, counts, per_million)
+        }
+
+    def save(self, path: Path) -> None:
+        """Write as a scipy.sparse.save_npz-compatible .npz (deterministic)."""
+        arrays = {
+            "format": np.array("csr"),
+            "shape": np.array(self.shape, dtype=np.int64),
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "data": self.data,
+            "books": np.array(self.books, dtype=str),
+            "lemmas": np.array(self.lemmas, dtype=str),
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, array in arrays.items():
+                info = zipfile.ZipInfo(f"{name}.npy", date_time=_ZIP_DATE)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, "w") as f:
+                    np.lib.format.write_array(f, array, allow_pickle=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> BookCounts:
+        with np.load(path, allow_pickle=False) as archive:
+            return cls(
+                archive["books"].tolist(),
+                archive["lemmas"].tolist(),
+                archive["indptr"],
+                archive["indices"],
+                archive["data"],
+            )
+
+
+def load_book_counts(path: Path) -> BookCounts:
+    """Load step 1's per-book counts (requires NumPy)."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Per-book counts need NumPy (pip install numpy)")
+    if not path.exists():
+        raise FileNotFoundError(f"Per-book counts not found: {path} (run step 1 first)")
+    return BookCounts.load(path)
+
+
+def main():
+    import argparse
+    import time
+
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description="Per-book frequencies and dispersion of step 1 lemmas")
+    parser.add_argument("--version", "-v", help="Bible version (default: $BIBLE_VERSION or niv)")
+    parser.add_argument("--top", type=int, default=15, help="Words to list in the summary")
+    parser.add_argument("--min-count", type=int, default=50, help="Minimum count for the summary lists")
+    parser.add_argument("lemmas", nargs="*", help="Lemmas to show per-book frequencies for")
+    args = parser.parse_args()
+
+    config = get_config(args.version)
+    start = time.perf_counter()
+    counts = load_book_counts(config.book_counts_path)
+    stats = counts.dispersion()
+    elapsed = time.perf_counter() - start
+    n_books, n_lemmas = counts.shape
+    print(f"{n_books} books x {n_lemmas} lemmas, {len(counts.data)} non-zero "
+          f"(loaded + dispersion in {elapsed * 1000:.1f}ms)")
+
+    if not args.lemmas:
+        frequent = np.flatnonzero(stats.frequency >= args.min_count)
+        by_d = frequent[np.argsort(stats.juilland_d[frequent], kind="stable")]
+        for title, columns in (
+            ("Most evenly spread", by_d[::-1][:args.top]),
+            ("Most concentrated", by_d[:args.top]),
+        ):
+            print(f"\n{title} (count >= {args.min_count}):")
+            for column in columns:
+                print(f"  {counts.lemmas[column]:<16} D={stats.juilland_d[column]:.3f}  "
+                      f"count={stats.frequency[column]}  books={stats.range[column]}")
+        return
+
+    for lemma in args.lemmas:
+        column = counts.lemma_ids.get(lemma)
+        if column is None:
+            print(f"\n{lemma}: not found")
+            continue
+        start = time.perf_counter()
+        books = counts.book_frequencies(lemma)
+        elapsed = time.perf_counter() - start
+        print(f"\n{lemma}: count={stats.frequency[column]}  books={stats.range[column]}  "
+              f"D={stats.juilland_d[column]:.3f}  adjusted={stats.adjusted_frequency[column]:.1f}"
+              f"  ({elapsed * 1000:.2f}ms)")
+        for book, (count, rate) in sorted(books.items(), key=lambda item: -item[1][1]):
+            print(f"  {book:<18} {count:>6}  {rate:>9.1f} per million")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Step 1b (optional): Extract multi-word expressions.
+
+Finds fixed phrases ("son of man", "burnt offering", "bow down") that the
+single-lemma word list splits into parts or loses to the stopword filter.
+Enabled with "extract_phrases": true in configs/<version>.json; step 4
+then adds the phrases to the word list with their own counts.
+
+Counting is one streaming pass over the corpus, one book at a time, with
+memory bounded independently of the number of distinct n-grams:
+
+- lemma counts are exact (one counter per lemma)
+- 2-4 lemma n-grams are counted in a count-min sketch: SKETCH_DEPTH rows
+  of SKETCH_WIDTH counters; an n-gram adds 1 to one counter per row
+  (multiply-shift hashes) and its estimate is the smallest of those
+  counters, never below its true count
+- n-grams whose estimate reaches MIN_PHRASE_COUNT become candidates; at
+  most MAX_CANDIDATES are kept (the lowest estimates are dropped)
+
+N-grams do not cross verses or numbers. Candidates must start with a
+content word and end with a content word or a particle (PARTICLES), are
+scored by PMI and by Dunning's log-likelihood of their first n - 1 lemmas
+being followed by the last, and the best MAX_PHRASES with PMI >= MIN_PMI
+are written to step1b_phrases.json.
+"""
+
+from __future__ import annotations
+
+import math
+
+from bible_corpus import Corpus, load_corpus
+from config import PipelineConfig, get_config
+from filter_stopwords import load_stopwords
+from scanner import book_shards
+from utils import load_json, save_json
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MIN_PHRASE_LENGTH = 2
+MAX_PHRASE_LENGTH = 4
+MIN_PHRASE_COUNT = 5
+MIN_PMI = 3.0
+MAX_PHRASES = 300
+
+SKETCH_WIDTH = 1 << 20
+SKETCH_DEPTH = 4
+MAX_CANDIDATES = 100_000
+
+# Stopwords still allowed as the last word (phrasal verbs: "cast out")
+PARTICLES = frozenset({"up", "down", "out", "off", "away", "back", "over", "forth"})
+
+# An n-gram key packs lemma id + 1 of each word into 16-bit slots (0 = no word)
+_SLOT_BITS = 16
+_MAX_LEMMAS = (1 << _SLOT_BITS) - 1
+
+
+class CountMinSketch:
+    """Approximate counts of uint64 keys in fixed memory."""
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, seed: int = 0):
+        if width & (width - 1):
+            raise ValueError("Sketch width must be a power of two")
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+        self._shift = np.uint64(64 - (width.bit_length() - 1))
+        # Odd random multipliers, fixed by the seed so runs are reproducible
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 1 << 63, size=depth, dtype=np.uint64) | np.uint64(1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    def _buckets(self, keys):
+        return (keys[np.newaxis, :] * self._multipliers[:, np.newaxis]) >> self._shift
+
+    def add(self, keys) -> None:
+        for row, buckets in zip(self.table, self._buckets(keys)):
+            np.add.at(row, buckets, 1)
+
+    def estimate(self, keys):
+        buckets = self._buckets(keys)
+        return self.table[np.arange(len(self.table))[:, np.newaxis], buckets].min(axis=0)
+
+
+def ngram_keys(lemma_ids, verse_of, n: int):
+    """Keys of the n-grams starting at each position (0 where invalid)."""
+    count = len(lemma_ids) - n + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    valid = verse_of[:count] == verse_of[n - 1:]
+    keys = np.zeros(count, dtype=np.uint64)
+    for j in range(n):
+        window = lemma_ids[j:j + count]
+        valid &= window >= 0
+        shift = np.uint64(_SLOT_BITS * (MAX_PHRASE_LENGTH - 1 - j))
+        keys |= (window + 1).astype(np.uint64) << shift
+    keys[~valid] = 0
+    return keys
+
+
+def decode_keys(keys) -> tuple[list, object]:
+    """(lemma id arrays per word position, n-gram length) of packed keys."""
+    slots = [
+        (keys >> np.uint64(_SLOT_BITS * (MAX_PHRASE_LENGTH - 1 - j))).astype(np.int64) & _MAX_LEMMAS
+        for j in range(MAX_PHRASE_LENGTH)
+    ]
+    lengths = sum((slot > 0).astype(np.int64) for slot in slots)
+    return [slot - 1 for slot in slots], lengths
+
+
+class PhraseCounter:
+    """One pass of exact lemma counts and sketched n-gram counts."""
+
+    def __init__(self, n_lemmas: int, allowed_first, allowed_last, sketch: CountMinSketch):
+        if n_lemmas > _MAX_LEMMAS:
+            raise ValueError(f"Too many lemmas for 16-bit n-gram keys: {n_lemmas}")
+        self.lemma_counts = np.zeros(n_lemmas, dtype=np.int64)
+        self.allowed_first = allowed_first
+        self.allowed_last = allowed_last
+        self.sketch = sketch
+        self.candidates = np.zeros(0, dtype=np.uint64)
+        self.n_ngrams = 0
+
+    def add_tokens(self, lemma_ids, verse_of) -> None:
+        """Count one shard: lemma ids of its tokens (-1 for numbers) and
+        the verse of each token."""
+        self.lemma_counts += np.bincount(lemma_ids[lemma_ids >= 0], minlength=len(self.lemma_counts))
+        for n in range(MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH + 1):
+            keys = ngram_keys(lemma_ids, verse_of, n)
+            starts = np.flatnonzero(keys)
+            keys = keys[starts]
+            self.n_ngrams += len(keys)
+            self.sketch.add(keys)
+
+            # Admit phrase-shaped n-grams that reached the minimum so far
+            shaped = self.allowed_first[lemma_ids[starts]] & self.allowed_last[lemma_ids[starts + n - 1]]
+            keys = np.unique(keys[shaped])
+            keys = keys[self.sketch.estimate(keys) >= MIN_PHRASE_COUNT]
+            self.candidates = np.union1d(self.candidates, keys)
+
+        if len(self.candidates) > MAX_CANDIDATES:
+            estimates = self.sketch.estimate(self.candidates)
+            keep = np.argpartition(-estimates.astype(np.int64), MAX_CANDIDATES)[:MAX_CANDIDATES]
+            self.candidates = np.sort(self.candidates[keep])
+
+    def score(self) -> list[dict]:
+        """Score the candidates; best first by log-likelihood."""
+        keys = self.candidates
+        counts = self.sketch.estimate(keys).astype(np.float64)
+        slots, lengths = decode_keys(keys)
+        total = float(self.lemma_counts.sum())
+        lemma_counts = self.lemma_counts.astype(np.float64)
+
+        # PMI = log2(c(w1..wn) N^(n-1) / prod c(wi))
+        pmi = np.log2(counts) + (lengths - 1) * math.log2(total)
+        for j, slot in enumerate(slots):
+            present = j < lengths
+            pmi -= np.where(present, np.log2(lemma_counts[np.maximum(slot, 0)]), 0.0)
+
+        # Log-likelihood of the prefix w1..wn-1 followed by wn
+        last = np.choose(lengths - 1, slots)
+        last_shift = (_SLOT_BITS * (MAX_PHRASE_LENGTH - lengths)).astype(np.uint64)
+        prefix_keys = keys & ~(np.uint64(_MAX_LEMMAS) << last_shift)
+        prefix_counts = np.where(
+            lengths == 2,
+            lemma_counts[slots[0]],
+            self.sketch.estimate(prefix_keys).astype(np.float64),
+        )
+        llr = log_likelihood(counts, prefix_counts, lemma_counts[last], total)
+
+        chosen = np.flatnonzero(pmi >= MIN_PMI)
+        chosen = chosen[np.argsort(-llr[chosen], kind="stable")]
+        return [
+            {
+                "lemma_ids": [int(slots[j][i]) for j in range(lengths[i])],
+                "count": int(counts[i]),
+                "pmi": round(float(pmi[i]), 2),
+                "llr": round(float(llr[i]), 1),
+            }
+            for i in chosen
+        ]
+
+
+def log_likelihood(joint, first, second, total):
+    """Dunning's G2 of a 2x2 contingency table, vectorized."""
+
+    def xlogx(x):
+        x = np.maximum(x, 0.0)
+        return np.where(x > 0, x * np.log(np.where(x > 0, x, 1.0)), 0.0)
+
+    cells = (joint, first - joint, second - joint, total - first - second + joint)
+    return 2 * (
+        sum(xlogx(cell) for cell in cells)
+        - xlogx(first) - xlogx(total - first)
+        - xlogx(second) - xlogx(total - second)
+        + xlogx(np.float64(total))
+    )
+
+
+def drop_nested(phrases: list[dict]) -> list[dict]:
+    """Drop phrases that almost only occur inside a longer kept phrase
+    ("son of" within "son of man")."""
+    counts = {tuple(p["lemmas"]): p["count"] for p in phrases}
+    nested = set()
+    for phrase in phrases:
+        lemmas = tuple(phrase["lemmas"])
+        for n in range(MIN_PHRASE_LENGTH, len(lemmas)):
+            for i in range(len(lemmas) - n + 1):
+                part = lemmas[i:i + n]
+                if part in counts and counts[part] <= 1.25 * phrase["count"]:
+                    nested.add(part)
+    return [p for p in phrases if tuple(p["lemmas"]) not in nested]
+
+
+def extract_phrases(corpus: Corpus, surface_lemmas: dict, stopwords: set) -> tuple[list[dict], dict]:
+    """Phrase candidates of a corpus and counting statistics."""
+    lemmas = sorted(set(surface_lemmas.values()))
+    lemma_ids = {lemma: i for i, lemma in enumerate(lemmas)}
+    # Corpus string id -> lemma id, -1 for strings step 1 does not count
+    string_lemmas = np.array(
+        [lemma_ids.get(surface_lemmas.get(string), -1) for string in corpus.strings], dtype=np.int64
+    )
+    content = np.array([lemma not in stopwords for lemma in lemmas] + [False], dtype=bool)
+    last_ok = content | np.array([lemma in PARTICLES for lemma in lemmas] + [False], dtype=bool)
+
+    counter = PhraseCounter(len(lemmas), content, last_ok, CountMinSketch())
+    token_ends = np.asarray(corpus.token_ends(), dtype=np.int64)
+    for start, stop in book_shards(corpus):
+        tokens = np.asarray(corpus.tokens_between(start, stop), dtype=np.int64)
+        first_token = token_ends[start - 1] if start else 0
+        verse_of = np.repeat(np.arange(start, stop), np.diff(token_ends[start:stop], prepend=first_token))
+        counter.add_tokens(string_lemmas[tokens], verse_of)
+
+    phrases = counter.score()
+    for phrase in phrases:
+        phrase["lemmas"] = [lemmas[i] for i in phrase.pop("lemma_ids")]
+    phrases = drop_nested(phrases)[:MAX_PHRASES]
+
+    stats = {
+        "tokens": int(counter.lemma_counts.sum()),
+        "ngrams": counter.n_ngrams,
+        "candidates": len(counter.candidates),
+        "sketch_bytes": counter.sketch.nbytes,
+    }
+    return phrases, stats
+
+
+def build_output(phrases: list[dict], stats: dict) -> dict:
+    """Build the step 1b output structure."""
+    return {
+        "metadata": {
+            "step": "phrase_extraction",
+            "total_phrases": len(phrases),
+            "ngram_lengths": [MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH],
+            "min_count": MIN_PHRASE_COUNT,
+            "min_pmi": MIN_PMI,
+            "ngrams_counted": stats["ngrams"],
+            "sketch": {"width": SKETCH_WIDTH, "depth": SKETCH_DEPTH},
+        },
+        "phrases": [
+            {
+                "phrase": " ".join(phrase["lemmas"]),
+                "lemmas": phrase["lemmas"],
+                "count": phrase["count"],
+                "pmi": phrase["pmi"],
+                "llr": phrase["llr"],
+            }
+            for phrase in phrases
+        ],
+    }
+
+
+def run(corpus: Corpus | None = None, config: PipelineConfig | None = None) -> dict:
+    """Run step 1b and return its output (always written; step 4 reads it).
+
+    Reads step 1's surface form table, so step 1 must have run.
+    """
+    print("=== Step 1b: Extract Phrases ===")
+    config = config or get_config()
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Phrase extraction needs NumPy (pip install numpy)")
+    if corpus is None:
+        corpus = load_corpus(config.bible_json_path, config.corpus_path)
+    surface_path = config.surface_lemmas_path
+    if not surface_path.exists():
+        raise FileNotFoundError(f"Surface form table not found: {surface_path} (run step 1 first)")
+    surface_lemmas = load_json(surface_path)["lemmas"]
+
+    phrases, stats = extract_phrases(corpus, surface_lemmas, load_stopwords(config))
+    output = build_output(phrases, stats)
+    save_json(config.phrases_path, output)
+
+    print(f"Counted {stats['ngrams']} n-grams over {stats['tokens']} tokens "
+          f"(sketch {stats['sketch_bytes'] / 2**20:.0f} MB, {stats['candidates']} candidates)")
+    print(f"Saved {len(phrases)} phrases to {config.phrases_path}")
+    print("\nTop 20 phrases:")
+    for phrase in output["phrases"][:20]:
+        print(f"  {phrase['phrase']}: {phrase['count']} (PMI {phrase['pmi']}, G2 {phrase['llr']})")
+
+    return output
+
+
+def main():
+    run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,37 @@
 """Step 5: Extract example sentences for each word.
 
 Finds Bible verses containing vocabulary words for example usage.
+Candidate verses come from the version's posting index (posting_index.py,
+built with step 1's tokenizer and lemmatizer), so a verse is an example
+of a word exactly when step 1 counted the word in it.
+
+Candidates are ranked easiest first (``sentence_ranking``: "difficulty",
+the default): by the share of the verse's tokens a learner of the word
+already knows, see difficulty.py. "length" ranks by length alone.
+
+Two assignment modes (``sentence_assignment`` in configs/<version>.json,
+or --assignment):
+
+- greedy (default): words in rank order each take their best sentences,
+  preferring sentences not yet used
+- cover: all words at once, as a weighted set cover that picks few,
+  short verses serving many words; every word still gets as many
+  sentences from as many different books as in greedy mode, with far
+  fewer distinct sentences to translate and ship
 """
 
 from __future__ import annotations
 
-import json
-import re
-from collections import defaultdict
+import argparse
+import heapq
+from array import array
+from typing import NamedTuple
 
-from config import (
-    BIBLE_JSON_PATH,
-    STEP4_VOCABULARY_PATH,
-    STEP5_VOCABULARY_PATH,
-    STEP5_SENTENCES_PATH,
-    VERSION_NAME,
-)
-from word_forms import get_word_variants
+from bible_corpus import Corpus, load_corpus
+from difficulty import order_by_difficulty
+from config import PipelineConfig, get_config
+from posting_index import PostingIndex, load_index
+from utils import load_json, save_json
 
 # Sentence selection parameters
 MIN_SENTENCES_PER_WORD = 1
@@ -24,17 +39,26 @@ MAX_SENTENCES_PER_WORD = 5
 MAX_SENTENCE_LENGTH = 300
 MIN_SENTENCE_LENGTH = 30
 
+ASSIGNMENT_MODES = ("greedy", "cover")
+RANKING_MODES = ("difficulty", "length")
 
-def load_bible() -> dict:
-    """Load Bible JSON file."""
-    with open(BIBLE_JSON_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
 
+def load_bible(config: PipelineConfig) -> Corpus:
+    """Load the Bible as a compiled corpus."""
+    return load_corpus(config.bible_json_path, config.corpus_path)
 
-def load_vocabulary() -> dict:
+
+def load_vocabulary(config: PipelineConfig) -> dict:
     """Load processed vocabulary from step 4."""
-    with open(STEP4_VOCABULARY_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(config.step4_vocabulary_path)
+
+
+def load_surface_lemmas(config: PipelineConfig) -> dict:
+    """Load step 1's surface form -> lemma table."""
+    path = config.surface_lemmas_path
+    if not path.exists():
+        raise FileNotFoundError(f"Surface form table not found: {path} (run step 1 first)")
+    return load_json(path)["lemmas"]
 
 
 def generate_sentence_id(book: str, chapter: str, verse: str) -> str:
@@ -43,144 +67,287 @@ def generate_sentence_id(book: str, chapter: str, verse: str) -> str:
     return f"{book_short}-{chapter}-{verse}"
 
 
-def extract_words_from_text(text: str) -> set:
-    """Extract all words from text."""
-    # Remove punctuation and split
-    words = re.findall(r"\b[a-zA-Z]+\b", text.lower())
-    return set(words)
+class SentenceIndex(NamedTuple):
+    """Candidate verses per word, as corpus verse ids.
 
+    ``postings`` maps a word to an array of verse ids in rank order (by
+    length, ties in canonical verse order, unless reordered by
+    order_by_difficulty); ``lengths`` and ``books`` are indexed
+    by verse id (book as its corpus string id). Sentence ids and texts are
+    only built for the verses that end up selected.
+    """
 
-def build_inverted_index(bible: dict, vocabulary_words: set) -> tuple[dict, dict]:
-    """Build inverted index: word -> list of sentence_ids.
-
-    Also builds all_sentences dict with sentence metadata.
-    Much faster than searching each sentence for each word.
+    postings: dict[str, array]
+    lengths: array
+    books: array
+    n_sentences: int
+
+
+def phrase_verses(posting_index: PostingIndex, lemmas: list[str], usable=None) -> list[int]:
+    """Ids of the verses containing ``lemmas`` as consecutive tokens,
+    ascending (only verses with ``usable[verse]`` true, when given)."""
+    # Verses with every lemma (set operations, starting from the rarest),
+    # then the token positions of those only
+    candidates = set(posting_index.verses(min(lemmas, key=posting_index.document_frequency)))
+    for lemma in set(lemmas):
+        candidates.intersection_update(posting_index.verses(lemma))
+    candidates = sorted(verse for verse in candidates if usable is None or usable[verse])
+
+    first, *rest = [posting_index.positions_in(lemma, candidates) for lemma in lemmas]
+    verses = []
+    for i, verse in enumerate(candidates):
+        following = [set(positions[i]) for positions in rest]
+        if any(all(start + k in positions for k, positions in enumerate(following, 1)) for start in first[i]):
+            verses.append(verse)
+    return verses
+
+
+def build_inverted_index(
+    corpus: Corpus, vocabulary_words: set, posting_index: PostingIndex
+) -> SentenceIndex:
+    """Build inverted index: word -> candidate verse ids.
+
+    Each word's verses are read from the posting index and kept when the
+    verse is usable as an example (MIN/MAX_SENTENCE_LENGTH), ordered by
+    sentence length, ties in canonical verse order, which is the order
+    select_sentences_for_word ranks them in. Phrases (step 1b, words with
+    spaces) match verses containing their lemma sequence.
     """
     print("Building inverted index...")
-
-    # Get all word variants we need to search for
-    all_variants = {}  # variant -> original word
-    for word in vocabulary_words:
-        for variant in get_word_variants(word):
-            if variant not in all_variants:
-                all_variants[variant] = word
-            # If variant maps to itself, prefer that
-            if variant == word:
-                all_variants[variant] = word
-
     print(f"  Vocabulary words: {len(vocabulary_words)}")
-    print(f"  Total variants to search: {len(all_variants)}")
-
-    # word -> [(sentence_id, length, book), ...]
-    word_to_sentences = defaultdict(list)
-    all_sentences = {}
 
-    for book, chapters in bible.items():
-        for chapter_num, verses in chapters.items():
-            for verse_num, text in verses.items():
-                length = len(text)
-
-                # Skip very long or short sentences
-                if length > MAX_SENTENCE_LENGTH or length < MIN_SENTENCE_LENGTH:
-                    continue
-
-                sentence_id = generate_sentence_id(book, chapter_num, verse_num)
-
-                # Store sentence data
-                all_sentences[sentence_id] = {
-                    "text": text,
-                    "ref": f"{book} {chapter_num}:{verse_num}",
-                    "book": book,
-                    "length": length,
-                }
-
-                # Extract words from this sentence
-                sentence_words = extract_words_from_text(text)
+    # Usable verses in candidate order, as one rank per verse (-1 = unusable),
+    # instead of sorting by length again for every word
+    n_verses = len(corpus)
+    lengths = array("i", bytes(4 * n_verses))
+    books = array("i", bytes(4 * n_verses))
+    is_usable = bytearray(n_verses)
+    usable = []
+    for index in range(n_verses):
+        length = posting_index.verse_length(index)
+
+        # Skip very long or short sentences
+        if length > MAX_SENTENCE_LENGTH or length < MIN_SENTENCE_LENGTH:
+            continue
+
+        lengths[index] = length
+        books[index] = corpus.book_id(index)
+        is_usable[index] = 1
+        usable.append(index)
+    usable.sort(key=lengths.__getitem__)
+    order = array("i", [-1]) * n_verses
+    for rank, index in enumerate(usable):
+        order[index] = rank
+
+    postings = {}
+    for word in vocabulary_words:
+        if " " in word:
+            verses = phrase_verses(posting_index, word.split(), is_usable)
+        else:
+            verses = posting_index.verses(word)
+        candidates = [index for index in verses if is_usable[index]]
+        if candidates:
+            candidates.sort(key=order.__getitem__)
+            postings[word] = array("i", candidates)
 
-                # Check which vocabulary words appear in this sentence
-                for sent_word in sentence_words:
-                    if sent_word in all_variants:
-                        original_word = all_variants[sent_word]
-                        word_to_sentences[original_word].append({
-                            "id": sentence_id,
-                            "length": length,
-                            "book": book,
-                        })
+    print(f"  Sentences indexed: {len(usable)}")
+    print(f"  Words with matches: {len(postings)}")
 
-    print(f"  Sentences indexed: {len(all_sentences)}")
-    print(f"  Words with matches: {len(word_to_sentences)}")
+    return SentenceIndex(postings, lengths, books, len(usable))
 
-    return word_to_sentences, all_sentences
 
+def select_sentences_for_word(
+    candidates: array, used_sentences: set, books: array
+) -> list[int]:
+    """Select best sentences (verse ids) from candidates.
 
-def select_sentences_for_word(candidates: list, used_sentences: set) -> list:
-    """Select best sentences from candidates."""
+    ``candidates`` come from SentenceIndex.postings, best first (easiest,
+    or shortest), and ``books`` is SentenceIndex.books. The ranking prefers
+    unused sentences, then the candidate order; the best sentence of each book is taken first
+    (diversity), then the remaining slots are filled with the best
+    sentences left. Scans stop as soon as the slots are full, so frequent
+    words cost about as much as rare ones.
+    """
     if not candidates:
         return []
 
-    # Sort by: prefer unused, then shorter sentences
-    candidates.sort(key=lambda x: (x["id"] in used_sentences, x["length"]))
-
-    # Select diverse sentences (try to pick from different books)
     selected = []
     selected_books = set()
+    # Used sentences rank after all unused ones; only reached if the unused
+    # ones cannot fill the slots
+    used_candidates = []
 
     # First pass: pick from different books
-    for candidate in candidates:
-        if len(selected) >= MAX_SENTENCES_PER_WORD:
-            break
-        if candidate["book"] not in selected_books:
-            selected.append(candidate["id"])
-            selected_books.add(candidate["book"])
+    for verse in candidates:
+        if verse in used_sentences:
+            used_candidates.append(verse)
+        elif books[verse] not in selected_books:
+            selected.append(verse)
+            selected_books.add(books[verse])
+            if len(selected) >= MAX_SENTENCES_PER_WORD:
+                return selected
+    for verse in used_candidates:
+        if books[verse] not in selected_books:
+            selected.append(verse)
+            selected_books.add(books[verse])
+            if len(selected) >= MAX_SENTENCES_PER_WORD:
+                return selected
 
     # Second pass: fill remaining slots
-    for candidate in candidates:
-        if len(selected) >= MAX_SENTENCES_PER_WORD:
-            break
-        if candidate["id"] not in selected:
-            selected.append(candidate["id"])
+    chosen = set(selected)
+    for group in (
+        (verse for verse in candidates if verse not in used_sentences),
+        used_candidates,
+    ):
+        for verse in group:
+            if verse not in chosen:
+                selected.append(verse)
+                chosen.add(verse)
+                if len(selected) >= MAX_SENTENCES_PER_WORD:
+                    return selected
 
     return selected
 
 
-def extract_sentences(vocabulary: dict, bible: dict) -> tuple[dict, dict]:
-    """Extract sentences for all vocabulary words."""
+def assign_greedy(words: list, index: SentenceIndex) -> list[list[int]]:
+    """Select sentences word by word in rank order (verse ids per word)."""
+    used_sentences = set()
+    selections = []
+    for word in words:
+        selected = select_sentences_for_word(index.postings.get(word, ()), used_sentences, index.books)
+        if len(selected) >= MIN_SENTENCES_PER_WORD:
+            used_sentences.update(selected)
+        selections.append(selected)
+    return selections
+
+
+def assign_cover(words: list, index: SentenceIndex) -> list[list[int]]:
+    """Select sentences for all words together (verse ids per word).
+
+    Lazy-greedy weighted set cover: a verse serves every word it contains
+    that still has free slots, and costs 1 + length / MAX_SENTENCE_LENGTH,
+    so short verses are preferred. Verses are taken in order of words
+    served per cost; a popped verse whose gain has dropped is pushed back
+    with its current ratio instead of rescoring the whole queue.
+
+    Each word gets min(MAX_SENTENCES_PER_WORD, candidates) sentences from
+    min(that, books available) different books, like select_sentences_for_word.
+    """
+    postings, lengths, books = index.postings, index.lengths, index.books
+
+    need = {}  # word -> sentences to select
+    distinct_books = {}  # word -> different books to cover
+    verse_words = {}  # verse id -> words it can serve
+    for word in words:
+        candidates = postings.get(word, ())
+        if len(candidates) < MIN_SENTENCES_PER_WORD:
+            continue
+        need[word] = min(MAX_SENTENCES_PER_WORD, len(candidates))
+        distinct_books[word] = min(need[word], len({books[verse] for verse in candidates}))
+        for verse in candidates:
+            verse_words.setdefault(verse, []).append(word)
+
+    chosen = {word: [] for word in need}
+    chosen_books = {word: set() for word in need}
+
+    def can_serve(word: str, verse: int) -> bool:
+        slots = need[word] - len(chosen[word])
+        if slots <= 0:
+            return False
+        if books[verse] not in chosen_books[word]:
+            return True
+        # A repeated book only while the remaining slots can still cover
+        # the books this word is missing
+        return slots > distinct_books[word] - len(chosen_books[word])
+
+    def cost(verse: int) -> float:
+        return 1 + lengths[verse] / MAX_SENTENCE_LENGTH
+
+    # Gains only shrink as words fill up, so stale heap entries are upper bounds
+    heap = [(-len(served) / cost(verse), verse) for verse, served in verse_words.items()]
+    heapq.heapify(heap)
+    while heap:
+        _, verse = heapq.heappop(heap)
+        served = [word for word in verse_words[verse] if can_serve(word, verse)]
+        if not served:
+            continue
+        ratio = len(served) / cost(verse)
+        if heap and ratio < -heap[0][0]:
+            heapq.heappush(heap, (-ratio, verse))
+            continue
+        for word in served:
+            chosen[word].append(verse)
+            chosen_books[word].add(books[verse])
+
+    # In each word's candidate order
+    selections = []
+    for word in words:
+        selected = set(chosen.get(word, ()))
+        selections.append([verse for verse in postings.get(word, ()) if verse in selected])
+    return selections
+
+
+def extract_sentences(
+    vocabulary: dict,
+    corpus: Corpus,
+    surface_lemmas: dict,
+    posting_index: PostingIndex,
+    assignment: str = "greedy",
+    ranking: str = "difficulty",
+) -> tuple[dict, dict]:
+    """Extract sentences for all vocabulary words.
+
+    ``posting_index`` supplies the candidate verses; ``surface_lemmas``
+    (step 1's table) is used to rank them by difficulty.
+    """
+    if assignment not in ASSIGNMENT_MODES:
+        raise ValueError(f"Unknown sentence assignment {assignment!r} (expected one of {ASSIGNMENT_MODES})")
+    if ranking not in RANKING_MODES:
+        raise ValueError(f"Unknown sentence ranking {ranking!r} (expected one of {RANKING_MODES})")
+
     words = vocabulary["words"]
     vocabulary_words = {w["word"] for w in words}
 
     # Build inverted index (this is the fast part)
-    word_to_sentences, all_sentences = build_inverted_index(bible, vocabulary_words)
+    index = build_inverted_index(corpus, vocabulary_words, posting_index)
+    if ranking == "difficulty":
+        print("Ranking candidates by difficulty...")
+        word_ranks = {w["word"]: rank for rank, w in enumerate(words)}
+        index = index._replace(
+            postings=order_by_difficulty(index.postings, corpus, word_ranks, surface_lemmas)
+        )
+
+    print(f"\nSelecting sentences for {len(words)} words ({assignment})...")
+    word_list = [word_data["word"] for word_data in words]
+    if assignment == "cover":
+        selections = assign_cover(word_list, index)
+    else:
+        selections = assign_greedy(word_list, index)
 
-    print(f"\nSelecting sentences for {len(words)} words...")
-
-    # Track which sentences are used
-    used_sentences = set()
     output_sentences = {}
+    sentence_ids_of = {}  # verse id -> sentence id, for selected verses
     updated_words = []
 
     words_with_sentences = 0
     words_without_sentences = 0
 
-    for i, word_data in enumerate(words):
-        word = word_data["word"]
-        candidates = word_to_sentences.get(word, [])
-
-        # Select best sentences
-        sentence_ids = select_sentences_for_word(candidates, used_sentences)
-
-        if len(sentence_ids) >= MIN_SENTENCES_PER_WORD:
+    for word_data, selected in zip(words, selections):
+        if len(selected) >= MIN_SENTENCES_PER_WORD:
             words_with_sentences += 1
 
             # Add sentences to output
-            for sid in sentence_ids:
-                if sid not in output_sentences:
+            for verse_id in selected:
+                if verse_id not in sentence_ids_of:
+                    _, book, chapter_num, verse_num, text = corpus.verse(verse_id)
+                    sid = generate_sentence_id(book, chapter_num, verse_num)
+                    sentence_ids_of[verse_id] = sid
                     output_sentences[sid] = {
-                        "text": all_sentences[sid]["text"],
-                        "ref": all_sentences[sid]["ref"],
-                        "book": all_sentences[sid]["book"],
+                        "text": text,
+                        "ref": f"{book} {chapter_num}:{verse_num}",
+                        "book": book,
                     }
-                used_sentences.add(sid)
 
+            sentence_ids = [sentence_ids_of[verse_id] for verse_id in selected]
             updated_word = {**word_data, "sentence_ids": sentence_ids}
         else:
             words_without_sentences += 1
@@ -188,9 +355,6 @@ def extract_sentences(vocabulary: dict, bible: dict) -> tuple[dict, dict]:
 
         updated_words.append(updated_word)
 
-        if (i + 1) % 1000 == 0:
-            print(f"  Processed {i + 1}/{len(words)} words...")
-
     print(f"\nWords with sentences: {words_with_sentences}")
     print(f"Words without enough sentences: {words_without_sentences}")
     print(f"Total unique sentences used: {len(output_sentences)}")
@@ -207,33 +371,57 @@ def extract_sentences(vocabulary: dict, bible: dict) -> tuple[dict, dict]:
     return output_sentences, updated_vocabulary
 
 
-def save_outputs(sentences: dict, vocabulary: dict) -> None:
+def save_outputs(sentences: dict, vocabulary: dict, config: PipelineConfig) -> None:
     """Save sentences and updated vocabulary to JSON files."""
     sentences_output = {
         "metadata": {
             "total_sentences": len(sentences),
-            "source": VERSION_NAME,
+            "source": config.version_name,
         },
         "sentences": sentences,
     }
 
-    with open(STEP5_SENTENCES_PATH, "w", encoding="utf-8") as f:
-        json.dump(sentences_output, f, indent=2, ensure_ascii=False)
-    print(f"\nSaved sentences to {STEP5_SENTENCES_PATH}")
+    save_json(config.step5_sentences_path, sentences_output)
+    print(f"\nSaved sentences to {config.step5_sentences_path}")
 
-    with open(STEP5_VOCABULARY_PATH, "w", encoding="utf-8") as f:
-        json.dump(vocabulary, f, indent=2, ensure_ascii=False)
-    print(f"Saved vocabulary with sentences to {STEP5_VOCABULARY_PATH}")
+    save_json(config.step5_vocabulary_path, vocabulary)
+    print(f"Saved vocabulary with sentences to {config.step5_vocabulary_path}")
 
 
-def main():
-    print("=== Step 5: Extract Sentences ===\n")
-
-    bible = load_bible()
-    vocabulary = load_vocabulary()
+def run(
+    vocabulary: dict | None = None,
+    corpus: Corpus | None = None,
+    config: PipelineConfig | None = None,
+    assignment: str | None = None,
+    ranking: str | None = None,
+) -> dict:
+    """Run step 5 and return the vocabulary with sentence ids.
 
-    sentences, updated_vocabulary = extract_sentences(vocabulary, bible)
-    save_outputs(sentences, updated_vocabulary)
+    ``vocabulary`` is the step 4 output and ``corpus`` the loaded source text;
+    both are read from disk when not given. Step 1's surface form table is
+    always read from disk, and the posting index is opened (built first if
+    stale) with posting_index.load_index. ``assignment`` and ``ranking``
+    override the version's sentence_assignment and sentence_ranking settings.
+    """
+    print("=== Step 5: Extract Sentences ===\n")
+    config = config or get_config()
+
+    if corpus is None:
+        corpus = load_bible(config)
+    if vocabulary is None:
+        vocabulary = load_vocabulary(config)
+    surface_lemmas = load_surface_lemmas(config)
+
+    with load_index(config, corpus) as posting_index:
+        sentences, updated_vocabulary = extract_sentences(
+            vocabulary,
+            corpus,
+            surface_lemmas,
+            posting_index,
+            assignment or config.sentence_assignment,
+            ranking or config.sentence_ranking,
+        )
+    save_outputs(sentences, updated_vocabulary, config)
 
     # Show examples
     print("\n=== Sample Output ===")
@@ -246,6 +434,24 @@ def main():
             if sid in sentences:
                 print(f"  - [{sentences[sid]['ref']}] {sentences[sid]['text'][:80]}...")
 
+    return updated_vocabulary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step 5: extract example sentences")
+    parser.add_argument(
+        "--assignment",
+        choices=ASSIGNMENT_MODES,
+        help="Sentence assignment mode (default: the version's sentence_assignment, else greedy)",
+    )
+    parser.add_argument(
+        "--ranking",
+        choices=RANKING_MODES,
+        help="Candidate ranking (default: the version's sentence_ranking, else difficulty)",
+    )
+    args = parser.parse_args()
+    run(assignment=args.assignment, ranking=args.ranking)
+
 
 if __name__ == "__main__":
     main()
@@ -1,160 +1,188 @@
 """Step 1: Extract words from Bible JSON.
 
 Extracts and lemmatizes words from Bible text, counting frequencies.
+Each word also records how often it appears capitalized and lowercase
+mid-sentence, which step 3 uses to detect proper nouns.
+
+Step 1 also writes the surface form -> lemma table it counted with, so
+step 5 matches verses with exactly the same tokenizer and lemmatizer, and
+the per-book lemma counts (see dispersion.py) when NumPy is installed.
 """
 
 from __future__ import annotations
 
-import json
-import re
 from collections import Counter
 
-from nltk.stem import WordNetLemmatizer
-
-from config import BIBLE_JSON_PATH, RAW_WORDS_PATH, VERSION_OUTPUT_DIR
-from word_forms import get_base_form
-
-lemmatizer = WordNetLemmatizer()
-
-
-def load_bible() -> dict:
-    """Load NIV Bible JSON file."""
-    with open(BIBLE_JSON_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def clean_text(text: str) -> str:
-    """Clean text by removing punctuation and normalizing."""
-    # Replace special unicode characters with ASCII equivalents
-    text = text.replace("\u201c", '"').replace("\u201d", '"')  # " "
-    text = text.replace("\u2018", "'").replace("\u2019", "'")  # ' '
-    text = text.replace("\u2014", " ")  # em dash —
-    text = text.replace("\u2013", " ")  # en dash –
-
-    # Remove possessive 's and s' (king's -> king, peoples' -> peoples)
-    text = re.sub(r"'s\b", "", text)
-    text = re.sub(r"s'\b", "s", text)
-
-    # Remove contractions (don't -> dont, I'll -> Ill, etc.)
-    text = re.sub(r"'", "", text)
+from bible_corpus import Corpus, load_corpus
+from config import LEMMA_TABLE_PATH, PipelineConfig, get_config
+from dispersion import NUMPY_AVAILABLE, BookCounts
+from lemmas import LemmaTable, lemmatize_word  # noqa: F401 (re-exported)
+from scanner import merge_counters, scan_corpus
+from tokenizer import is_numeric_word
+from utils import save_json
 
-    # Remove punctuation
-    text = re.sub(r"[^\w\s]", " ", text)
 
-    # Normalize whitespace
-    text = re.sub(r"\s+", " ", text)
+def load_bible(config: PipelineConfig | None = None) -> Corpus:
+    """Load the Bible as a compiled corpus (compiled from JSON on first use)."""
+    config = config or get_config()
+    return load_corpus(config.bible_json_path, config.corpus_path)
 
-    return text.lower().strip()
 
+def count_surface_forms(corpus: Corpus, start: int, stop: int) -> Counter:
+    """Count token ids in verses [start, stop) (one scanner shard)."""
+    return Counter(corpus.tokens_between(start, stop))
 
-def is_numeric_word(word: str) -> bool:
-    """Check if word is a number, ordinal, or fraction (should be excluded)."""
-    import re
-    # Pure numbers
-    if word.isdigit():
-        return True
-    # Ordinals: 1st, 2nd, 3rd, 4th, 14th, etc.
-    if re.match(r'^\d+(st|nd|rd|th)$', word):
-        return True
-    # Fractions with special characters: 12½, 2½, etc.
-    if re.search(r'\d+[½¼¾⅓⅔⅛⅜⅝⅞]', word):
-        return True
-    # Roman numerals (common ones)
-    if re.match(r'^[ivxlcdm]+$', word) and len(word) <= 4:
-        # Check if it's actually a roman numeral pattern
-        if re.match(r'^(i{1,3}|iv|v|vi{0,3}|ix|x{1,3}|xl|l|lx{0,3}|xc|c{1,3}|cd|d|dc{0,3}|cm|m{1,3})$', word):
-            return True
-    return False
 
+def extract_words(corpus: Corpus) -> tuple[Counter, dict, dict, list]:
+    """Extract all words from Bible text.
 
-def lemmatize_word(word: str) -> str:
-    """Convert word to its base form (lemma).
-
-    Uses irregular verb lookup first, then WordNet lemmatizer.
+    Returns lemma counts, lemma -> [capitalized, lowercase] mid-sentence
+    occurrence counts, the surface form -> lemma table of every counted
+    token and per-book lemma Counters (in corpus.books() order).
     """
-    # Check irregular verbs first (from word_forms module)
-    base = get_base_form(word)
-    if base:
-        return base
-
-    # Get both noun and verb lemmas from WordNet
-    noun_lemma = lemmatizer.lemmatize(word, pos='n')
-    verb_lemma = lemmatizer.lemmatize(word, pos='v')
-
-    # Prefer verb lemma for irregular verbs (was->be, has->have)
-    if verb_lemma != word and len(verb_lemma) > 1:
-        if noun_lemma == word or len(noun_lemma) <= 2:
-            return verb_lemma
-
-    # Otherwise prefer noun lemma for plurals (sons->son)
-    if noun_lemma != word:
-        return noun_lemma
-
-    return verb_lemma
-
-
-def extract_words(bible: dict) -> Counter:
-    """Extract all words from Bible text."""
     word_counts = Counter()
-    verse_count = 0
+    case_counts = {}
+    surface_lemmas = {}
+    lemma_ids = {}  # token id -> lemma
     numeric_words_skipped = 0
 
-    for book, chapters in bible.items():
-        for chapter_num, verses in chapters.items():
-            for verse_num, text in verses.items():
-                verse_count += 1
-                cleaned = clean_text(text)
-                words = cleaned.split()
-                # Filter and lemmatize each word before counting
-                for w in words:
-                    # Skip numeric words (ordinals, fractions, etc.)
-                    if is_numeric_word(w):
-                        numeric_words_skipped += 1
-                        continue
-                    lemmatized = lemmatize_word(w)
-                    word_counts[lemmatized] += 1
-
-    print(f"Processed {verse_count} verses")
+    # Count pre-tokenized surface forms first, then filter and lemmatize each
+    # distinct form once. Counter keeps first-occurrence order (also across
+    # merged shards), so ties in most_common() come out exactly as with a
+    # token-by-token loop.
+    book_surface_counts = scan_corpus(corpus, count_surface_forms)
+    surface_counts = merge_counters(book_surface_counts)
+    strings = corpus.strings
+    lemma_table = LemmaTable(LEMMA_TABLE_PATH)
+    for token_id, count in surface_counts.items():
+        w = strings[token_id]
+        # Skip numeric words (ordinals, fractions, etc.)
+        if is_numeric_word(w):
+            numeric_words_skipped += count
+            continue
+        lemma = lemma_table.lemmatize(w)
+        word_counts[lemma] += count
+        surface_lemmas[w] = lemma
+        lemma_ids[token_id] = lemma
+
+        capitalized, lowercase = corpus.case_counts(token_id)
+        cases = case_counts.setdefault(lemma, [0, 0])
+        cases[0] += capitalized
+        cases[1] += lowercase
+
+    # The book shards' counts again, by lemma
+    book_counts = []
+    for partial in book_surface_counts:
+        counts = Counter()
+        for token_id, count in partial.items():
+            lemma = lemma_ids.get(token_id)
+            if lemma is not None:
+                counts[lemma] += count
+        book_counts.append(counts)
+
+    print(f"Lemma table: {len(lemma_table) - lemma_table.new_entries} cached, "
+          f"{lemma_table.new_entries} new")
+    lemma_table.save()
+
+    print(f"Processed {len(corpus)} verses")
     print(f"Found {len(word_counts)} unique words")
     print(f"Total word occurrences: {sum(word_counts.values())}")
     print(f"Numeric words skipped: {numeric_words_skipped}")
 
-    return word_counts
+    return word_counts, case_counts, surface_lemmas, book_counts
 
 
-def save_output(word_counts: Counter) -> None:
-    """Save word counts to JSON."""
-    VERSION_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    output = {
+def build_output(word_counts: Counter, case_counts: dict) -> dict:
+    """Build the step 1 output structure from word counts."""
+    return {
         "metadata": {
             "step": "raw_extraction",
             "total_unique_words": len(word_counts),
             "total_occurrences": sum(word_counts.values()),
         },
         "words": [
-            {"word": word, "count": count}
+            {
+                "word": word,
+                "count": count,
+                "capitalized": case_counts[word][0],
+                "lowercase": case_counts[word][1],
+            }
             for word, count in word_counts.most_common()
         ],
     }
 
-    with open(RAW_WORDS_PATH, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
 
-    print(f"Saved to {RAW_WORDS_PATH}")
+def build_surface_output(surface_lemmas: dict) -> dict:
+    """Build the surface form -> lemma table output."""
+    return {
+        "metadata": {
+            "step": "raw_extraction",
+            "total_surface_forms": len(surface_lemmas),
+        },
+        "lemmas": surface_lemmas,
+    }
 
 
-def main():
+def save_output(output: dict, config: PipelineConfig) -> None:
+    """Save step 1 output to JSON."""
+    save_json(config.raw_words_path, output)
+
+    print(f"Saved to {config.raw_words_path}")
+
+
+def save_surface_lemmas(surface_lemmas: dict, config: PipelineConfig) -> None:
+    """Save the surface form -> lemma table for step 5."""
+    save_json(config.surface_lemmas_path, build_surface_output(surface_lemmas))
+    print(f"Saved {len(surface_lemmas)} surface forms to {config.surface_lemmas_path}")
+
+
+def save_book_counts(
+    book_counts: list, word_counts: Counter, corpus: Corpus, config: PipelineConfig
+) -> None:
+    """Save the books x lemmas count matrix (columns in step 1 word order)."""
+    if not NUMPY_AVAILABLE:
+        print("NumPy not installed; skipping per-book counts")
+        return
+    books = [book for book, _, _ in corpus.books()]
+    lemmas = [word for word, _ in word_counts.most_common()]
+    matrix = BookCounts.from_counters(books, book_counts, lemmas)
+    matrix.save(config.book_counts_path)
+    print(f"Saved {len(books)} x {len(lemmas)} per-book counts to {config.book_counts_path}")
+
+
+def run(
+    corpus: Corpus | None = None,
+    write_output: bool = True,
+    config: PipelineConfig | None = None,
+) -> dict:
+    """Run step 1 and return its output.
+
+    In-process callers pass an already loaded ``corpus`` and may skip writing
+    the step 1 word list; the surface form table and per-book counts are
+    always written since steps 4 and 5 read them. ``config`` defaults to ``get_config()``.
+    """
     print("=== Step 1: Extract Words ===")
-    bible = load_bible()
-    word_counts = extract_words(bible)
-    save_output(word_counts)
+    config = config or get_config()
+    if corpus is None:
+        corpus = load_bible(config)
+    word_counts, case_counts, surface_lemmas, book_counts = extract_words(corpus)
+    output = build_output(word_counts, case_counts)
+    if write_output:
+        save_output(output, config)
+    save_surface_lemmas(surface_lemmas, config)
+    save_book_counts(book_counts, word_counts, corpus, config)
 
     # Show top 20 words
     print("\nTop 20 words:")
     for word, count in word_counts.most_common(20):
         print(f"  {word}: {count}")
 
+    return output
+
+
+def main():
+    run()
+
 
 if __name__ == "__main__":
     main()
@@ -1,57 +1,50 @@
-"""Step 3: Filter proper nouns (names, places) from word list."""
+"""Step 3: Filter proper nouns (names, places) from word list.
 
-import json
-import re
+Capitalization is not re-read from the Bible: step 1 already counted, per
+word, the mid-sentence occurrences that are capitalized and lowercase.
+"""
 
-from config import (
-    BIBLE_JSON_PATH,
-    FILTERED_STOPWORDS_PATH,
-    FILTERED_PROPER_NOUNS_PATH,
-    PROPER_NOUNS_PATH,
-    PROTECTED_WORDS_PATH,
-)
+from __future__ import annotations
 
+from config import PipelineConfig, get_config
+from utils import load_json, save_json
 
-def load_protected_words() -> set:
+
+def load_protected_words(config: PipelineConfig) -> set:
     """Load protected words from version-specific file."""
     protected_words = set()
+    path = config.protected_words_path
 
-    if not PROTECTED_WORDS_PATH.exists():
-        print(f"Warning: Protected words file not found: {PROTECTED_WORDS_PATH}")
+    if not path.exists():
+        print(f"Warning: Protected words file not found: {path}")
         return protected_words
 
-    with open(PROTECTED_WORDS_PATH, "r", encoding="utf-8") as f:
+    with open(path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             # Skip empty lines and comments
             if line and not line.startswith("#"):
                 protected_words.add(line.lower())
 
-    print(f"Loaded {len(protected_words)} protected words from {PROTECTED_WORDS_PATH}")
+    print(f"Loaded {len(protected_words)} protected words from {path}")
     return protected_words
 
 
-def load_filtered_words() -> dict:
+def load_filtered_words(config: PipelineConfig) -> dict:
     """Load words from previous step."""
-    with open(FILTERED_STOPWORDS_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
+    return load_json(config.filtered_stopwords_path)
 
-def load_bible() -> dict:
-    """Load original Bible for capitalization analysis."""
-    with open(BIBLE_JSON_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
 
-
-def load_proper_nouns_list() -> set:
+def load_proper_nouns_list(config: PipelineConfig) -> set:
     """Load known proper nouns from file."""
     proper_nouns = set()
+    path = config.proper_nouns_path
 
-    if not PROPER_NOUNS_PATH.exists():
-        print(f"Warning: Proper nouns file not found: {PROPER_NOUNS_PATH}")
+    if not path.exists():
+        print(f"Warning: Proper nouns file not found: {path}")
         return proper_nouns
 
-    with open(PROPER_NOUNS_PATH, "r", encoding="utf-8") as f:
+    with open(path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             # Skip empty lines and comments
@@ -61,24 +54,22 @@ def load_proper_nouns_list() -> set:
     return proper_nouns
 
 
-def find_proper_nouns_in_bible(bible: dict) -> set:
-    """Find words that appear capitalized mid-sentence."""
+def find_capitalized_words(data: dict, ratio: float) -> set:
+    """Find words that appear capitalized mid-sentence.
+
+    A word qualifies when it was capitalized mid-sentence at least once and
+    in at least ``ratio`` (proper_noun_capitalized_ratio) of its
+    mid-sentence uses.
+    """
     proper_noun_candidates = set()
 
-    for book, chapters in bible.items():
-        for chapter_num, verses in chapters.items():
-            for verse_num, text in verses.items():
-                # Split into sentences (roughly)
-                sentences = re.split(r"[.!?]", text)
-
-                for sentence in sentences:
-                    words = sentence.split()
-                    # Skip first word of sentence (always capitalized)
-                    for word in words[1:]:
-                        # Clean the word
-                        clean_word = re.sub(r"[^\w']", "", word)
-                        if clean_word and clean_word[0].isupper():
-                            proper_noun_candidates.add(clean_word.lower())
+    for item in data["words"]:
+        capitalized = item.get("capitalized", 0)
+        if not capitalized:
+            continue
+        mid_sentence = capitalized + item.get("lowercase", 0)
+        if capitalized / mid_sentence >= ratio:
+            proper_noun_candidates.add(item["word"])
 
     return proper_noun_candidates
 
@@ -91,7 +82,8 @@ def filter_proper_nouns(data: dict, proper_nouns: set) -> list:
     for item in data["words"]:
         word = item["word"]
         if word not in proper_nouns:
-            filtered.append(item)
+            # Capitalization counts are only needed up to this step
+            filtered.append({"word": word, "count": item["count"]})
         else:
             removed.append(word)
 
@@ -104,12 +96,12 @@ def filter_proper_nouns(data: dict, proper_nouns: set) -> list:
     return filtered
 
 
-def save_output(filtered_words: list, original_metadata: dict) -> None:
-    """Save filtered words to JSON."""
+def build_output(filtered_words: list, original_metadata: dict) -> dict:
+    """Build the step 3 output structure."""
     # Recalculate total_occurrences from actual word counts
     total_occurrences = sum(item["count"] for item in filtered_words)
 
-    output = {
+    return {
         "metadata": {
             **original_metadata,
             "step": "filtered_proper_nouns",
@@ -120,28 +112,37 @@ def save_output(filtered_words: list, original_metadata: dict) -> None:
         "words": filtered_words,
     }
 
-    with open(FILTERED_PROPER_NOUNS_PATH, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
 
-    print(f"Saved to {FILTERED_PROPER_NOUNS_PATH}")
+def save_output(output: dict, config: PipelineConfig) -> None:
+    """Save filtered words to JSON."""
+    save_json(config.filtered_proper_nouns_path, output)
+    print(f"Saved to {config.filtered_proper_nouns_path}")
 
 
-def main():
+def run(
+    data: dict | None = None,
+    write_output: bool = True,
+    config: PipelineConfig | None = None,
+) -> dict:
+    """Run step 3 and return its output.
+
+    ``data`` is the step 2 output; it is read from disk when not given.
+    """
     print("=== Step 3: Filter Proper Nouns ===")
+    config = config or get_config()
 
     # Load protected words from file
-    protected_words = load_protected_words()
+    protected_words = load_protected_words(config)
 
     # Load data
-    data = load_filtered_words()
+    if data is None:
+        data = load_filtered_words(config)
 
     # Build proper nouns set
-    print("Analyzing Bible for proper nouns...")
-    bible = load_bible()
-    detected_proper_nouns = find_proper_nouns_in_bible(bible)
+    detected_proper_nouns = find_capitalized_words(data, config.proper_noun_capitalized_ratio)
     print(f"Detected {len(detected_proper_nouns)} potential proper nouns from capitalization")
 
-    known_proper_nouns = load_proper_nouns_list()
+    known_proper_nouns = load_proper_nouns_list(config)
     print(f"Loaded {len(known_proper_nouns)} known proper nouns from list")
 
     # Combine both sets, but exclude protected words
@@ -151,13 +152,21 @@ def main():
 
     # Filter
     filtered = filter_proper_nouns(data, all_proper_nouns)
-    save_output(filtered, data["metadata"])
+    output = build_output(filtered, data["metadata"])
+    if write_output:
+        save_output(output, config)
 
     # Show top 20 remaining words
     print("\nTop 20 words after proper noun removal:")
     for item in filtered[:20]:
         print(f"  {item['word']}: {item['count']}")
 
+    return output
+
+
+def main():
+    run()
+
 
 if __name__ == "__main__":
     main()
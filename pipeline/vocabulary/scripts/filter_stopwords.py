@@ -1,33 +1,34 @@
 """Step 2: Filter stopwords from extracted words."""
 
-import json
+from __future__ import annotations
 
-from config import RAW_WORDS_PATH, FILTERED_STOPWORDS_PATH, STOPWORDS_PATH
+from config import PipelineConfig, get_config
+from utils import load_json, save_json
 
 
-def load_stopwords() -> set:
+def load_stopwords(config: PipelineConfig) -> set:
     """Load stopwords from version-specific file."""
     stopwords = set()
+    path = config.stopwords_path
 
-    if not STOPWORDS_PATH.exists():
-        print(f"Warning: Stopwords file not found: {STOPWORDS_PATH}")
+    if not path.exists():
+        print(f"Warning: Stopwords file not found: {path}")
         return stopwords
 
-    with open(STOPWORDS_PATH, "r", encoding="utf-8") as f:
+    with open(path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             # Skip empty lines and comments
             if line and not line.startswith("#"):
                 stopwords.add(line.lower())
 
-    print(f"Loaded {len(stopwords)} stopwords from {STOPWORDS_PATH}")
+    print(f"Loaded {len(stopwords)} stopwords from {path}")
     return stopwords
 
 
-def load_raw_words() -> dict:
+def load_raw_words(config: PipelineConfig) -> dict:
     """Load raw words from previous step."""
-    with open(RAW_WORDS_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(config.raw_words_path)
 
 
 def filter_stopwords(data: dict, stopwords: set) -> list:
@@ -48,12 +49,12 @@ def filter_stopwords(data: dict, stopwords: set) -> list:
     return filtered
 
 
-def save_output(filtered_words: list, original_metadata: dict) -> None:
-    """Save filtered words to JSON."""
+def build_output(filtered_words: list, original_metadata: dict) -> dict:
+    """Build the step 2 output structure."""
     # Recalculate total_occurrences from actual word counts
     total_occurrences = sum(item["count"] for item in filtered_words)
 
-    output = {
+    return {
         "metadata": {
             **original_metadata,
             "step": "filtered_stopwords",
@@ -64,24 +65,43 @@ def save_output(filtered_words: list, original_metadata: dict) -> None:
         "words": filtered_words,
     }
 
-    with open(FILTERED_STOPWORDS_PATH, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
 
-    print(f"Saved to {FILTERED_STOPWORDS_PATH}")
+def save_output(output: dict, config: PipelineConfig) -> None:
+    """Save filtered words to JSON."""
+    save_json(config.filtered_stopwords_path, output)
+    print(f"Saved to {config.filtered_stopwords_path}")
+
 
+def run(
+    data: dict | None = None,
+    write_output: bool = True,
+    config: PipelineConfig | None = None,
+) -> dict:
+    """Run step 2 and return its output.
 
-def main():
+    ``data`` is the step 1 output; it is read from disk when not given.
+    """
     print("=== Step 2: Filter Stopwords ===")
-    stopwords = load_stopwords()
-    data = load_raw_words()
+    config = config or get_config()
+    stopwords = load_stopwords(config)
+    if data is None:
+        data = load_raw_words(config)
     filtered = filter_stopwords(data, stopwords)
-    save_output(filtered, data["metadata"])
+    output = build_output(filtered, data["metadata"])
+    if write_output:
+        save_output(output, config)
 
     # Show top 20 remaining words
     print("\nTop 20 words after stopword removal:")
     for item in filtered[:20]:
         print(f"  {item['word']}: {item['count']}")
 
+    return output
+
+
+def main():
+    run()
+
 
 if __name__ == "__main__":
     main()
@@ -1,25 +1,25 @@
 """Step 4: Finalize vocabulary - apply final filters and add rankings."""
 
-import json
+from __future__ import annotations
+
 from datetime import datetime
 
-from config import (
-    FILTERED_PROPER_NOUNS_PATH,
-    FINAL_OUTPUT_PATH,
-    MIN_WORD_LENGTH,
-    MIN_FREQUENCY,
-    VERSION_NAME,
-)
+from bible_corpus import Corpus, load_corpus
+from config import PipelineConfig, get_config
+from cooccurrence import add_related
+from dispersion import load_book_counts
+from utils import load_json, save_json
 
 
-def load_filtered_words() -> dict:
+def load_filtered_words(config: PipelineConfig) -> dict:
     """Load words from previous step."""
-    with open(FILTERED_PROPER_NOUNS_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(config.filtered_proper_nouns_path)
 
 
-def apply_final_filters(words: list) -> list:
+def apply_final_filters(words: list, config: PipelineConfig) -> list:
     """Apply final filters: min length, min frequency, etc."""
+    min_length = config.min_word_length
+    min_frequency = config.min_frequency
     filtered = []
     removed_short = 0
     removed_low_freq = 0
@@ -35,70 +35,139 @@ def apply_final_filters(words: list) -> list:
             continue
 
         # Skip short words
-        if len(word) < MIN_WORD_LENGTH:
+        if len(word) < min_length:
             removed_short += 1
             continue
 
         # Skip low frequency words
-        if count < MIN_FREQUENCY:
+        if count < min_frequency:
             removed_low_freq += 1
             continue
 
         filtered.append(item)
 
     print(f"Removed {removed_numeric} numeric entries")
-    print(f"Removed {removed_short} words shorter than {MIN_WORD_LENGTH} chars")
-    print(f"Removed {removed_low_freq} words with frequency < {MIN_FREQUENCY}")
+    print(f"Removed {removed_short} words shorter than {min_length} chars")
+    print(f"Removed {removed_low_freq} words with frequency < {min_frequency}")
     print(f"Final word count: {len(filtered)}")
 
     return filtered
 
 
-def add_rankings(words: list) -> list:
-    """Add frequency rank to each word."""
+def load_phrases(config: PipelineConfig) -> list:
+    """Load step 1b's multi-word expressions."""
+    path = config.phrases_path
+    if not path.exists():
+        raise FileNotFoundError(f"Phrases not found: {path} (run extract_phrases.py first)")
+    return load_json(path)["phrases"]
+
+
+def add_phrases(words: list, phrases: list) -> list:
+    """Merge phrases into the word list by count (words first on ties)."""
+    entries = [
+        {"word": phrase["phrase"], "count": phrase["count"], "phrase": True}
+        for phrase in phrases
+    ]
+    print(f"Added {len(entries)} phrases")
+    return sorted(words + entries, key=lambda item: -item["count"])
+
+
+def load_dispersion(config: PipelineConfig) -> dict:
+    """Word -> Juilland's D from step 1's per-book counts."""
+    counts = load_book_counts(config.book_counts_path)
+    return dict(zip(counts.lemmas, counts.dispersion().juilland_d.tolist()))
+
+
+def add_rankings(words: list, dispersion: dict | None = None) -> list:
+    """Add frequency rank to each word.
+
+    With ``dispersion`` (word -> Juilland's D), words are ranked by adjusted
+    frequency, count x D, so words concentrated in a few books rank lower;
+    each word also records its D.
+    """
+    if dispersion is not None:
+        for item in words:
+            if item["word"] in dispersion:
+                item["dispersion"] = round(dispersion[item["word"]], 4)
+        # Stable: equal adjusted frequencies keep their count order; phrases
+        # have no per-book counts and keep their plain count
+        words.sort(key=lambda item: -item["count"] * dispersion.get(item["word"], 1.0))
     for rank, item in enumerate(words, start=1):
         item["rank"] = rank
     return words
 
 
-def save_output(words: list) -> None:
-    """Save final vocabulary to JSON."""
+def build_output(words: list, config: PipelineConfig) -> dict:
+    """Build the final vocabulary structure."""
     output = {
         "metadata": {
-            "source": VERSION_NAME,
+            "source": config.version_name,
             "extraction_date": datetime.now().strftime("%Y-%m-%d"),
             "total_unique_words": len(words),
             "total_occurrences": sum(item["count"] for item in words),
             "filters_applied": [
                 "stopwords",
                 "proper_nouns",
-                f"min_length_{MIN_WORD_LENGTH}",
-                f"min_frequency_{MIN_FREQUENCY}",
+                f"min_length_{config.min_word_length}",
+                f"min_frequency_{config.min_frequency}",
             ],
         },
         "words": words,
     }
+    if config.frequency_ranking == "adjusted":
+        output["metadata"]["ranking"] = "adjusted_frequency"
+    if config.extract_phrases:
+        output["metadata"]["total_phrases"] = sum(1 for item in words if item.get("phrase"))
+    return output
 
-    with open(FINAL_OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
-
-    print(f"\nSaved to {FINAL_OUTPUT_PATH}")
 
-
-def main():
+def save_output(output: dict, config: PipelineConfig) -> None:
+    """Save final vocabulary to JSON."""
+    # Human-facing vocabulary list: keep it readable
+    save_json(config.step4_vocabulary_path, output, pretty=True)
+    print(f"\nSaved to {config.step4_vocabulary_path}")
+
+
+def run(
+    data: dict | None = None,
+    config: PipelineConfig | None = None,
+    corpus: Corpus | None = None,
+) -> dict:
+    """Run step 4 and return the final vocabulary.
+
+    ``data`` is the step 3 output; it is read from disk when not given, as
+    is ``corpus`` (only needed for related words).
+    The result is always written since it is the pipeline's main output.
+    """
     print("=== Step 4: Finalize Vocabulary ===")
+    config = config or get_config()
 
-    data = load_filtered_words()
+    if data is None:
+        data = load_filtered_words(config)
     words = data["words"]
 
     # Apply final filters
-    filtered = apply_final_filters(words)
+    filtered = apply_final_filters(words, config)
+    if config.extract_phrases:
+        filtered = add_phrases(filtered, load_phrases(config))
 
     # Add rankings
-    ranked = add_rankings(filtered)
+    ranking = config.frequency_ranking
+    if ranking not in ("count", "adjusted"):
+        raise ValueError(f"Unknown frequency ranking {ranking!r} (expected 'count' or 'adjusted')")
+    dispersion = load_dispersion(config) if ranking == "adjusted" else None
+    ranked = add_rankings(filtered, dispersion)
+
+    # Words sharing verses with each word
+    if config.related_words > 0:
+        if corpus is None:
+            corpus = load_corpus(config.bible_json_path, config.corpus_path)
+        surface_lemmas = load_json(config.surface_lemmas_path)["lemmas"]
+        add_related(ranked, corpus, surface_lemmas, config.related_words)
 
     # Save output
-    save_output(ranked)
+    output = build_output(ranked, config)
+    save_output(output, config)
 
     # Show statistics
     print("\n=== Final Statistics ===")
@@ -109,6 +178,12 @@ def main():
     for item in ranked[:30]:
         print(f"  {item['rank']:3}. {item['word']}: {item['count']}")
 
+    return output
+
+
+def main():
+    run()
+
 
 if __name__ == "__main__":
     main()
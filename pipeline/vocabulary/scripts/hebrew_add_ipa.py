@@ -5,10 +5,11 @@ Add IPA pronunciation to Hebrew vocabulary.
 Converts academic transliteration to IPA notation.
 """
 
-import json
 from pathlib import Path
 from datetime import datetime
 
+from utils import load_json, save_json
+
 # Paths
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_DIR = SCRIPT_DIR.parent
@@ -131,8 +132,7 @@ def process_vocabulary():
     """Add IPA to all vocabulary entries."""
     log(f"Loading vocabulary from {INPUT_PATH}")
 
-    with open(INPUT_PATH, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_json(INPUT_PATH)
 
     words = data['words']
     log(f"Processing {len(words)} words")
@@ -151,8 +151,7 @@ def process_vocabulary():
     data['metadata']['ipa_processing_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     # Save
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    save_json(OUTPUT_PATH, data, pretty=True)
 
     log(f"Added IPA to {converted} words")
     log(f"Saved to {OUTPUT_PATH}")
@@ -7,8 +7,8 @@ Translates:
 - pronunciation → korean_pronunciation
 
 Requirements:
-    - Z.AI API credentials in .env file (for --api mode)
-    - Or droid/claude CLI installed
+    - Z.AI API credentials in .env file (calls go through llm_client, so
+      answered batches are cached; --no-cache to bypass)
 """
 
 from __future__ import annotations
@@ -18,15 +18,11 @@ import json
 import os
 import re
 import time
-import concurrent.futures
 from datetime import datetime
 from pathlib import Path
 
-try:
-    from zai import ZaiClient
-    ZAI_SDK_AVAILABLE = True
-except ImportError:
-    ZAI_SDK_AVAILABLE = False
+import llm_client
+from utils import load_json, save_json
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
@@ -38,42 +34,10 @@ FAILED_WORDS_PATH = OUTPUT_DIR / "failed_words.json"
 
 # Processing configuration
 BATCH_SIZE = 30  # Words per request (smaller for Hebrew due to longer definitions)
-MAX_WORKERS_API = 5
 API_TIMEOUT = 300  # 5 minutes
 
-# Load environment variables
-def load_env():
-    """Load environment variables from .env file."""
-    env_path = PROJECT_DIR / ".env"
-    if env_path.exists():
-        with open(env_path, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    os.environ.setdefault(key.strip(), value.strip())
-
-load_env()
-
-# API Configuration
-API_BASE = os.environ.get("ZAI_API_BASE", "https://api.z.ai/api/coding/paas/v4")
+# llm_client loads .env on import
 API_KEY = os.environ.get("ZAI_API_KEY", "")
-API_MODEL = os.environ.get("ZAI_MODEL", "glm-4.6")
-
-# Global SDK client
-_zai_client = None
-
-def get_zai_client():
-    """Get or create ZAI SDK client."""
-    global _zai_client
-    if _zai_client is None and ZAI_SDK_AVAILABLE:
-        _zai_client = ZaiClient(
-            api_key=API_KEY,
-            base_url=f"{API_BASE}/",
-            timeout=float(API_TIMEOUT),
-            max_retries=2
-        )
-    return _zai_client
 
 
 def log(message: str, level: str = "INFO") -> None:
@@ -87,15 +51,13 @@ def load_vocabulary() -> dict:
     log(f"Loading vocabulary from {INPUT_PATH}")
     if not INPUT_PATH.exists():
         raise FileNotFoundError(f"Input file not found: {INPUT_PATH}")
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(INPUT_PATH)
 
 
 def load_existing_vocabulary() -> dict | None:
     """Load existing final vocabulary if exists."""
     if OUTPUT_PATH.exists():
-        with open(OUTPUT_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_json(OUTPUT_PATH)
     return None
 
 
@@ -159,36 +121,18 @@ def parse_response(response_text: str) -> list[dict]:
         return []
 
 
-def process_batch_api(words: list[dict], batch_num: int, total_batches: int) -> list[dict]:
-    """Process a batch of words using Z.AI API."""
-    client = get_zai_client()
-    if not client:
-        log("Z.AI SDK not available", "ERROR")
-        return []
-
-    prompt = create_prompt(words)
-
-    try:
-        response = client.chat.completions.create(
-            model=API_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            extra_body={"enable_thinking": False}
-        )
-
-        content = response.choices[0].message.content
-        results = parse_response(content)
-
-        if results:
-            log(f"Batch {batch_num}/{total_batches}: {len(results)} words translated")
-        else:
-            log(f"Batch {batch_num}/{total_batches}: Failed to parse response", "WARN")
-
-        return results
+def match_results(words: list[dict], results: list) -> tuple[list[dict], list[dict]]:
+    """Match a batch's translations to its words by Strong's number.
 
-    except Exception as e:
-        log(f"Batch {batch_num}/{total_batches} error: {e}", "ERROR")
-        return []
+    Returns: (results, failed words)
+    """
+    by_strongs = {
+        r["strongs"]: r for r in results
+        if isinstance(r, dict) and isinstance(r.get("strongs"), str) and r.get("definition_korean")
+    }
+    matched = [by_strongs[w["strongs"]] for w in words if w["strongs"] in by_strongs]
+    failed = [w for w in words if w["strongs"] not in by_strongs]
+    return matched, failed
 
 
 def process_all_words(vocabulary: dict, retry_mode: bool = False, test_count: int = 0) -> dict:
@@ -235,30 +179,17 @@ def process_all_words(vocabulary: dict, retry_mode: bool = False, test_count: in
 
     log(f"Processing {len(words_to_process)} words in {len(batches)} batches")
 
-    # Process batches in parallel
+    # Process batches concurrently (llm_client sets how many are in flight
+    # and splits failing batches down to the words that break them)
     all_results = []
-    failed_strongs = []
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS_API) as executor:
-        futures = {
-            executor.submit(process_batch_api, batch, i + 1, len(batches)): batch
-            for i, batch in enumerate(batches)
-        }
-
-        for future in concurrent.futures.as_completed(futures):
-            batch = futures[future]
-            try:
-                results = future.result()
-                if results:
-                    all_results.extend(results)
-                else:
-                    # Mark batch as failed
-                    for w in batch:
-                        failed_strongs.append(w["strongs"])
-            except Exception as e:
-                log(f"Batch processing error: {e}", "ERROR")
-                for w in batch:
-                    failed_strongs.append(w["strongs"])
+
+    def on_result(index: int, results: list[dict]) -> None:
+        log(f"Batch {index + 1}/{len(batches)}: {len(results)} words translated")
+        all_results.extend(results)
+
+    dead_letters = llm_client.generate_bisecting_sync(
+        batches, create_prompt, match_results, parse_response, on_result
+    )
 
     # Create lookup for results
     results_lookup = {r["strongs"]: r for r in all_results}
@@ -274,11 +205,16 @@ def process_all_words(vocabulary: dict, retry_mode: bool = False, test_count: in
 
     log(f"Applied {translated_count} translations")
 
-    # Save failed words
-    if failed_strongs:
-        with open(FAILED_WORDS_PATH, "w", encoding="utf-8") as f:
-            json.dump({"failed_strongs": failed_strongs, "count": len(failed_strongs)}, f, indent=2)
-        log(f"Saved {len(failed_strongs)} failed words to {FAILED_WORDS_PATH}")
+    # Save failed words with the response each got
+    if dead_letters:
+        failed_strongs = [letter.item["strongs"] for letter in dead_letters]
+        save_json(FAILED_WORDS_PATH, {
+            "failed_strongs": failed_strongs,
+            "count": len(failed_strongs),
+            "responses": {letter.item["strongs"]: letter.response for letter in dead_letters},
+            "errors": {letter.item["strongs"]: letter.error for letter in dead_letters if letter.error},
+        }, pretty=True)
+        log(f"Saved {len(failed_strongs)} failed words to {FAILED_WORDS_PATH}", "WARN")
 
     # Update metadata
     vocabulary["metadata"]["korean_translations_added"] = True
@@ -290,8 +226,7 @@ def process_all_words(vocabulary: dict, retry_mode: bool = False, test_count: in
 
 def save_vocabulary(vocabulary: dict) -> None:
     """Save final vocabulary."""
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(vocabulary, f, ensure_ascii=False, indent=2)
+    save_json(OUTPUT_PATH, vocabulary, pretty=True)
     log(f"Saved vocabulary to {OUTPUT_PATH}")
 
 
@@ -300,12 +235,10 @@ def main():
     parser.add_argument("--api", action="store_true", help="Use Z.AI API (default)")
     parser.add_argument("--retry", action="store_true", help="Only process words without translations")
     parser.add_argument("--test", type=int, default=0, help="Test with N words only")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call the API (ignore and do not write the response cache)")
     args = parser.parse_args()
 
-    if not ZAI_SDK_AVAILABLE:
-        log("Z.AI SDK not installed. Run: pip install zai-sdk", "ERROR")
-        return
-
     if not API_KEY:
         log("ZAI_API_KEY not set in .env file", "ERROR")
         return
@@ -314,12 +247,17 @@ def main():
     log("Hebrew Vocabulary Korean Translation")
     log("=" * 60)
 
+    llm_client.configure(use_api=True, api_timeout=API_TIMEOUT, use_cache=not args.no_cache)
+
     vocabulary = load_vocabulary()
     log(f"Loaded {len(vocabulary.get('words', []))} words")
 
     vocabulary = process_all_words(vocabulary, retry_mode=args.retry, test_count=args.test)
 
     save_vocabulary(vocabulary)
+    for summary in (llm_client.cache_summary(), llm_client.pool_summary()):
+        if summary:
+            log(summary)
 
     log("=" * 60)
     log("Complete!")
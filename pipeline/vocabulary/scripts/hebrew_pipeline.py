@@ -13,12 +13,16 @@ Steps:
 5. (Optional) Translate definitions to Korean via AI
 """
 
+import argparse
 import json
 import re
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+from scanner import map_shards
+from utils import load_json, save_json
+
 # Paths
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_DIR = SCRIPT_DIR.parent  # pipeline/vocabulary
@@ -40,16 +44,14 @@ FUNCTION_WORD_TAGS = {'HR', 'HC', 'HTd', 'HTo', 'HTr', 'HD', 'HTi', 'HTe', 'HTa'
 
 def load_config():
     """Load Hebrew pipeline configuration."""
-    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return load_json(CONFIG_FILE)
 
 
 def load_hebrew_bible(config):
     """Load Hebrew Bible JSON."""
     source_file = SOURCE_DATA_DIR / config['source_file']
     print(f"Loading Hebrew Bible from {source_file}...")
-    with open(source_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return load_json(source_file)
 
 
 def load_strongs_dictionary(config):
@@ -68,42 +70,70 @@ def load_strongs_dictionary(config):
     return json.loads(match.group(1))
 
 
-def extract_words(bible_data):
+def extract_book_words(book_item):
+    """
+    Extract words of one book (one scanner shard).
+
+    Tags are kept as a list in first-occurrence order so that merged shards
+    build their tag sets in the same order as a single pass would.
+    """
+    book, chapters = book_item
+    words = defaultdict(lambda: {'count': 0, 'tags': [], 'locations': []})
+
+    for chapter_idx, chapter in enumerate(chapters, 1):
+        for verse_idx, verse in enumerate(chapter, 1):
+            for word_data in verse:
+                # word_data = [hebrew_text, strongs_codes, grammar_tags]
+                _hebrew_text, strongs_codes, grammar_tags = word_data
+
+                # Parse Strong's numbers (may have prefixes like Hb/H7225)
+                for code in strongs_codes.split('/'):
+                    if code.startswith('H') and len(code) > 1 and code[1:].isdigit():
+                        strongs_num = code
+                        words[strongs_num]['count'] += 1
+                        tag = grammar_tags.split('/')[-1]  # Main tag
+                        if tag not in words[strongs_num]['tags']:
+                            words[strongs_num]['tags'].append(tag)
+
+                        # Store first few locations as examples
+                        if len(words[strongs_num]['locations']) < 10:
+                            location = f"{book}-{chapter_idx}-{verse_idx}"
+                            if location not in words[strongs_num]['locations']:
+                                words[strongs_num]['locations'].append(location)
+
+    return dict(words)
+
+
+def extract_words(bible_data, jobs=None):
     """
     Extract words with Strong's numbers from Hebrew Bible.
 
+    Books are scanned in parallel with ``jobs`` processes and merged in
+    canonical order.
+
     Returns:
         dict: {strongs_number: {count, tags, locations}}
     """
     print("Extracting words...")
-    words = defaultdict(lambda: {'count': 0, 'tags': set(), 'locations': []})
-
-    for book, chapters in bible_data.items():
-        for chapter_idx, chapter in enumerate(chapters, 1):
-            for verse_idx, verse in enumerate(chapter, 1):
-                for word_data in verse:
-                    # word_data = [hebrew_text, strongs_codes, grammar_tags]
-                    _hebrew_text, strongs_codes, grammar_tags = word_data
-
-                    # Parse Strong's numbers (may have prefixes like Hb/H7225)
-                    for code in strongs_codes.split('/'):
-                        if code.startswith('H') and len(code) > 1 and code[1:].isdigit():
-                            strongs_num = code
-                            words[strongs_num]['count'] += 1
-                            words[strongs_num]['tags'].add(grammar_tags.split('/')[-1])  # Main tag
-
-                            # Store first few locations as examples
-                            if len(words[strongs_num]['locations']) < 10:
-                                location = f"{book}-{chapter_idx}-{verse_idx}"
-                                if location not in words[strongs_num]['locations']:
-                                    words[strongs_num]['locations'].append(location)
+    words = {}
+
+    for book_words in map_shards(extract_book_words, list(bible_data.items()), jobs):
+        for strongs_num, data in book_words.items():
+            entry = words.setdefault(strongs_num, {'count': 0, 'tags': set(), 'locations': []})
+            entry['count'] += data['count']
+            for tag in data['tags']:
+                entry['tags'].add(tag)
+            # Store first few locations as examples
+            room = 10 - len(entry['locations'])
+            if room > 0:
+                entry['locations'].extend(data['locations'][:room])
 
     # Convert sets to lists for JSON serialization
     for strongs_num in words:
         words[strongs_num]['tags'] = list(words[strongs_num]['tags'])
 
     print(f"  Found {len(words)} unique Strong's numbers")
-    return dict(words)
+    return words
 
 
 def filter_words(words_data, include_function_words=False):
@@ -240,8 +270,8 @@ def save_output(vocabulary, sentences, config):
     }
 
     vocab_file = OUTPUT_DIR / "vocabulary_hebrew.json"
-    with open(vocab_file, 'w', encoding='utf-8') as f:
-        json.dump(vocab_output, f, ensure_ascii=False, indent=2)
+    # Intermediate: read by hebrew_add_korean.py
+    save_json(vocab_file, vocab_output)
     print(f"Saved vocabulary to {vocab_file}")
 
     # Sentences file
@@ -254,13 +284,17 @@ def save_output(vocabulary, sentences, config):
     }
 
     sentences_file = OUTPUT_DIR / "sentences_hebrew.json"
-    with open(sentences_file, 'w', encoding='utf-8') as f:
-        json.dump(sentences_output, f, ensure_ascii=False, indent=2)
+    save_json(sentences_file, sentences_output, pretty=True)
     print(f"Saved sentences to {sentences_file}")
 
 
 def main():
     """Run the Hebrew vocabulary pipeline."""
+    parser = argparse.ArgumentParser(description="Hebrew Bible Vocabulary Pipeline")
+    parser.add_argument("--jobs", "-j", type=int,
+                        help="Processes used to scan the Bible (0 = one per core, default: 1)")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Hebrew Bible Vocabulary Pipeline")
     print("=" * 60)
@@ -271,7 +305,7 @@ def main():
     strongs_dict = load_strongs_dictionary(config)
 
     # Process
-    words_data = extract_words(bible_data)
+    words_data = extract_words(bible_data, jobs=args.jobs)
     filtered_words = filter_words(words_data, include_function_words=False)
     vocabulary = map_to_dictionary(filtered_words, strongs_dict)
     sentences = create_sentence_mapping(bible_data)
@@ -0,0 +1,135 @@
+"""Lemmatization with a persistent memo table.
+
+Step 1 lemmatizes every distinct surface form with an irregular-verb lookup
+followed by two WordNet calls. The results are stored in a versioned table
+on disk, so a warm run answers every lookup from the table and never
+imports NLTK or loads WordNet. The table is discarded whenever
+``word_forms.IRREGULAR_VERBS``, the lemmatizer logic in this module or the
+installed NLTK version changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from importlib import metadata
+from pathlib import Path
+
+import word_forms
+from utils import dumps, load_json
+from word_forms import get_base_form
+
+TABLE_VERSION = 1
+
+_lemmatizer = None
+
+
+def get_lemmatizer():
+    """Create the WordNet lemmatizer on first use (imports NLTK lazily)."""
+    global _lemmatizer
+    if _lemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer
+
+
+def lemmatize_word(word: str) -> str:
+    """Convert word to its base form (lemma).
+
+    Uses irregular verb lookup first, then WordNet lemmatizer.
+    """
+    # Check irregular verbs first (from word_forms module)
+    base = get_base_form(word)
+    if base:
+        return base
+
+    lemmatizer = get_lemmatizer()
+
+    # Get both noun and verb lemmas from WordNet
+    noun_lemma = lemmatizer.lemmatize(word, pos='n')
+    verb_lemma = lemmatizer.lemmatize(word, pos='v')
+
+    # Prefer verb lemma for irregular verbs (was->be, has->have)
+    if verb_lemma != word and len(verb_lemma) > 1:
+        if noun_lemma == word or len(noun_lemma) <= 2:
+            return verb_lemma
+
+    # Otherwise prefer noun lemma for plurals (sons->son)
+    if noun_lemma != word:
+        return noun_lemma
+
+    return verb_lemma
+
+
+def fingerprint() -> str:
+    """Identify the lemmatizer: irregular verbs, this module's code, NLTK version."""
+    try:
+        nltk_version = metadata.version("nltk")
+    except metadata.PackageNotFoundError:
+        nltk_version = "none"
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps(word_forms.IRREGULAR_VERBS, sort_keys=True).encode("utf-8"))
+    digest.update(Path(__file__).read_bytes())
+    digest.update(nltk_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LemmaTable:
+    """Surface form -> lemma memo table persisted as JSON."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fingerprint = fingerprint()
+        self.lemmas: dict[str, str] = self._read()
+        self._new = 0
+
+    def _read(self) -> dict[str, str]:
+        if not self.path.exists():
+            return {}
+        try:
+            data = load_json(self.path)
+        except (ValueError, OSError):
+            return {}
+        if data.get("version") != TABLE_VERSION or data.get("fingerprint") != self.fingerprint:
+            return {}
+        return data.get("lemmas", {})
+
+    def __len__(self) -> int:
+        return len(self.lemmas)
+
+    def lemmatize(self, word: str) -> str:
+        """Memoized lemmatize_word."""
+        lemma = self.lemmas.get(word)
+        if lemma is None:
+            lemma = self.lemmas[word] = lemmatize_word(word)
+            self._new += 1
+        return lemma
+
+    @property
+    def new_entries(self) -> int:
+        """Lookups that missed the table since it was loaded."""
+        return self._new
+
+    def save(self) -> None:
+        """Write the table if it grew; merges entries saved concurrently."""
+        if not self._new:
+            return
+
+        # Another version may have saved new entries since we loaded
+        merged = self._read()
+        merged.update(self.lemmas)
+        self.lemmas = merged
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(dumps({
+                "version": TABLE_VERSION,
+                "fingerprint": self.fingerprint,
+                "lemmas": self.lemmas,
+            }))
+        os.replace(tmp_path, self.path)
+        self._new = 0
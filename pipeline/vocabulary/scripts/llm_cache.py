@@ -0,0 +1,188 @@
+"""Persistent cache of LLM responses (SQLite).
+
+Responses are keyed by (backend, model, temperature, SHA-256 of the
+prompt), so rerunning a script after an interruption or crash replays the
+batches that were already answered instead of paying for them again. Each
+entry keeps the raw response, its parsed JSON form (when the caller parsed
+it), the call latency and when it was stored and last used.
+
+Entries older than the TTL are ignored and pruned; when the cache grows past
+its size limit, the least recently used entries are dropped. The database
+uses WAL mode and one connection per thread, so the scripts' worker threads
+(and several scripts at once) can share it.
+
+    python llm_cache.py            # statistics
+    python llm_cache.py --prune    # drop expired/over-limit entries now
+    python llm_cache.py --clear
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from config import LLM_CACHE_PATH
+
+DEFAULT_TTL_DAYS = 90
+DEFAULT_MAX_MB = 512
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    backend TEXT NOT NULL,
+    model TEXT NOT NULL,
+    temperature REAL,
+    prompt_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    parsed TEXT,
+    latency REAL NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+class CachedResponse(NamedTuple):
+    response: str
+    parsed: Any  # None when the caller did not parse the response
+    latency: float
+    created: float
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def cache_key(backend: str, model: str, temperature: float | None, prompt: str) -> str:
+    """Key of one request: its backend, model, temperature and prompt."""
+    payload = json.dumps([backend, model, temperature, prompt_hash(prompt)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response store shared by threads and processes."""
+
+    def __init__(
+        self,
+        path: Path = LLM_CACHE_PATH,
+        ttl_days: float = DEFAULT_TTL_DAYS,
+        max_mb: float = DEFAULT_MAX_MB,
+    ):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Fresh entry for ``key``, or None."""
+        now = time.time()
+        connection = self._connect()
+        row = connection.execute(
+            "SELECT response, parsed, latency, created FROM responses WHERE key = ? AND created >= ?",
+            (key, now - self.ttl),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        response, parsed, latency, created = row
+        return CachedResponse(response, None if parsed is None else json.loads(parsed), latency, created)
+
+    def put(
+        self,
+        key: str,
+        backend: str,
+        model: str,
+        temperature: float | None,
+        prompt: str,
+        response: str,
+        parsed: Any = None,
+        latency: float = 0.0,
+    ) -> None:
+        """Store (or replace) the response to one request."""
+        parsed_text = None if parsed is None else json.dumps(parsed, ensure_ascii=False)
+        size = len(response.encode("utf-8")) + len((parsed_text or "").encode("utf-8"))
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, backend, model, temperature, prompt_hash(prompt), response, parsed_text,
+             latency, now, now, size),
+        )
+
+    def prune(self) -> int:
+        """Drop expired entries, then least recently used ones over the size
+        limit. Returns the number of entries removed."""
+        connection = self._connect()
+        removed = connection.execute(
+            "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+        ).rowcount
+        removed += connection.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total
+                    FROM responses
+                ) WHERE total > ?
+            )
+            """,
+            (self.max_bytes,),
+        ).rowcount
+        return removed
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        """Entry count, stored bytes and saved LLM time (sum of latencies)."""
+        entries, size, latency = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(latency), 0) FROM responses"
+        ).fetchone()
+        return {"entries": entries, "bytes": size, "latency": latency}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or prune the LLM response cache")
+    parser.add_argument("--prune", action="store_true", help="Drop expired and over-limit entries")
+    parser.add_argument("--clear", action="store_true", help="Drop every entry")
+    parser.add_argument("--ttl-days", type=float, default=DEFAULT_TTL_DAYS)
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB)
+    args = parser.parse_args()
+
+    cache = ResponseCache(ttl_days=args.ttl_days, max_mb=args.max_mb)
+    if args.clear:
+        cache.clear()
+        print("Cleared")
+    elif args.prune:
+        print(f"Removed {cache.prune()} entries")
+    stats = cache.stats()
+    print(f"{cache.path}: {stats['entries']} responses, {stats['bytes'] / 2**20:.1f} MB, "
+          f"{stats['latency'] / 60:.1f} min of LLM time")
+
+
+if __name__ == "__main__":
+    main()
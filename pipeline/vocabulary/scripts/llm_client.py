@@ -1,25 +1,47 @@
 """LLM client for vocabulary definition generation.
 
 Supports multiple backends: droid CLI, claude CLI, and Z.AI API.
+
+Requests run on asyncio: API calls share a keep-alive connection pool
+(llm_http.py, at most max_connections per host) and CLI calls run as
+asyncio subprocesses, so generate_many() keeps many prompts in flight
+without a thread each. The synchronous generate()/generate_json() run on
+one background event loop, so the threads that call them share its pool.
+generate_bisecting() asks failed items of a batch again, halving batches
+that fail outright, so one odd item costs a few small requests instead of
+its whole batch.
+
+Successful responses are cached on disk (llm_cache.py), keyed by backend,
+model, temperature and prompt, so reruns only call the LLM for prompts it
+has not answered yet; configure(use_cache=False) turns this off.
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import re
-import subprocess
-import urllib.error
-import urllib.request
-from dataclasses import dataclass
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+from llm_cache import ResponseCache, cache_key
+from llm_control import (
+    CONGESTION, ERROR, OK, OVERLOADED, THROTTLED, TIMEOUT,
+    ConcurrencyController, TokenBucket, backoff_delay, parse_retry_after,
+)
+from llm_http import ConnectionPool
 
-# Optional SDK import
-try:
-    from zai import ZaiClient
-    ZAI_SDK_AVAILABLE = True
-except ImportError:
-    ZAI_SDK_AVAILABLE = False
+# Rough size of a token, for the tokens-per-minute limit
+CHARS_PER_TOKEN = 4
+
+# Failed CLI runs whose output contains one of these were rate limited
+_CLI_THROTTLE_MARKERS = ("rate limit", "429", "overloaded", "too many requests")
 
 
 def load_env() -> None:
@@ -37,6 +59,22 @@ def load_env() -> None:
 load_env()
 
 
+def env_limit(name: str) -> float:
+    """Per-minute limit from environment variable ``name``; unset, empty or
+    invalid values mean no cap (0), the latter with a warning."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return 0.0
+    try:
+        limit = float(value)
+    except ValueError:
+        limit = -1.0
+    if limit < 0 or limit != limit:
+        print(f"Warning: ignoring {name}={value!r} (expected a number >= 0; no limit)")
+        return 0.0
+    return limit
+
+
 @dataclass
 class LLMConfig:
     """LLM client configuration."""
@@ -46,36 +84,73 @@ class LLMConfig:
     api_base: str = os.environ.get("ZAI_API_BASE", "https://api.z.ai/api/coding/paas/v4")
     api_key: str = os.environ.get("ZAI_API_KEY", "")
     api_model: str = os.environ.get("ZAI_MODEL", "glm-4.6")
+    temperature: float = 0.3
     cli_timeout: int = 300
     api_timeout: int = 120
+    max_connections: int = 16  # per API host; the most requests in flight
+    max_cli_processes: int = 40
+    initial_concurrency: int = 4  # adjusted by AIMD up to the maximum
+    max_retries: int = 4
+    # Read when the config is created; 0 = no cap
+    requests_per_minute: float = field(default_factory=lambda: env_limit("LLM_REQUESTS_PER_MINUTE"))
+    tokens_per_minute: float = field(default_factory=lambda: env_limit("LLM_TOKENS_PER_MINUTE"))
+    use_cache: bool = True
 
 
-# Global config and client
+# Global config, response cache, and the background loop for sync calls
 _config = LLMConfig()
-_zai_client = None
+_cache = None
+_cache_lock = threading.Lock()
+# SQLite calls (which may wait on the database lock) run here, off the event
+# loop; one thread means one connection and serialized writes
+_cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+_loop = None
+_loop_lock = threading.Lock()
+_loop_states: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
 
 def configure(
     use_api: bool = False,
     cli_tool: str = "droid",
-    model: str = "glm-4.6"
+    model: str = "glm-4.6",
+    use_cache: bool = True,
+    cli_timeout: int = 300,
+    api_timeout: int = 120,
+    max_connections: int = 16,
+    **limits,
 ) -> None:
-    """Configure the LLM client."""
+    """Configure the LLM client (before the first request).
+
+    ``limits`` sets other LLMConfig fields (max_cli_processes,
+    initial_concurrency, max_retries, requests_per_minute, tokens_per_minute).
+    """
     global _config
-    _config = LLMConfig(use_api=use_api, cli_tool=cli_tool, model=model)
-
-
-def get_zai_client():
-    """Get or create ZAI SDK client."""
-    global _zai_client
-    if _zai_client is None and ZAI_SDK_AVAILABLE:
-        _zai_client = ZaiClient(
-            api_key=_config.api_key,
-            base_url=f"{_config.api_base}/",
-            timeout=float(_config.api_timeout),
-            max_retries=2
-        )
-    return _zai_client
+    _config = LLMConfig(
+        use_api=use_api, cli_tool=cli_tool, model=model, use_cache=use_cache,
+        cli_timeout=cli_timeout, api_timeout=api_timeout, max_connections=max_connections,
+        **limits,
+    )
+    _loop_states.clear()
+
+
+def get_cache() -> ResponseCache | None:
+    """The shared response cache (pruned when first opened), or None when
+    caching is off."""
+    global _cache
+    if not _config.use_cache:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+            _cache.prune()
+    return _cache
+
+
+def cache_summary() -> str | None:
+    """One-line hit/miss count of this run, or None without a cache."""
+    if _cache is None or not _config.use_cache:
+        return None
+    return f"LLM cache: {_cache.hits} hits, {_cache.misses} misses ({_cache.path})"
 
 
 def extract_json_from_response(response: str) -> list:
@@ -89,7 +164,53 @@ def extract_json_from_response(response: str) -> list:
     return []
 
 
-def call_cli(prompt: str) -> str | None:
+def backend_key() -> tuple[str, str, float | None]:
+    """(backend, model, temperature) that identify the configured backend's
+    answers; the CLI tools do not take a temperature."""
+    if _config.use_api:
+        return "zai", _config.api_model, _config.temperature
+    if _config.cli_tool == "droid":
+        return "cli:droid", "default", None
+    return f"cli:{_config.cli_tool}", _config.model, None
+
+
+class _LoopState:
+    """Per event loop: the HTTP connection pool, the concurrency controller
+    and the rate limits."""
+
+    def __init__(self):
+        maximum = _config.max_connections if _config.use_api else _config.max_cli_processes
+        self.pool = ConnectionPool(_config.max_connections)
+        self.controller = ConcurrencyController(_config.initial_concurrency, maximum=maximum)
+        self.requests = TokenBucket(_config.requests_per_minute)
+        self.tokens = TokenBucket(_config.tokens_per_minute)
+        self.retries = 0
+
+
+def _loop_state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        state = _loop_states[loop] = _LoopState()
+    return state
+
+
+class _Attempt(NamedTuple):
+    """Result of one request: text (None on failure), outcome (llm_control),
+    server-requested wait, output tokens to charge to the rate limit, and
+    whether a failure that is not congestion is still worth retrying."""
+    text: str | None
+    outcome: str
+    retry_after: float | None = None
+    output_tokens: int = 0
+    transient: bool = False
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+async def call_cli(prompt: str) -> _Attempt:
     """Call CLI tool (droid or claude) with prompt."""
     if _config.cli_tool == "droid":
         cmd = ["droid", "exec", "-o", "text"]
@@ -97,24 +218,34 @@ def call_cli(prompt: str) -> str | None:
         cmd = [_config.cli_tool, "--model", _config.model, "--print"]
 
     try:
-        result = subprocess.run(
-            cmd,
-            input=prompt,
-            capture_output=True,
-            text=True,
-            timeout=_config.cli_timeout
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
-        if result.returncode == 0:
-            return result.stdout
-    except subprocess.TimeoutExpired:
-        pass
-    except Exception:
-        pass
-    return None
-
-
-def call_api(prompt: str) -> str | None:
-    """Call Z.AI API with prompt."""
+    except OSError:
+        return _Attempt(None, ERROR)
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            process.communicate(prompt.encode("utf-8")), _config.cli_timeout
+        )
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return _Attempt(None, TIMEOUT)
+    if process.returncode == 0:
+        text = stdout.decode("utf-8", errors="replace")
+        return _Attempt(text, OK, output_tokens=estimate_tokens(text))
+    # The CLIs report provider limits as text on a failed exit
+    message = (stdout + stderr).decode("utf-8", errors="replace").lower()
+    if any(marker in message for marker in _CLI_THROTTLE_MARKERS):
+        return _Attempt(None, THROTTLED)
+    return _Attempt(None, ERROR)
+
+
+async def call_api(prompt: str) -> _Attempt:
+    """Call Z.AI API with prompt over the loop's keep-alive pool."""
     url = f"{_config.api_base}/chat/completions"
     headers = {
         "Content-Type": "application/json",
@@ -123,62 +254,271 @@ def call_api(prompt: str) -> str | None:
     data = {
         "model": _config.api_model,
         "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
+        "temperature": _config.temperature,
+        "thinking": {"type": "disabled"}
     }
 
     try:
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(data).encode("utf-8"),
-            headers=headers,
-            method="POST"
+        response = await _loop_state().pool.request(
+            "POST", url, headers, json.dumps(data).encode("utf-8"), timeout=_config.api_timeout
         )
-        with urllib.request.urlopen(req, timeout=_config.api_timeout) as response:
-            result = json.loads(response.read().decode("utf-8"))
-        return result.get("choices", [{}])[0].get("message", {}).get("content", "")
-    except (urllib.error.HTTPError, urllib.error.URLError, TimeoutError):
-        pass
-    except Exception:
-        pass
+    except asyncio.TimeoutError:
+        return _Attempt(None, TIMEOUT)
+    except OSError:
+        return _Attempt(None, ERROR, transient=True)
+
+    retry_after = parse_retry_after(response.headers.get("retry-after"))
+    if response.status == 429:
+        return _Attempt(None, THROTTLED, retry_after)
+    if response.status >= 500:
+        return _Attempt(None, OVERLOADED, retry_after)
+    if response.status != 200:
+        return _Attempt(None, ERROR)
+    try:
+        result = response.json()
+        text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+    except (ValueError, AttributeError, IndexError):
+        return _Attempt(None, ERROR)
+    usage = result.get("usage") or {}
+    return _Attempt(text, OK, output_tokens=usage.get("completion_tokens") or estimate_tokens(text))
+
+
+async def call_backend(prompt: str) -> str | None:
+    """Send a prompt to the configured backend (uncached).
+
+    Waits for the rate limits and a concurrency slot; throttling, 5xx,
+    timeouts and connection errors are retried up to max_retries times with
+    jittered exponential backoff (at least the server's Retry-After).
+    """
+    state = _loop_state()
+    call = call_api if _config.use_api else call_cli
+    for attempt in range(_config.max_retries + 1):
+        await state.requests.take()
+        await state.tokens.take(estimate_tokens(prompt))
+        started = await state.controller.acquire()
+        result = _Attempt(None, ERROR)
+        try:
+            result = await call(prompt)
+        finally:
+            await state.controller.release(started, result.outcome, result.retry_after)
+        state.tokens.charge(result.output_tokens)
+
+        retryable = result.outcome in CONGESTION or result.transient
+        if result.outcome == OK or not retryable or attempt == _config.max_retries:
+            return result.text
+        state.retries += 1
+        await asyncio.sleep(backoff_delay(attempt, result.retry_after))
     return None
 
 
-def call_sdk(prompt: str) -> str | None:
-    """Call Z.AI SDK with prompt."""
-    client = get_zai_client()
-    if client is None:
-        return call_api(prompt)
+async def _in_cache_thread(func: Callable, *args) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(_cache_executor, func, *args)
+
+
+async def _generate_entry(prompt: str, parse: Callable[[str], Any] | None) -> tuple[str | None, Any]:
+    """(raw response, parsed result) for one prompt, from the cache or the backend."""
+    cache = await _in_cache_thread(get_cache)
+    backend, model, temperature = backend_key()
+    key = cache_key(backend, model, temperature, prompt)
+    if cache is not None:
+        entry = await _in_cache_thread(cache.get, key)
+        if entry is not None:
+            if parse is None:
+                return entry.response, None
+            if entry.parsed:
+                return entry.response, entry.parsed
+            parsed = parse(entry.response)
+            if parsed:
+                await _in_cache_thread(cache.put, key, backend, model, temperature, prompt,
+                                       entry.response, parsed, entry.latency)
+                return entry.response, parsed
+
+    start = time.perf_counter()
+    response = await call_backend(prompt)
+    latency = time.perf_counter() - start
+    if parse is None:
+        if cache is not None and response:
+            await _in_cache_thread(cache.put, key, backend, model, temperature, prompt,
+                                   response, None, latency)
+        return response, None
+
+    parsed = parse(response) if response else None
+    if cache is not None and parsed:
+        await _in_cache_thread(cache.put, key, backend, model, temperature, prompt,
+                               response, parsed, latency)
+    return response, parsed or []
+
+
+async def _generate_one(prompt: str, parse: Callable[[str], Any] | None) -> Any:
+    response, parsed = await _generate_entry(prompt, parse)
+    return response if parse is None else parsed
+
+
+async def generate_many(
+    prompts: list[str],
+    parse: Callable[[str], Any] | None = None,
+    on_result: Callable[[int, Any], None] | None = None,
+) -> list:
+    """Generate responses to all ``prompts`` concurrently (cached).
+
+    Results are in prompt order: the response text (None on failure), or
+    with ``parse`` the parsed result ([] on failure). Only responses that
+    parse to a non-empty result are cached when parsing, so a garbled
+    answer is asked again on the next run. ``on_result(index, result)`` is
+    called as each prompt finishes. Requests in flight are set by the
+    concurrency controller (llm_control.py), not by threads.
+    """
+    async def one(index: int, prompt: str) -> Any:
+        result = await _generate_one(prompt, parse)
+        if on_result is not None:
+            on_result(index, result)
+        return result
+
+    return list(await asyncio.gather(*(one(i, prompt) for i, prompt in enumerate(prompts))))
+
+
+class DeadLetter(NamedTuple):
+    """An item that failed on its own, with the response it got (None if the
+    backend never answered) and the error raised handling it, if any."""
+    item: Any
+    response: str | None
+    error: str | None = None
+
+
+async def generate_bisecting(
+    batches: list[list],
+    prompt: Callable[[list], str],
+    match: Callable[[list, Any], tuple[Any, list]],
+    parse: Callable[[str], Any] | None = None,
+    on_result: Callable[[int, Any], None] | None = None,
+) -> list[DeadLetter]:
+    """Generate every batch, splitting failed ones until single items fail.
+
+    ``prompt(items)`` builds a batch's prompt and ``match(items, parsed)``
+    returns (results, failed items) for its parsed response (default parse:
+    extract_json_from_response). Results are passed to ``on_result(index,
+    results)`` as soon as each (sub-)batch answers, with ``index`` the
+    original batch. Failed items are asked again: as one smaller batch when
+    only some failed, or split in half when none came back, since one odd
+    item can break a whole response. An item that fails alone, or a batch
+    the backend did not answer at all (after call_backend's retries),
+    becomes a DeadLetter; these are returned in batch order. A parse error
+    counts as an empty response; an error in ``match`` or ``on_result``
+    turns that sub-batch's items into DeadLetters, so one bad batch does
+    not stop the others.
+    """
+    parse = parse or extract_json_from_response
 
+    def safe_parse(response: str) -> Any:
+        try:
+            return parse(response)
+        except Exception:
+            return []
+
+    async def run(index: int, items: list) -> list[DeadLetter]:
+        text = prompt(items)
+        response, parsed = await _generate_entry(text, safe_parse)
+        if response is None:
+            return [DeadLetter(item, None) for item in items]
+        try:
+            results, failed = match(items, parsed)
+            if on_result is not None and len(failed) < len(items):
+                on_result(index, results)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            return [DeadLetter(item, response, error) for item in items]
+        if not failed:
+            return []
+        if len(items) == 1:
+            return [DeadLetter(items[0], response)]
+        if len(failed) < len(items):
+            parts = [failed]
+        else:
+            half = len(items) // 2
+            parts = [items[:half], items[half:]]
+        dead = await asyncio.gather(*(run(index, part) for part in parts))
+        return [letter for letters in dead for letter in letters]
+
+    dead = await asyncio.gather(*(run(i, batch) for i, batch in enumerate(batches)))
+    return [letter for letters in dead for letter in letters]
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop (in a daemon thread) that runs the synchronous calls, so
+    every thread calling generate() shares one connection pool."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client", daemon=True).start()
+    return _loop
+
+
+def _run(coroutine) -> Any:
+    loop = _background_loop()
     try:
-        response = client.chat.completions.create(
-            model=_config.api_model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            extra_body={"thinking": {"type": "disabled"}}
-        )
-        if response.choices:
-            return response.choices[0].message.content or ""
-    except Exception:
-        pass
-    return None
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coroutine.close()
+        raise RuntimeError("Use 'await generate_many(...)' inside the LLM client's event loop")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
 
 
 def generate(prompt: str) -> str | None:
-    """Generate response using configured backend."""
-    if _config.use_api:
-        if ZAI_SDK_AVAILABLE:
-            return call_sdk(prompt)
-        return call_api(prompt)
-    return call_cli(prompt)
+    """Generate response using configured backend (cached); safe to call
+    from any thread."""
+    return _run(generate_many([prompt]))[0]
 
 
-def generate_definitions(words: list[str]) -> list[dict]:
-    """Generate definitions for a batch of words.
+def generate_json(
+    prompt: str, parse: Callable[[str], Any] | None = None
+) -> Any:
+    """Generate a response and parse it (default: extract_json_from_response).
 
-    Returns list of definition dicts with word, ipa_pronunciation,
-    korean_pronunciation, definition_korean.
+    Returns the parsed result, or [] on failure; see generate_many().
     """
-    prompt = f"""You are a Bible vocabulary assistant. Generate pronunciation and Korean definition for each English word.
+    return _run(generate_many([prompt], parse or extract_json_from_response))[0]
+
+
+def generate_many_sync(
+    prompts: list[str],
+    parse: Callable[[str], Any] | None = None,
+    on_result: Callable[[int, Any], None] | None = None,
+) -> list:
+    """generate_many() for synchronous callers (runs on the background loop;
+    ``on_result`` is called from its thread)."""
+    return _run(generate_many(prompts, parse, on_result))
+
+
+def generate_bisecting_sync(
+    batches: list[list],
+    prompt: Callable[[list], str],
+    match: Callable[[list, Any], tuple[Any, list]],
+    parse: Callable[[str], Any] | None = None,
+    on_result: Callable[[int, Any], None] | None = None,
+) -> list[DeadLetter]:
+    """generate_bisecting() for synchronous callers (``on_result`` is called
+    from the background loop's thread)."""
+    return _run(generate_bisecting(batches, prompt, match, parse, on_result))
+
+
+def pool_summary() -> str | None:
+    """Connections, retries and concurrency of the synchronous calls."""
+    state = _loop_states.get(_loop) if _loop is not None else None
+    if state is None or not sum(state.controller.counts.values()):
+        return None
+    summary = f"LLM requests: {state.controller.summary()}, {state.retries} retries"
+    if state.pool.requests:
+        summary += (f"; HTTP pool: {state.pool.requests} requests over "
+                    f"{state.pool.connections_opened} connections")
+    return summary
+
+
+def definitions_prompt(words: list[str]) -> str:
+    """Prompt asking for pronunciation and Korean definitions of ``words``."""
+    return f"""You are a Bible vocabulary assistant. Generate pronunciation and Korean definition for each English word.
 
 Words: {", ".join(words)}
 
@@ -192,7 +532,11 @@ Respond in JSON array format ONLY (no explanation, no markdown):
   }}
 ]"""
 
-    response = generate(prompt)
-    if response:
-        return extract_json_from_response(response)
-    return []
+
+def generate_definitions(words: list[str]) -> list[dict]:
+    """Generate definitions for a batch of words.
+
+    Returns list of definition dicts with word, ipa_pronunciation,
+    korean_pronunciation, definition_korean.
+    """
+    return generate_json(definitions_prompt(words))
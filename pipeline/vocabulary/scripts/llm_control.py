@@ -0,0 +1,160 @@
+"""Adaptive concurrency, rate limits and backoff for LLM requests.
+
+ConcurrencyController sets how many requests may be in flight with AIMD
+(additive increase, multiplicative decrease), the way TCP finds a link's
+capacity:
+
+- a success whose latency is within LATENCY_TOLERANCE x the baseline (the
+  lowest recent latency) raises the limit by 1/limit, about +1 per round
+  of requests; a slower success lowers it by 1/limit, since queueing at
+  the provider shows up as latency first
+- HTTP 429, 5xx and timeouts halve the limit, once per round: failures of
+  requests sent before the last decrease do not count again
+- a Retry-After pauses every new request until it has passed
+
+TokenBucket caps requests or tokens per minute (0 = no cap), and
+backoff_delay() gives the jittered exponential wait before a retry.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+LATENCY_TOLERANCE = 2.0
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+# Outcomes of one request
+OK = "ok"
+THROTTLED = "throttled"  # 429
+OVERLOADED = "overloaded"  # 5xx
+TIMEOUT = "timeout"
+ERROR = "error"  # other failures (connection errors, bad responses)
+
+CONGESTION = (THROTTLED, OVERLOADED, TIMEOUT)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """Full-jitter exponential backoff for retry ``attempt`` (0-based), at
+    least ``retry_after``."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class TokenBucket:
+    """Allow ``per_minute`` units per minute, in bursts of up to a minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float = 1.0) -> None:
+        """Wait until ``amount`` is available, then spend it (callers are
+        served in order)."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            # A request larger than the bucket goes through when it is full
+            needed = min(amount, self.capacity)
+            while True:
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((needed - self.tokens) / self.rate)
+
+    def charge(self, amount: float) -> None:
+        """Spend ``amount`` after the fact (may go negative: later requests wait)."""
+        if self.rate > 0:
+            self._refill()
+            self.tokens -= amount
+
+
+class ConcurrencyController:
+    """AIMD limit on requests in flight."""
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.peak = self.limit
+        self.in_flight = 0
+        self.baseline: float | None = None
+        self.paused_until = 0.0
+        self.counts = {OK: 0, THROTTLED: 0, OVERLOADED: 0, TIMEOUT: 0, ERROR: 0}
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the request's start time for release()."""
+        async with self._condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                try:
+                    await asyncio.wait_for(self._condition.wait(), wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+            return time.monotonic()
+
+    async def release(self, started: float, outcome: str, retry_after: float | None = None) -> None:
+        """Record a finished request and adjust the limit."""
+        now = time.monotonic()
+        latency = now - started
+        async with self._condition:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+            if outcome == OK:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    # Drift up slowly so the baseline follows longer prompts
+                    self.baseline += 0.01 * (latency - self.baseline)
+                step = 1 / self.limit
+                if latency <= LATENCY_TOLERANCE * self.baseline:
+                    self.limit = min(self.maximum, self.limit + step)
+                else:
+                    self.limit = max(self.minimum, self.limit - step)
+                self.peak = max(self.peak, self.limit)
+            elif outcome in CONGESTION:
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            self._condition.notify_all()
+
+    def summary(self) -> str:
+        counts = self.counts
+        return (f"concurrency {int(self.limit)} (peak {int(self.peak)}), {counts[OK]} ok, "
+                f"{counts[THROTTLED]} throttled, {counts[OVERLOADED]} 5xx, "
+                f"{counts[TIMEOUT]} timeouts, {counts[ERROR]} errors")
@@ -0,0 +1,172 @@
+"""Minimal asyncio HTTP/1.1 client with a keep-alive connection pool.
+
+llm_client sends every API request through one ConnectionPool per event
+loop: connections (and their TLS sessions) are reused across requests
+instead of being opened per batch, and at most ``max_per_host`` are open
+to one host at a time, so any number of coroutines can be in flight
+without one thread each. Only what the LLM APIs need is implemented:
+request bodies with Content-Length, responses with Content-Length, chunked
+or close-delimited bodies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import ssl
+import time
+from typing import Any, NamedTuple
+from urllib.parse import urlsplit
+
+# Idle connections older than this are closed instead of reused (servers
+# commonly drop keep-alive connections after 60s or more)
+KEEPALIVE_SECONDS = 30.0
+
+
+class HTTPResponse(NamedTuple):
+    status: int
+    headers: dict[str, str]  # lowercase names
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode("utf-8"))
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.idle_since = time.monotonic()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keep-alive connections per (scheme, host, port), bounded per host."""
+
+    def __init__(self, max_per_host: int = 16):
+        self.max_per_host = max_per_host
+        self.connections_opened = 0
+        self.requests = 0
+        self._idle: dict[tuple, list[_Connection]] = {}
+        self._limits: dict[tuple, asyncio.Semaphore] = {}
+        self._ssl = ssl.create_default_context()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+        timeout: float | None = None,
+    ) -> HTTPResponse:
+        """Send one request; raises asyncio.TimeoutError on timeout and
+        OSError on any other failure (ConnectionError for a truncated or
+        malformed response)."""
+        parts = urlsplit(url)
+        https = parts.scheme == "https"
+        key = (parts.scheme, parts.hostname, parts.port or (443 if https else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        head = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}",
+                "Connection: keep-alive"]
+        head.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        message = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+        limit = self._limits.setdefault(key, asyncio.Semaphore(self.max_per_host))
+        async with limit:
+            self.requests += 1
+            return await asyncio.wait_for(self._send(key, message, method), timeout)
+
+    async def _send(self, key: tuple, message: bytes, method: str) -> HTTPResponse:
+        # A reused connection may have been closed by the server while idle;
+        # then the request is sent once more on a new connection
+        while True:
+            connection, reused = await self._acquire(key)
+            try:
+                connection.writer.write(message)
+                await connection.writer.drain()
+                response, keep_alive = await self._read_response(connection.reader, method)
+            except (ConnectionError, EOFError, ValueError) as exc:
+                # EOFError: the body ended early (IncompleteReadError);
+                # ValueError: a malformed status line, chunk size or length,
+                # or a line over the reader's limit
+                connection.close()
+                if reused:
+                    continue
+                if isinstance(exc, ConnectionError):
+                    raise
+                raise ConnectionError(f"Bad response: {exc!r}") from exc
+            except BaseException:
+                # Timeout/cancellation mid-response: the connection is unusable
+                connection.close()
+                raise
+            if keep_alive:
+                connection.idle_since = time.monotonic()
+                self._idle.setdefault(key, []).append(connection)
+            else:
+                connection.close()
+            return response
+
+    async def _acquire(self, key: tuple) -> tuple[_Connection, bool]:
+        idle = self._idle.get(key, [])
+        now = time.monotonic()
+        while idle:
+            connection = idle.pop()
+            if now - connection.idle_since < KEEPALIVE_SECONDS and not connection.reader.at_eof():
+                return connection, True
+            connection.close()
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl if scheme == "https" else None
+        )
+        self.connections_opened += 1
+        return _Connection(reader, writer), False
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader, method: str) -> tuple[HTTPResponse, bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before the response")
+        version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        status = int(status)
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # Trailers end with an empty line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return HTTPResponse(status, headers, body), keep_alive
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
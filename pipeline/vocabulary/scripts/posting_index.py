@@ -0,0 +1,387 @@
+"""Lemma-level inverted index of Bible verses, persisted per version.
+
+Built once from the compiled corpus (bible_corpus.py) and the step 1
+lemmatizer, then memory-mapped by every consumer (step 5's candidate
+verses, range_query.py): lemma -> sorted verse ids, the token positions
+of the lemma in each verse, and verse lengths.
+Lookups touch only the slices they need, so a query after opening costs
+microseconds.
+
+File layout (little-endian, sections 8-byte aligned):
+
+    header          magic, format version, source key (corpus + lemmatizer),
+                    counts and section offsets
+    lemma pool      uint32 offsets[n_lemmas + 1] + UTF-8 blob; lemmas sorted,
+                    a lemma's id is its position
+    lemma postings  uint32[n_lemmas + 1]: first posting of each lemma
+    posting verses  uint32[n_postings]: verse id, ascending within a lemma
+    position index  uint32[n_postings + 1]: first position of each posting
+    positions       uint32[n_positions]: token index within the verse
+    verse lengths   uint32[n_verses]: verse text length in characters
+    verse tokens    uint32[n_verses + 1]: first token of each verse
+    token lemmas    uint32[n_tokens]: lemma id of each corpus token
+                    (NO_LEMMA for numbers, which step 1 does not count)
+
+Usage:
+    python posting_index.py build [--force]
+    python posting_index.py query shepherd --limit 5
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator
+
+import lemmas
+from bible_corpus import Corpus, _pad, _to_le, _u32, load_corpus
+from scanner import merge_postings, scan_corpus
+from tokenizer import is_numeric_word
+
+MAGIC = b"BVPOSTNG"
+FORMAT_VERSION = 1
+
+NO_LEMMA = 0xFFFFFFFF
+
+# magic, format version, source key, n_lemmas, n_verses, n_postings,
+# n_positions, n_tokens, then section offsets
+_HEADER = struct.Struct("<8sI32sIIIIIQQQQQQQQQ")
+
+assert _HEADER.size % 8 == 0
+
+
+def source_key(corpus: Corpus) -> bytes:
+    """Identify what an index was built from: the corpus and the lemmatizer."""
+    digest = hashlib.sha256()
+    digest.update(corpus.tokenizer_id)
+    digest.update(f"{corpus.source_size}:{corpus.source_mtime}".encode("ascii"))
+    digest.update(lemmas.fingerprint().encode("ascii"))
+    return digest.hexdigest()[:32].encode("ascii")
+
+
+def index_shard(corpus: Corpus, start: int, stop: int, token_lemmas: list) -> dict:
+    """lemma id -> [(verse, positions), ...] for verses [start, stop)."""
+    postings = {}
+    for verse in range(start, stop):
+        in_verse = {}
+        for position, sid in enumerate(corpus.tokens(verse)):
+            lemma_id = token_lemmas[sid]
+            if lemma_id != NO_LEMMA:
+                positions = in_verse.get(lemma_id)
+                if positions is None:
+                    in_verse[lemma_id] = [position]
+                else:
+                    positions.append(position)
+        for lemma_id, positions in in_verse.items():
+            entry = postings.get(lemma_id)
+            if entry is None:
+                postings[lemma_id] = [(verse, positions)]
+            else:
+                entry.append((verse, positions))
+    return postings
+
+
+def build_index(corpus: Corpus, lemmatize: Callable[[str], str], path: Path) -> None:
+    """Build the posting index of ``corpus`` at ``path``."""
+    strings = corpus.strings
+    all_tokens = corpus.all_tokens
+
+    # Lemmatize each distinct token once; lemma ids follow sorted lemma order
+    # so they are stable for a given corpus and lemmatizer
+    string_lemma = {}
+    for sid in set(all_tokens):
+        word = strings[sid]
+        if not is_numeric_word(word):
+            string_lemma[sid] = lemmatize(word)
+    lemma_list = sorted(set(string_lemma.values()))
+    lemma_ids = {lemma: index for index, lemma in enumerate(lemma_list)}
+    sid_lemma = [NO_LEMMA] * len(strings)
+    for sid, lemma in string_lemma.items():
+        sid_lemma[sid] = lemma_ids[lemma]
+
+    # Book shards come back in canonical order, so verse ids stay ascending
+    partials = scan_corpus(corpus, partial(index_shard, token_lemmas=sid_lemma))
+    postings = merge_postings(partials)
+
+    lemma_offsets = _u32([0])
+    posting_verses = _u32([])
+    position_offsets = _u32([0])
+    positions = _u32([])
+    for lemma_id in range(len(lemma_list)):
+        for verse, verse_positions in postings.get(lemma_id, ()):
+            posting_verses.append(verse)
+            positions.extend(verse_positions)
+            position_offsets.append(len(positions))
+        lemma_offsets.append(len(posting_verses))
+
+    n_verses = len(corpus)
+    verse_lengths = _u32(len(corpus.text(verse)) for verse in range(n_verses))
+    verse_tokens = _u32([0])
+    for verse in range(n_verses):
+        verse_tokens.append(verse_tokens[-1] + len(corpus.tokens(verse)))
+    token_lemmas = _u32(sid_lemma[sid] for sid in all_tokens)
+
+    pool_offsets = _u32([0])
+    pool_blob = bytearray()
+    for lemma in lemma_list:
+        pool_blob += lemma.encode("utf-8")
+        pool_offsets.append(len(pool_blob))
+
+    body = bytearray()
+    offsets = []
+    sections = (
+        _to_le(pool_offsets), pool_blob, _to_le(lemma_offsets), _to_le(posting_verses),
+        _to_le(position_offsets), _to_le(positions), _to_le(verse_lengths),
+        _to_le(verse_tokens), _to_le(token_lemmas),
+    )
+    for section in sections:
+        offsets.append(_HEADER.size + len(body))
+        body += section
+        _pad(body)
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, source_key(corpus), len(lemma_list), n_verses,
+        len(posting_verses), len(positions), len(all_tokens), *offsets,
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+class PostingIndex:
+    """Read-only view of a posting index file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic, self.format_version, self.source_key, n_lemmas, n_verses,
+            n_postings, n_positions, n_tokens,
+            pool_index_off, pool_blob_off, lemma_off, verses_off,
+            position_index_off, positions_off, lengths_off, verse_tokens_off, tokens_off,
+        ) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or self.format_version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Not a posting index (version {FORMAT_VERSION}): {path}")
+        self.n_postings = n_postings
+
+        self._view = memoryview(self._mm)
+        self._pool_index = self._u32_view(pool_index_off, n_lemmas + 1)
+        self._pool_blob = self._view[pool_blob_off:lemma_off]
+        self._lemma_offsets = self._u32_view(lemma_off, n_lemmas + 1)
+        self._posting_verses = self._u32_view(verses_off, n_postings)
+        self._position_offsets = self._u32_view(position_index_off, n_postings + 1)
+        self._positions = self._u32_view(positions_off, n_positions)
+        self._verse_lengths = self._u32_view(lengths_off, n_verses)
+        self._verse_tokens = self._u32_view(verse_tokens_off, n_verses + 1)
+        self._token_lemmas = self._u32_view(tokens_off, n_tokens)
+        self._lemmas: list[str] | None = None
+        self._lemma_ids: dict[str, int] | None = None
+
+    def _u32_view(self, offset: int, count: int):
+        raw = self._view[offset:offset + 4 * count]
+        if sys.byteorder == "little":
+            return raw.cast("I")
+        arr = _u32([])
+        arr.frombytes(raw)
+        arr.byteswap()
+        return arr
+
+    def __len__(self) -> int:
+        return len(self._pool_index) - 1
+
+    def __contains__(self, lemma: str) -> bool:
+        return lemma in self.lemma_ids
+
+    def __enter__(self) -> PostingIndex:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map."""
+        for name in (
+            "_pool_index", "_pool_blob", "_lemma_offsets", "_posting_verses",
+            "_position_offsets", "_positions", "_verse_lengths", "_verse_tokens",
+            "_token_lemmas", "_view",
+        ):
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # A caller still holds a slice; the map is freed with it
+            pass
+        self._file.close()
+
+    @property
+    def lemmas(self) -> list[str]:
+        """All lemmas, sorted and indexed by lemma id (decoded once)."""
+        if self._lemmas is None:
+            blob = bytes(self._pool_blob)
+            index = self._pool_index
+            self._lemmas = [
+                blob[index[i]:index[i + 1]].decode("utf-8")
+                for i in range(len(index) - 1)
+            ]
+        return self._lemmas
+
+    @property
+    def lemma_ids(self) -> dict[str, int]:
+        """lemma -> lemma id (built once)."""
+        if self._lemma_ids is None:
+            self._lemma_ids = {lemma: index for index, lemma in enumerate(self.lemmas)}
+        return self._lemma_ids
+
+    def _posting_range(self, lemma: str) -> tuple[int, int]:
+        lemma_id = self.lemma_ids.get(lemma)
+        if lemma_id is None:
+            return 0, 0
+        return self._lemma_offsets[lemma_id], self._lemma_offsets[lemma_id + 1]
+
+    def verses(self, lemma: str):
+        """Ids of the verses containing ``lemma``, ascending."""
+        start, stop = self._posting_range(lemma)
+        return self._posting_verses[start:stop]
+
+    def document_frequency(self, lemma: str) -> int:
+        """Number of verses containing ``lemma``."""
+        start, stop = self._posting_range(lemma)
+        return stop - start
+
+    def frequency(self, lemma: str) -> int:
+        """Number of occurrences of ``lemma`` in the whole corpus."""
+        start, stop = self._posting_range(lemma)
+        return self._position_offsets[stop] - self._position_offsets[start]
+
+    def postings(self, lemma: str) -> Iterator[tuple[int, object]]:
+        """(verse id, token positions of ``lemma`` in it) in verse order."""
+        start, stop = self._posting_range(lemma)
+        offsets = self._position_offsets
+        for posting in range(start, stop):
+            yield (
+                self._posting_verses[posting],
+                self._positions[offsets[posting]:offsets[posting + 1]],
+            )
+
+    def positions_in(self, lemma: str, verses) -> list:
+        """Token positions of ``lemma`` in each of ``verses`` (ascending verse
+        ids); empty for the verses it does not occur in."""
+        start, stop = self._posting_range(lemma)
+        posting_verses, offsets, positions = self._posting_verses, self._position_offsets, self._positions
+        found = []
+        for verse in verses:
+            start = bisect_left(posting_verses, verse, start, stop)
+            if start < stop and posting_verses[start] == verse:
+                found.append(positions[offsets[start]:offsets[start + 1]])
+            else:
+                found.append(())
+        return found
+
+    def posting_arrays(self) -> tuple[object, object, object]:
+        """The raw (lemma postings, posting verses, position index) sections,
+        for vectorized consumers (see the file layout above)."""
+        return self._lemma_offsets, self._posting_verses, self._position_offsets
+
+    def verse_length(self, verse: int) -> int:
+        """Length of a verse's text in characters."""
+        return self._verse_lengths[verse]
+
+    def verse_lemmas(self, verse: int) -> list[str]:
+        """Lemmas of a verse's tokens in order (numbers omitted)."""
+        lemma_list = self.lemmas
+        return [
+            lemma_list[lemma_id]
+            for lemma_id in self._token_lemmas[self._verse_tokens[verse]:self._verse_tokens[verse + 1]]
+            if lemma_id != NO_LEMMA
+        ]
+
+
+def is_current(path: Path, corpus: Corpus) -> bool:
+    """Check whether an index file was built from ``corpus`` and the current lemmatizer."""
+    if not path.exists():
+        return False
+    try:
+        with open(path, "rb") as f:
+            magic, version, key, *_ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return False
+    return magic == MAGIC and version == FORMAT_VERSION and key == source_key(corpus)
+
+
+def load_index(config, corpus: Corpus | None = None) -> PostingIndex:
+    """Open the posting index of a version, building it first if stale.
+
+    ``config`` is a config.PipelineConfig; ``corpus`` is loaded from it
+    when not given.
+    """
+    from config import LEMMA_TABLE_PATH
+
+    path = config.posting_index_path
+    if corpus is None:
+        corpus = load_corpus(config.bible_json_path, config.corpus_path)
+    if not is_current(path, corpus):
+        print(f"Building posting index {path}")
+        lemma_table = lemmas.LemmaTable(LEMMA_TABLE_PATH)
+        build_index(corpus, lemma_table.lemmatize, path)
+        lemma_table.save()
+    return PostingIndex(path)
+
+
+def main():
+    import argparse
+
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description="Build or query the lemma posting index")
+    parser.add_argument("--version", "-v", help="Bible version (default: $BIBLE_VERSION or niv)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the index if stale and print statistics")
+    build.add_argument("--force", action="store_true", help="Rebuild even if up to date")
+    query = subparsers.add_parser("query", help="Show the verses containing a lemma")
+    query.add_argument("lemma")
+    query.add_argument("--limit", type=int, default=10, help="Verses to print (default: 10)")
+    args = parser.parse_args()
+
+    config = get_config(args.version)
+    corpus = load_corpus(config.bible_json_path, config.corpus_path)
+
+    if args.command == "build":
+        if args.force and config.posting_index_path.exists():
+            config.posting_index_path.unlink()
+        with load_index(config, corpus) as index:
+            print(f"Lemmas: {len(index)}")
+            print(f"Postings: {index.n_postings}")
+            print(f"Size: {index.path.stat().st_size / 1024:.0f} KB")
+        return
+
+    lemma = args.lemma.lower()
+    with load_index(config, corpus) as index:
+        index.lemma_ids  # decode the lemma table outside the timing
+        start = time.perf_counter()
+        verses = index.verses(lemma)
+        elapsed = time.perf_counter() - start
+        print(f"{lemma}: {len(verses)} verses, {index.frequency(lemma)} occurrences "
+              f"(lookup {elapsed * 1e6:.1f} us)")
+        for verse_id, positions in islice(index.postings(lemma), args.limit):
+            verse = corpus.verse(verse_id)
+            print(f"  {verse.book} {verse.chapter}:{verse.verse} {list(positions)} {verse.text}")
+
+
+if __name__ == "__main__":
+    main()
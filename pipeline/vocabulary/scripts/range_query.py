@@ -0,0 +1,249 @@
+"""Vocabulary of any book/chapter range from per-chapter prefix sums.
+
+Every chapter gets an index in canonical order. For each lemma, the
+running occurrence count at each chapter it occurs in is kept in one
+lemma-major array, so the count of a lemma in chapters [a, b) is the
+difference of two prefix sums found by binary search, and all lemmas are
+counted at once with two vectorized searches. The arrays are derived from
+the posting index (posting_index.py: step 1's tokenization and
+lemmatizer) in tens of milliseconds; counting a range then takes about
+a millisecond.
+
+Ranges are written "Romans", "Romans 8", "Romans 1-8" or
+"Genesis 50 - Exodus 2"; book names are case-insensitive and may be
+abbreviated to a unique prefix ("rom 1-8").
+
+    python range_query.py -v niv top "Romans 1-8"
+    python range_query.py -v niv new "Genesis 12" --seen "Genesis 1-11"
+    python range_query.py -v niv count "Psalms 23" shepherd lord
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+from bible_corpus import Corpus, load_corpus
+from posting_index import PostingIndex, load_index
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+_RANGE_SEPARATOR = re.compile(r"\s*[-–—]\s*")
+_REFERENCE = re.compile(r"(.+?)(?:\s+(\d+))?")
+
+
+class ChapterCounts:
+    """Per-chapter prefix sums of every lemma's occurrences."""
+
+    def __init__(self, index: PostingIndex, corpus: Corpus):
+        chapters = corpus.chapters()
+        self.chapters = [(book, chapter) for book, chapter, _, _ in chapters]
+        self.lemmas = index.lemmas
+        self.lemma_ids = index.lemma_ids
+
+        # Book name (lowercase) -> (name, {chapter label: chapter index})
+        self._books: dict[str, tuple[str, dict[str, int]]] = {}
+        for position, (book, chapter) in enumerate(self.chapters):
+            self._books.setdefault(book.lower(), (book, {}))[1][chapter] = position
+
+        n_chapters = len(chapters)
+        verse_chapters = np.repeat(
+            np.arange(n_chapters, dtype=np.int64), [end - start for _, _, start, end in chapters]
+        )
+        lemma_offsets, posting_verses, position_offsets = (
+            np.asarray(section, dtype=np.int64) for section in index.posting_arrays()
+        )
+
+        # One key per posting, lemma-major and ascending (verses ascend
+        # within a lemma); position_offsets is already the running count
+        # over postings, so a (lemma, chapter) entry's running count is its
+        # value after the entry's last posting
+        lemma_of_posting = np.repeat(np.arange(len(self.lemmas), dtype=np.int64), np.diff(lemma_offsets))
+        keys = lemma_of_posting * n_chapters + verse_chapters[posting_verses]
+        last = np.flatnonzero(np.diff(keys, append=-1) != 0)
+        self._keys = keys[last]
+        self._prefix = np.concatenate(([position_offsets[0]], position_offsets[last + 1]))
+        self._bases = np.arange(len(self.lemmas), dtype=np.int64) * n_chapters
+        self._n_chapters = n_chapters
+
+    def __len__(self) -> int:
+        return self._n_chapters
+
+    def _book(self, name: str) -> tuple[str, dict[str, int]]:
+        name = name.strip().lower()
+        book = self._books.get(name)
+        if book is not None:
+            return book
+        matches = [key for key in self._books if key.startswith(name)]
+        if len(matches) != 1:
+            found = f"ambiguous: {', '.join(self._books[key][0] for key in matches)}" if matches else "not found"
+            raise ValueError(f"Book {name!r} {found}")
+        return self._books[matches[0]]
+
+    def _reference(self, text: str, book: tuple | None = None) -> tuple[tuple, int | None]:
+        """(book, chapter index or None) of "Book [chapter]" or, with
+        ``book``, a bare chapter number."""
+        if book is None or not text.isdigit():
+            match = _REFERENCE.fullmatch(text.strip())
+            if match is None:
+                raise ValueError(f"Cannot parse reference {text!r}")
+            book = self._book(match.group(1))
+            text = match.group(2)
+        if text is None:
+            return book, None
+        chapter = book[1].get(text)
+        if chapter is None:
+            raise ValueError(f"{book[0]} has no chapter {text}")
+        return book, chapter
+
+    def chapter_range(self, spec: str) -> tuple[int, int]:
+        """Chapter indices [start, stop) of a range like "Romans 1-8"."""
+        parts = _RANGE_SEPARATOR.split(spec.strip())
+        if len(parts) > 2:
+            raise ValueError(f"Cannot parse range {spec!r}")
+        book, start = self._reference(parts[0])
+        first_chapter = min(book[1].values())
+        if len(parts) == 1:
+            if start is None:
+                return first_chapter, max(book[1].values()) + 1
+            return start, start + 1
+
+        end_book, end = self._reference(parts[1], book)
+        start = first_chapter if start is None else start
+        stop = (max(end_book[1].values()) if end is None else end) + 1
+        if stop <= start:
+            raise ValueError(f"Empty range {spec!r}")
+        return start, stop
+
+    def describe(self, start: int, stop: int) -> str:
+        """Readable form of chapters [start, stop)."""
+        first_book, first = self.chapters[start]
+        last_book, last = self.chapters[stop - 1]
+        if stop - start == 1:
+            return f"{first_book} {first}"
+        if first_book == last_book:
+            return f"{first_book} {first}-{last}"
+        return f"{first_book} {first} - {last_book} {last}"
+
+    def counts(self, start: int, stop: int):
+        """Occurrences of every lemma (by lemma id) in chapters [start, stop)."""
+        keys, prefix, bases = self._keys, self._prefix, self._bases
+        return prefix[np.searchsorted(keys, bases + stop)] - prefix[np.searchsorted(keys, bases + start)]
+
+    def count(self, lemma: str, start: int, stop: int) -> int:
+        """Occurrences of one lemma in chapters [start, stop)."""
+        lemma_id = self.lemma_ids.get(lemma)
+        if lemma_id is None:
+            return 0
+        base = lemma_id * self._n_chapters
+        lo, hi = np.searchsorted(self._keys, (base + start, base + stop))
+        return int(self._prefix[hi] - self._prefix[lo])
+
+    def _ranked(self, counts, words: Iterable[str] | None) -> list[tuple[str, int]]:
+        if words is not None:
+            allowed = np.zeros(len(self.lemmas), dtype=bool)
+            allowed[[self.lemma_ids[word] for word in words if word in self.lemma_ids]] = True
+            counts = np.where(allowed, counts, 0)
+        order = np.argsort(-counts, kind="stable")
+        order = order[counts[order] > 0]
+        return [(self.lemmas[i], int(counts[i])) for i in order]
+
+    def top(
+        self, start: int, stop: int, words: Iterable[str] | None = None
+    ) -> list[tuple[str, int]]:
+        """(lemma, count) of the lemmas in chapters [start, stop), most
+        frequent first; only ``words`` if given."""
+        return self._ranked(self.counts(start, stop), words)
+
+    def new_words(
+        self,
+        start: int,
+        stop: int,
+        seen: tuple[int, int] | None = None,
+        words: Iterable[str] | None = None,
+    ) -> list[tuple[str, int]]:
+        """Like top(), limited to lemmas that do not occur in the ``seen``
+        chapter range (default: every chapter before ``start``)."""
+        seen_start, seen_stop = seen if seen is not None else (0, start)
+        counts = self.counts(start, stop)
+        counts[self.counts(seen_start, seen_stop) > 0] = 0
+        return self._ranked(counts, words)
+
+
+def load_chapter_counts(config, corpus: Corpus | None = None) -> ChapterCounts:
+    """Per-chapter counts of a version (config.PipelineConfig); builds the
+    posting index first if it is stale."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Range queries need NumPy (pip install numpy)")
+    if corpus is None:
+        corpus = load_corpus(config.bible_json_path, config.corpus_path)
+    with load_index(config, corpus) as index:
+        return ChapterCounts(index, corpus)
+
+
+def main():
+    import argparse
+    import sys
+    import time
+
+    from config import get_config
+    from utils import load_json
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--version", "-v", help="Bible version (default: $BIBLE_VERSION or niv)")
+    common.add_argument("--all-lemmas", action="store_true",
+                        help="Include stopwords and proper nouns (default: step 4 vocabulary only)")
+    common.add_argument("--limit", type=int, default=30, help="Words to print (default: 30, 0 = all)")
+
+    parser = argparse.ArgumentParser(description="Vocabulary of a book/chapter range", parents=[common])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    top = subparsers.add_parser("top", parents=[common], help="Words of a range by local frequency")
+    top.add_argument("range")
+    new = subparsers.add_parser("new", parents=[common], help="Words of a range not seen before it")
+    new.add_argument("range")
+    new.add_argument("--seen", help="Range already read (default: everything before the range)")
+    count = subparsers.add_parser("count", parents=[common], help="Occurrences of words in a range")
+    count.add_argument("range")
+    count.add_argument("words", nargs="+")
+    args = parser.parse_args()
+
+    config = get_config(args.version)
+    start_time = time.perf_counter()
+    chapters = load_chapter_counts(config)
+    print(f"{len(chapters)} chapters, {len(chapters.lemmas)} lemmas "
+          f"(prefix sums built in {(time.perf_counter() - start_time) * 1000:.1f}ms)")
+
+    words = None
+    if not args.all_lemmas and config.step4_vocabulary_path.exists():
+        words = [item["word"] for item in load_json(config.step4_vocabulary_path)["words"]]
+
+    try:
+        start, stop = chapters.chapter_range(args.range)
+        seen = chapters.chapter_range(args.seen) if getattr(args, "seen", None) else None
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    query_time = time.perf_counter()
+    if args.command == "count":
+        results = [(word.lower(), chapters.count(word.lower(), start, stop)) for word in args.words]
+    elif args.command == "new":
+        results = chapters.new_words(start, stop, seen, words)
+    else:
+        results = chapters.top(start, stop, words)
+    elapsed = time.perf_counter() - query_time
+
+    title = chapters.describe(start, stop)
+    if args.command == "new" and (seen or start):
+        title += f", not in {chapters.describe(*seen) if seen else 'earlier chapters'}"
+    print(f"\n{title}: {len(results)} words ({elapsed * 1000:.2f}ms)")
+    for word, occurrences in results[:args.limit or None]:
+        print(f"  {word:<20} {occurrences:>6}")
+
+
+if __name__ == "__main__":
+    main()
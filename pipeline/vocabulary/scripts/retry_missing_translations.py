@@ -1,79 +1,65 @@
-"""Retry missing translations in sentences_korean.json."""
+"""Retry missing translations in sentences_korean.json.
+
+Batches go through llm_client (claude CLI), so batches answered by an
+earlier, interrupted run come from the response cache (--no-cache to bypass).
+"""
 
 from __future__ import annotations
 
-import json
-import subprocess
+import argparse
 import time
-import concurrent.futures
 from datetime import datetime
 from pathlib import Path
 
+import llm_client
 from config import VERSION_OUTPUT_DIR
-from utils import log
+from utils import log, load_json, save_json
 from translation_utils import create_translation_prompt, extract_json_from_response
 
 # Input/Output files
 INPUT_PATH = VERSION_OUTPUT_DIR / "final_sentences_korean.json"
+FAILED_PATH = VERSION_OUTPUT_DIR / "failed_translations.json"
 
 # Processing configuration
 BATCH_SIZE = 20  # Smaller batch for better success rate
-MAX_WORKERS = 5  # Fewer workers to reduce timeouts
 CLAUDE_MODEL = "haiku"
 CLAUDE_TIMEOUT = 180  # Longer timeout
 
 
-def process_batch(batch_info: tuple) -> tuple[int, dict, list]:
-    """Process a batch of sentences with Claude CLI."""
-    batch_index, sentences = batch_info
-
-    prompt = create_translation_prompt(sentences)
-
-    try:
-        result = subprocess.run(
-            ["claude", "--model", CLAUDE_MODEL, "--print"],
-            input=prompt,
-            capture_output=True,
-            text=True,
-            timeout=CLAUDE_TIMEOUT
-        )
-
-        if result.returncode != 0:
-            return (batch_index, {}, [s[0] for s in sentences])
-
-        translations = extract_json_from_response(result.stdout)
-
-        if not translations:
-            return (batch_index, {}, [s[0] for s in sentences])
+def match_translations(sentences: list[tuple], translations: list) -> tuple[dict, list]:
+    """Match a batch's translations (numbered from 1) to its sentence IDs.
 
-        results = {}
-        failed = []
-        for i, (sent_id, _, _) in enumerate(sentences):
-            trans = next((t for t in translations if t.get("id") == i + 1), None)
-            if trans and trans.get("korean"):
-                results[sent_id] = trans["korean"]
-            else:
-                failed.append(sent_id)
+    Returns: (korean by sentence ID, failed sentences)
+    """
+    results = {}
+    failed = []
+    for i, sentence in enumerate(sentences):
+        trans = next((t for t in translations if isinstance(t, dict) and t.get("id") == i + 1), None)
+        if trans and trans.get("korean"):
+            results[sentence[0]] = trans["korean"]
+        else:
+            failed.append(sentence)
+    return results, failed
 
-        return (batch_index, results, failed)
 
-    except subprocess.TimeoutExpired:
-        log(f"Batch {batch_index} timed out", "WARN")
-        return (batch_index, {}, [s[0] for s in sentences])
-    except Exception:
-        log(f"Batch {batch_index} failed", "WARN")
-        return (batch_index, {}, [s[0] for s in sentences])
+def main():
+    parser = argparse.ArgumentParser(description="Retry missing sentence translations")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call the LLM (ignore and do not write the response cache)")
+    args = parser.parse_args()
 
+    llm_client.configure(
+        cli_tool="claude", model=CLAUDE_MODEL, cli_timeout=CLAUDE_TIMEOUT,
+        use_cache=not args.no_cache,
+    )
 
-def main():
     print("=" * 60)
     print("Retry Missing Translations")
     print("=" * 60)
 
     # Load current data
     log(f"Loading from {INPUT_PATH}")
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_json(INPUT_PATH)
 
     # Find missing translations
     missing_ids = [sid for sid, s in data['sentences'].items() if not s.get('korean')]
@@ -90,64 +76,35 @@ def main():
     ]
 
     # Create batches
-    batches = []
-    for i in range(0, len(sentences_list), BATCH_SIZE):
-        batch = sentences_list[i:i + BATCH_SIZE]
-        batches.append((len(batches), batch))
+    batches = [sentences_list[i:i + BATCH_SIZE] for i in range(0, len(sentences_list), BATCH_SIZE)]
 
     total_batches = len(batches)
     log(f"Created {total_batches} batches (size: {BATCH_SIZE})")
 
-    # Process with retries
-    max_retries = 3
+    # Process all batches; failed sentences are asked again in smaller
+    # batches, halving those that fail outright, down to single sentences
     all_translations = {}
-
-    for retry_round in range(max_retries):
-        if not batches:
-            break
-
-        log(f"Round {retry_round + 1}/{max_retries}: Processing {len(batches)} batches...")
-        print("-" * 60)
-
-        completed = 0
-        start_time = time.time()
-        round_translations = {}
-        failed_ids = []
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {executor.submit(process_batch, batch): batch[0] for batch in batches}
-
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    idx, results, failed = future.result()
-                    round_translations.update(results)
-                    failed_ids.extend(failed)
-
-                    completed += 1
-                    log(f"Batch {idx + 1}/{len(batches)}: {len(results)} ok, {len(failed)} fail | Progress: {completed}/{len(batches)}")
-
-                except Exception as e:
-                    log(f"Error: {e}", "ERROR")
-
-        all_translations.update(round_translations)
-
-        # Prepare failed batches for next round
-        if failed_ids:
-            log(f"Round {retry_round + 1} complete: {len(round_translations)} translated, {len(failed_ids)} failed")
-            sentences_list = [
-                (sid, data['sentences'][sid]['text'], data['sentences'][sid]['ref'])
-                for sid in failed_ids
-            ]
-            batches = []
-            for i in range(0, len(sentences_list), BATCH_SIZE):
-                batch = sentences_list[i:i + BATCH_SIZE]
-                batches.append((len(batches), batch))
-        else:
-            log(f"Round {retry_round + 1} complete: All translated!")
-            batches = []
-
-        print("-" * 60)
-        time.sleep(2)  # Brief pause between rounds
+    start_time = time.time()
+    print("-" * 60)
+
+    def on_result(index: int, results: dict) -> None:
+        all_translations.update(results)
+        log(f"Batch {index + 1}/{total_batches}: {len(results)} ok | "
+            f"Progress: {len(all_translations)}/{len(sentences_list)}")
+
+    dead_letters = llm_client.generate_bisecting_sync(
+        batches, create_translation_prompt, match_translations, extract_json_from_response, on_result
+    )
+    print("-" * 60)
+    log(f"Translated {len(all_translations)}/{len(sentences_list)} in {time.time() - start_time:.1f}s")
+    if dead_letters:
+        save_json(FAILED_PATH, {
+            "failed_ids": [letter.item[0] for letter in dead_letters],
+            "count": len(dead_letters),
+            "responses": {letter.item[0]: letter.response for letter in dead_letters},
+            "errors": {letter.item[0]: letter.error for letter in dead_letters if letter.error},
+        }, pretty=True)
+        log(f"Saved {len(dead_letters)} failed sentences to {FAILED_PATH}", "WARN")
 
     # Update data
     log("Updating translations...")
@@ -168,10 +125,12 @@ def main():
     data['metadata']['translations_count'] = with_korean
     data['metadata']['processing_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    with open(INPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    save_json(INPUT_PATH, data, pretty=True)
 
     log(f"Saved to {INPUT_PATH}")
+    for summary in (llm_client.cache_summary(), llm_client.pool_summary()):
+        if summary:
+            log(summary)
 
     # Show remaining missing
     still_missing = [sid for sid, s in data['sentences'].items() if not s.get('korean')]
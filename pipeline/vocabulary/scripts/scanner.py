@@ -0,0 +1,112 @@
+"""Sharded map-reduce over the Bible, one shard per book.
+
+A step hands ``scan_corpus`` a map function that processes a contiguous
+range of verses and returns a partial result; the shards are mapped on a
+process pool and the partial results come back in canonical book order, so
+merging them gives exactly what a single serial loop would have produced:
+
+    partials = scan_corpus(corpus, count_shard)
+    counts = merge_counters(partials)
+
+The number of worker processes comes from ``--jobs`` on run_pipeline.py
+(the PIPELINE_JOBS environment variable for standalone scripts) and
+defaults to 1, which maps every shard in this process. Workers are forked
+so map functions may be closures and the corpus memory map is shared.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections import Counter
+from typing import Callable, Iterable, Sequence
+
+from bible_corpus import Corpus
+
+JOBS_ENV = "PIPELINE_JOBS"
+
+# Set just before the pool forks so workers inherit it without pickling
+_shard_task: Callable | None = None
+
+
+def resolve_jobs(jobs: int | None = None) -> int:
+    """Worker count: ``jobs``, else PIPELINE_JOBS, else 1 (0 = one per core)."""
+    if jobs is None:
+        value = os.environ.get(JOBS_ENV, "")
+        try:
+            jobs = int(value) if value else 1
+        except ValueError:
+            print(f"Warning: ignoring invalid {JOBS_ENV}={value!r}")
+            jobs = 1
+    return jobs if jobs > 0 else os.cpu_count() or 1
+
+
+def _run_shard(index: int):
+    return _shard_task(index)
+
+
+def map_shards(func: Callable, shards: Sequence, jobs: int | None = None) -> list:
+    """Apply ``func`` to every shard; results are in shard order."""
+    global _shard_task
+
+    jobs = min(resolve_jobs(jobs), len(shards))
+
+    # Pool workers are daemonic and cannot fork again (e.g. under
+    # run_pipeline.py --version all); without fork, closures cannot be sent
+    if (
+        jobs <= 1
+        or multiprocessing.current_process().daemon
+        or "fork" not in multiprocessing.get_all_start_methods()
+    ):
+        return [func(shard) for shard in shards]
+
+    _shard_task = lambda index: func(shards[index])  # noqa: E731
+    try:
+        with multiprocessing.get_context("fork").Pool(processes=jobs) as pool:
+            return pool.map(_run_shard, range(len(shards)), chunksize=1)
+    finally:
+        _shard_task = None
+
+
+def book_shards(corpus: Corpus) -> list[tuple[int, int]]:
+    """(first verse, end verse) of every book in canonical order."""
+    return [(start, end) for _, start, end in corpus.books()]
+
+
+def scan_corpus(
+    corpus: Corpus,
+    func: Callable[[Corpus, int, int], object],
+    jobs: int | None = None,
+) -> list:
+    """Call ``func(corpus, start, stop)`` for each book; results in book order."""
+    return map_shards(lambda shard: func(corpus, *shard), book_shards(corpus), jobs)
+
+
+def merge_counters(partials: Iterable[Counter]) -> Counter:
+    """Sum Counters; keys keep their first-occurrence order across shards."""
+    total = Counter()
+    for partial in partials:
+        for key, count in partial.items():
+            total[key] += count
+    return total
+
+
+def merge_sets(partials: Iterable[set]) -> set:
+    """Union of per-shard sets."""
+    merged = set()
+    for partial in partials:
+        merged |= partial
+    return merged
+
+
+def merge_postings(partials: Iterable[dict]) -> dict:
+    """Concatenate per-shard posting lists (key -> list) in shard order."""
+    merged = {}
+    for partial in partials:
+        for key, postings in partial.items():
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = list(postings)
+            else:
+                existing.extend(postings)
+    return merged
@@ -0,0 +1,127 @@
+"""Verse tokenization shared by the vocabulary pipeline steps.
+
+Kept free of NLTK so that the corpus compiler and the filter steps can
+tokenize without loading WordNet.
+
+``tokenize`` is a single pass over the verse with one precompiled pattern
+for word runs; only runs containing an apostrophe get further work (a
+translation table for curly apostrophes and the possessive rule).
+``clean_text`` is the original multi-pass implementation, kept as the
+reference that ``benchmark.py tokenizer`` checks the fast path against.
+"""
+
+from __future__ import annotations
+
+import re
+
+# Curly apostrophes to ASCII. Curly double quotes and em/en dashes need no
+# mapping: like any other punctuation they already end a word run.
+_APOSTROPHES = str.maketrans({"\u2018": "'", "\u2019": "'"})
+
+# A token is a run of word characters; apostrophes inside a run are
+# contractions/possessives and are resolved per run
+_WORD_RUN = re.compile("[\\w'\u2018\u2019]+")
+
+# Sentence boundaries and the first whitespace-delimited word of a sentence,
+# as used for proper noun detection
+_SENTENCE_END = re.compile(r"[.!?]")
+_FIRST_WORD = re.compile(r"\s*\S*")
+
+# Per-token flags from tokenize_cased
+SENTENCE_START = 1  # part of the first word of a sentence
+CAPITALIZED = 2  # mid-sentence and starts with an uppercase letter
+
+# Ordinals and roman numerals match the whole word, fractions anywhere
+_NUMERIC = re.compile(
+    r"\d[½¼¾⅓⅔⅛⅜⅝⅞]"
+    r"|^(?:\d+(?:st|nd|rd|th)"
+    r"|i{1,3}|iv|v|vi{0,3}|ix|x{1,3}|xl|l|lx{0,3}|xc|c{1,3}|cd|d|dc{0,3}|cm|m{1,3})$"
+)
+
+
+def clean_text(text: str) -> str:
+    """Clean text by removing punctuation and normalizing."""
+    # Replace special unicode characters with ASCII equivalents
+    text = text.replace("\u201c", '"').replace("\u201d", '"')  # " "
+    text = text.replace("\u2018", "'").replace("\u2019", "'")  # ' '
+    text = text.replace("\u2014", " ")  # em dash —
+    text = text.replace("\u2013", " ")  # en dash –
+
+    # Remove possessive 's and s' (king's -> king, peoples' -> peoples)
+    text = re.sub(r"'s\b", "", text)
+    text = re.sub(r"s'\b", "s", text)
+
+    # Remove contractions (don't -> dont, I'll -> Ill, etc.)
+    text = re.sub(r"'", "", text)
+
+    # Remove punctuation
+    text = re.sub(r"[^\w\s]", " ", text)
+
+    # Normalize whitespace
+    text = re.sub(r"\s+", " ", text)
+
+    return text.lower().strip()
+
+
+def is_numeric_word(word: str) -> bool:
+    """Check if word is a number, ordinal, or fraction (should be excluded)."""
+    # Pure numbers (isdigit also covers superscripts the pattern's \d does not)
+    return word.isdigit() or _NUMERIC.search(word) is not None
+
+
+def _strip_apostrophes(run: str) -> str:
+    # Drop an 's that ends the run or is followed by another apostrophe
+    # (clean_text's r"'s\b"), then every remaining apostrophe
+    parts = run.translate(_APOSTROPHES).split("'")
+    return parts[0] + "".join(part for part in parts[1:] if part != "s")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split verse text into step 1 tokens (numeric words included).
+
+    Produces exactly ``clean_text(text).split()``.
+    """
+    runs = _WORD_RUN.findall(text)
+    if "'" in text or "\u2019" in text or "\u2018" in text:
+        runs = [run if run.isalnum() else _strip_apostrophes(run) for run in runs]
+    # Lowercase in one call; runs emptied by apostrophe removal drop out
+    return " ".join(runs).lower().split()
+
+
+def tokenize_words(text: str) -> tuple[list[str], int]:
+    """Tokenize and drop numeric words in the same pass.
+
+    Returns the remaining words and the number of numeric words skipped.
+    """
+    tokens = tokenize(text)
+    words = [w for w in tokens if not (w.isdigit() or _NUMERIC.search(w))]
+    return words, len(tokens) - len(words)
+
+
+def tokenize_cased(text: str) -> tuple[list[str], list[int]]:
+    """Tokenize like ``tokenize`` and flag each token's capitalization.
+
+    Sentences are split on . ! ?; tokens of a sentence's first
+    whitespace-delimited word get SENTENCE_START, other tokens get
+    CAPITALIZED when their word run starts with an uppercase letter
+    (ignoring curly quotes), else 0.
+    """
+    tokens = []
+    flags = []
+    for sentence in _SENTENCE_END.split(text):
+        first_word_end = _FIRST_WORD.match(sentence).end()
+        for match in _WORD_RUN.finditer(sentence):
+            run = match.group()
+            if match.start() < first_word_end:
+                flag = SENTENCE_START
+            elif run.lstrip("\u2018\u2019")[:1].isupper():
+                flag = CAPITALIZED
+            else:
+                flag = 0
+            if not run.isalnum():
+                run = _strip_apostrophes(run)
+                if not run:
+                    continue
+            tokens.append(run.lower())
+            flags.append(flag)
+    return tokens, flags
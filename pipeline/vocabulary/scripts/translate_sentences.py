@@ -6,13 +6,12 @@ Maps English sentences to Korean Bible verses from Korean_Bible.json.
 from __future__ import annotations
 
 import argparse
-import json
 import time
 from datetime import datetime
 from pathlib import Path
 
 from config import VERSION_OUTPUT_DIR, VERSION_NAME, SOURCE_DATA_DIR, FINAL_SENTENCES_PATH
-from utils import log
+from utils import log, load_json, save_json
 
 # Input/Output files
 INPUT_PATH = VERSION_OUTPUT_DIR / "step5_sentences.json"
@@ -25,8 +24,7 @@ def load_sentences() -> dict:
     log(f"Loading sentences from {INPUT_PATH}")
     if not INPUT_PATH.exists():
         raise FileNotFoundError(f"Input file not found: {INPUT_PATH}")
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(INPUT_PATH)
 
 
 def load_korean_bible() -> dict:
@@ -34,8 +32,7 @@ def load_korean_bible() -> dict:
     log(f"Loading Korean Bible from {KOREAN_BIBLE_PATH}")
     if not KOREAN_BIBLE_PATH.exists():
         raise FileNotFoundError(f"Korean Bible not found: {KOREAN_BIBLE_PATH}")
-    with open(KOREAN_BIBLE_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(KOREAN_BIBLE_PATH)
 
 
 def parse_reference(ref: str) -> tuple[str, str, str] | None:
@@ -147,8 +144,7 @@ def map_sentences_to_korean(data: dict, korean_bible: dict, limit: int | None =
 def save_output(data: dict, output_path: Path | None = None) -> None:
     """Save translated sentences to JSON."""
     path = output_path or OUTPUT_PATH
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    save_json(path, data, pretty=True)
     log(f"Saved to {path}")
 
 
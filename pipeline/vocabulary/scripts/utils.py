@@ -1,11 +1,42 @@
-"""Common utility functions for pipeline scripts."""
+"""Common utility functions for pipeline scripts.
+
+JSON files are read and written through ``load_json`` / ``save_json``:
+
+- compact by default; ``pretty=True`` (2-space indent) is reserved for
+  final, human-facing artifacts
+- ``.gz`` / ``.zst`` suffixes are compressed transparently
+- ``.ndjson`` files hold a header line followed by one record per line
+  (see ``save_records`` / ``iter_records``), so large word and sentence
+  lists can be streamed
+- orjson is used when installed, with the stdlib json module as fallback;
+  files written by either parse to the same values for pipeline data
+  (strings, ints, finite floats, lists, dicts), but the bytes can differ
+  (e.g. float exponents), and NaN/Infinity are only written by json (orjson
+  writes null)
+"""
 
 from __future__ import annotations
 
+import gzip
+import io
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
+
+# Optional fast JSON backend
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional zstd compression (.zst)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
 
 
 def log(message: str, level: str = "INFO") -> None:
@@ -14,17 +45,115 @@ def log(message: str, level: str = "INFO") -> None:
     print(f"[{timestamp}] [{level}] {message}")
 
 
+def dumps(data: Any, pretty: bool = False) -> bytes:
+    """Encode data as UTF-8 JSON (compact unless ``pretty``)."""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if pretty:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+    else:
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return text.encode("utf-8")
+
+
+def loads(raw: bytes | str) -> Any:
+    """Decode JSON from bytes or str."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _is_ndjson(path: Path) -> bool:
+    suffixes = path.suffixes
+    if suffixes and suffixes[-1] in (".gz", ".zst"):
+        suffixes = suffixes[:-1]
+    return bool(suffixes) and suffixes[-1] == ".ndjson"
+
+
+def open_binary(path: Path, mode: str = "rb"):
+    """Open a file for binary reading/writing, (de)compressing by suffix."""
+    if path.suffix == ".gz":
+        return gzip.open(path, mode, compresslevel=6)
+    if path.suffix == ".zst":
+        if not ZSTD_AVAILABLE:
+            raise ImportError(f"zstandard is required for {path.name} (pip install zstandard)")
+        if "r" in mode:
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+    return open(path, mode)
+
+
 def load_json(path: Path) -> dict[str, Any]:
-    """Load JSON file with error handling."""
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Load a JSON (or NDJSON, optionally compressed) file."""
+    if _is_ndjson(path):
+        return _load_ndjson_document(path)
+    with open_binary(path, "rb") as f:
+        return loads(f.read())
 
 
-def save_json(path: Path, data: dict[str, Any], indent: int = 2) -> None:
-    """Save data to JSON file."""
+def save_json(path: Path, data: dict[str, Any], pretty: bool = False) -> None:
+    """Save data to a JSON (or NDJSON, optionally compressed) file."""
+    if _is_ndjson(path):
+        _save_ndjson_document(path, data)
+        return
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=indent, ensure_ascii=False)
+    with open_binary(path, "wb") as f:
+        f.write(dumps(data, pretty=pretty))
+
+
+def save_records(path: Path, records: Iterable, header: dict[str, Any] | None = None) -> None:
+    """Write an NDJSON file: a header object, then one record per line."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open_binary(path, "wb") as f:
+        f.write(dumps(header or {}) + b"\n")
+        for record in records:
+            f.write(dumps(record) + b"\n")
+
+
+def _lines(f, path: Path):
+    # zstd readers have no line support of their own
+    return io.BufferedReader(f) if path.suffix == ".zst" else f
+
+
+def read_header(path: Path) -> dict[str, Any]:
+    """Read only the header line of an NDJSON file."""
+    with open_binary(path, "rb") as f:
+        return loads(_lines(f, path).readline())
+
+
+def iter_records(path: Path) -> Iterator[Any]:
+    """Stream the records of an NDJSON file (header skipped)."""
+    with open_binary(path, "rb") as f:
+        lines = _lines(f, path)
+        next(lines, None)
+        for line in lines:
+            if line.strip():
+                yield loads(line)
+
+
+def _save_ndjson_document(path: Path, data: dict[str, Any]) -> None:
+    # {"metadata": ..., "<field>": list | dict} -> header + one line per item;
+    # dict items are written as [key, value] pairs
+    fields = [key for key, value in data.items() if isinstance(value, (list, dict)) and key != "metadata"]
+    if len(fields) != 1:
+        raise ValueError(f"NDJSON output needs exactly one list/dict field besides metadata, got {fields}")
+    field = fields[0]
+    records = data[field]
+    keyed = isinstance(records, dict)
+    header = {key: value for key, value in data.items() if key != field}
+    header["_records"] = {"field": field, "keyed": keyed}
+    save_records(path, records.items() if keyed else records, header)
+
+
+def _load_ndjson_document(path: Path) -> dict[str, Any]:
+    document = read_header(path)
+    layout = document.pop("_records", {"field": "records", "keyed": False})
+    records = iter_records(path)
+    document[layout["field"]] = dict(records) if layout["keyed"] else list(records)
+    return document
 
 
 def load_text_list(path: Path) -> set[str]:
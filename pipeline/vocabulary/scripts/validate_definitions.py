@@ -8,6 +8,7 @@ from datetime import datetime
 from pathlib import Path
 
 from config import VERSION_OUTPUT_DIR, FINAL_VOCABULARY_PATH
+from utils import load_json
 
 # Input file
 INPUT_PATH = FINAL_VOCABULARY_PATH
@@ -45,8 +46,7 @@ def log(message: str, level: str = "INFO") -> None:
 
 def load_vocabulary() -> dict:
     """Load vocabulary file."""
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(INPUT_PATH)
 
 
 def check_ipa_format(ipa: str) -> list[str]:
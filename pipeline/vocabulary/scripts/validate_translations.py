@@ -10,12 +10,11 @@ Validates:
 from __future__ import annotations
 
 import argparse
-import json
 import re
 from pathlib import Path
 
 from config import VERSION_OUTPUT_DIR, FINAL_SENTENCES_PATH
-from utils import log
+from utils import log, load_json, save_json
 
 # Input file
 INPUT_PATH = FINAL_SENTENCES_PATH
@@ -31,8 +30,7 @@ def load_sentences() -> dict:
     log(f"Loading from {INPUT_PATH}")
     if not INPUT_PATH.exists():
         raise FileNotFoundError(f"Input file not found: {INPUT_PATH}")
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(INPUT_PATH)
 
 
 def validate_translations(data: dict) -> dict:
@@ -215,8 +213,7 @@ def main():
 
         if fix_count > 0:
             # Save fixed data
-            with open(INPUT_PATH, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            save_json(INPUT_PATH, data, pretty=True)
             log(f"Fixed {fix_count} issues and saved to {INPUT_PATH}")
 
             # Re-validate